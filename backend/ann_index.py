@@ -0,0 +1,538 @@
+# backend/ann_index.py
+#
+# Approximate nearest-neighbor index (IVF + product quantization) for resume
+# embeddings, persisted in a directory that is memory-mapped at startup.
+#
+#   python ann_index.py build --output .ann_index/resumes     # from the resumes table
+#   python ann_index.py update --output .ann_index/resumes    # add rows written since
+#   python ann_index.py bench --count 200000 --nprobe 1 4 16 64
+#
+# Vectors are assigned to the nearest of `nlist` coarse centroids, and the
+# residual is compressed to `m` one-byte codes (one per sub-vector), so each
+# vector costs `m` bytes instead of 4 * dim. A query scans only the `nprobe`
+# closest lists using precomputed code-distance tables, then re-ranks the best
+# `rerank` candidates exactly against the float32 vectors, which stay on disk
+# and are paged in only for those candidates.
+#
+# Serve it by pointing RESUME_ANN_INDEX_PATH at the output directory.
+
+import argparse
+import json
+from datetime import datetime
+import os
+import shutil
+import threading
+import time
+import numpy as np
+
+FORMAT_VERSION = 1
+CODEBOOK_SIZE = 256  # 8-bit codes
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def nearest_centroids(x: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Returns the index of the L2-nearest centroid for every row of `x`."""
+    centroid_norms = (centroids**2).sum(axis=1)
+    assignments = np.empty(x.shape[0], dtype=np.int32)
+    for start in range(0, x.shape[0], chunk_size):
+        chunk = x[start : start + chunk_size]
+        distances = centroid_norms[None, :] - 2 * chunk @ centroids.T
+        assignments[start : start + chunk_size] = distances.argmin(axis=1)
+    return assignments
+
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means. Empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    if x.shape[0] <= k:
+        # Too few points: use them all and pad with jittered copies
+        extra = x[rng.integers(0, x.shape[0], k - x.shape[0])]
+        return np.vstack([x, extra + 1e-3 * rng.standard_normal(extra.shape).astype(np.float32)])
+    centroids = x[rng.choice(x.shape[0], k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(x, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        empty = counts == 0
+        # Per-cluster sums over rows sorted by cluster
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.add.reduceat(x[order], starts[~empty], axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(x.shape[0], int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product-quantized residuals.
+
+    Rows from the last `save()` live in memory-mapped files, grouped by list.
+    Rows added afterwards are kept in an in-memory tail that is searched
+    alongside them and folded into the files by the next `save()`. Re-adding
+    an id replaces its previous row.
+    """
+
+    def __init__(self, centroids: np.ndarray, codebooks: np.ndarray):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.codebooks = np.ascontiguousarray(codebooks, dtype=np.float32)
+        self.nlist, self.dim = self.centroids.shape
+        self.m, _, self.dsub = self.codebooks.shape
+        self._lock = threading.RLock()
+        # Base rows (memory-mapped after `load`), sorted by list
+        self._offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        self._codes = np.zeros((0, self.m), dtype=np.uint8)
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._ids = []
+        self._base_deleted = np.zeros(0, dtype=bool)
+        # Tail rows added since the last save
+        self._tail_lists = []
+        self._tail_codes = []
+        self._tail_vectors = []
+        self._tail_ids = []
+        self._tail_deleted = []
+        self._positions = None  # id -> position, built on first add
+        # Database time before the scan that last built or updated the index
+        self.watermark = None
+
+    # -- training and encoding -------------------------------------------
+
+    @classmethod
+    def train(
+        cls,
+        vectors,
+        nlist: int,
+        m: int = 48,
+        iterations: int = 15,
+        seed: int = 0,
+    ) -> "IVFPQIndex":
+        """Learns coarse centroids and PQ codebooks from a sample of vectors."""
+        x = normalize_rows(vectors)
+        dim = x.shape[1]
+        if dim % m:
+            raise ValueError(f"Dimension {dim} is not divisible by m={m}")
+        centroids = kmeans(x, nlist, iterations, seed)
+        residuals = x - centroids[nearest_centroids(x, centroids)]
+        dsub = dim // m
+        codebooks = np.stack(
+            [
+                kmeans(residuals[:, j * dsub : (j + 1) * dsub], CODEBOOK_SIZE, iterations, seed + j)
+                for j in range(m)
+            ]
+        )
+        return cls(centroids, codebooks)
+
+    def _encode(self, x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        lists = nearest_centroids(x, self.centroids)
+        residuals = x - self.centroids[lists]
+        codes = np.empty((x.shape[0], self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = residuals[:, j * self.dsub : (j + 1) * self.dsub]
+            codes[:, j] = nearest_centroids(sub, self.codebooks[j])
+        return lists, codes
+
+    # -- adds ------------------------------------------------------------
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int((~self._base_deleted).sum()) + self._tail_deleted.count(False)
+
+    def __contains__(self, item_id) -> bool:
+        with self._lock:
+            return item_id in self._position_map()
+
+    def _position_map(self) -> dict:
+        if self._positions is None:
+            self._positions = {item_id: i for i, item_id in enumerate(self._ids)}
+            base = len(self._ids)
+            for i, item_id in enumerate(self._tail_ids):
+                self._positions[item_id] = base + i
+        return self._positions
+
+    def add(self, ids, vectors):
+        """Adds rows (or replaces rows with the same id) without retraining."""
+        ids = list(ids)
+        if not ids:
+            return
+        x = normalize_rows(vectors)
+        lists, codes = self._encode(x)
+        with self._lock:
+            positions = self._position_map()
+            base = len(self._ids)
+            for i, item_id in enumerate(ids):
+                previous = positions.get(item_id)
+                if previous is not None:
+                    if previous < base:
+                        self._base_deleted[previous] = True
+                    else:
+                        self._tail_deleted[previous - base] = True
+                positions[item_id] = base + len(self._tail_ids)
+                self._tail_ids.append(item_id)
+                self._tail_deleted.append(False)
+            self._tail_lists.append(lists)
+            self._tail_codes.append(codes)
+            self._tail_vectors.append(x)
+
+    def _tail_arrays(self):
+        if not self._tail_ids:
+            return (
+                np.zeros(0, dtype=np.int32),
+                np.zeros((0, self.m), dtype=np.uint8),
+                np.zeros((0, self.dim), dtype=np.float32),
+            )
+        if len(self._tail_codes) > 1:
+            # Consolidate so searches do not re-concatenate every time
+            self._tail_lists = [np.concatenate(self._tail_lists)]
+            self._tail_codes = [np.vstack(self._tail_codes)]
+            self._tail_vectors = [np.vstack(self._tail_vectors)]
+        return self._tail_lists[0], self._tail_codes[0], self._tail_vectors[0]
+
+    # -- search ----------------------------------------------------------
+
+    def _distance_tables(self, residual: np.ndarray) -> np.ndarray:
+        sub = residual.reshape(self.m, 1, self.dsub)
+        return ((self.codebooks - sub) ** 2).sum(axis=2)  # (m, 256)
+
+    def search(self, query, k: int = 10, nprobe: int = 16, rerank: int = 100) -> list[tuple]:
+        """
+        Returns up to `k` (id, cosine similarity) pairs, best first. Scans the
+        `nprobe` nearest lists and re-ranks the best `max(rerank, k)` PQ
+        candidates with exact float32 dot products.
+        """
+        q = normalize_rows(query)[0]
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {q.shape[0]} does not match index dimension {self.dim}")
+        nprobe = max(1, min(nprobe, self.nlist))
+        probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        columns = np.arange(self.m)
+
+        # Snapshot under the lock so a concurrent add() or save() cannot
+        # swap arrays out from under the scan
+        with self._lock:
+            offsets, codes, base_vectors = self._offsets, self._codes, self._vectors
+            base_ids, base_deleted = self._ids, self._base_deleted.copy()
+            tail_lists, tail_codes, tail_vectors = self._tail_arrays()
+            tail_ids = self._tail_ids
+            tail_deleted = np.asarray(self._tail_deleted, dtype=bool)
+            base = len(base_ids)
+
+        candidate_positions, candidate_distances = [], []
+        for list_id in probe:
+            table = self._distance_tables(q - self.centroids[list_id])
+            start, end = offsets[list_id], offsets[list_id + 1]
+            if end > start:
+                distances = table[columns, codes[start:end]].sum(axis=1)
+                live = ~base_deleted[start:end]
+                candidate_positions.append(np.arange(start, end)[live])
+                candidate_distances.append(distances[live])
+            if tail_lists.size:
+                in_list = np.flatnonzero((tail_lists == list_id) & ~tail_deleted)
+                if in_list.size:
+                    candidate_positions.append(base + in_list)
+                    candidate_distances.append(table[columns, tail_codes[in_list]].sum(axis=1))
+
+        if not candidate_positions:
+            return []
+        positions = np.concatenate(candidate_positions)
+        distances = np.concatenate(candidate_distances)
+        keep = min(max(rerank, k), positions.size)
+        if keep < positions.size:
+            best = np.argpartition(distances, keep - 1)[:keep]
+            positions = positions[best]
+
+        # Exact re-ranking; base vectors are read from the memory map in order
+        positions.sort()
+        in_base = positions < base
+        vectors = np.empty((positions.size, self.dim), dtype=np.float32)
+        vectors[in_base] = base_vectors[positions[in_base]]
+        vectors[~in_base] = tail_vectors[positions[~in_base] - base]
+        scores = vectors @ q
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [
+            (
+                base_ids[positions[i]] if positions[i] < base else tail_ids[positions[i] - base],
+                float(scores[i]),
+            )
+            for i in top
+        ]
+
+    # -- persistence -----------------------------------------------------
+
+    def save(self, path: str, chunk_size: int = 65536):
+        """
+        Writes all live rows, grouped by list, to `path` and reopens the
+        index on the new files. The directory is replaced atomically.
+        """
+        with self._lock:
+            tail_lists, tail_codes, tail_vectors = self._tail_arrays()
+            base = len(self._ids)
+            base_lists = np.repeat(np.arange(self.nlist, dtype=np.int32), np.diff(self._offsets))
+            all_lists = np.concatenate([base_lists, tail_lists])
+            live = np.concatenate([~self._base_deleted, ~np.asarray(self._tail_deleted, dtype=bool)])
+            positions = np.flatnonzero(live)
+            order = positions[np.argsort(all_lists[positions], kind="stable")]
+            all_ids = self._ids + self._tail_ids
+
+            tmp_path = f"{path}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            count = order.size
+            codes_out = np.lib.format.open_memmap(
+                os.path.join(tmp_path, "codes.npy"), mode="w+", dtype=np.uint8, shape=(count, self.m)
+            )
+            vectors_out = np.lib.format.open_memmap(
+                os.path.join(tmp_path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, self.dim)
+            )
+            for start in range(0, count, chunk_size):
+                chunk = order[start : start + chunk_size]
+                in_base = chunk < base
+                codes_out[start : start + chunk.size][in_base] = self._codes[chunk[in_base]]
+                codes_out[start : start + chunk.size][~in_base] = tail_codes[chunk[~in_base] - base]
+                vectors_out[start : start + chunk.size][in_base] = self._vectors[chunk[in_base]]
+                vectors_out[start : start + chunk.size][~in_base] = tail_vectors[chunk[~in_base] - base]
+            codes_out.flush()
+            vectors_out.flush()
+            del codes_out, vectors_out
+
+            counts = np.bincount(all_lists[order], minlength=self.nlist)
+            offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+            np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+            np.save(os.path.join(tmp_path, "centroids.npy"), self.centroids)
+            np.save(os.path.join(tmp_path, "codebooks.npy"), self.codebooks)
+            with open(os.path.join(tmp_path, "ids.txt"), "w", encoding="utf-8") as f:
+                for p in order:
+                    f.write(f"{all_ids[p]}\n")
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(
+                    {
+                        "version": FORMAT_VERSION,
+                        "dim": self.dim,
+                        "nlist": self.nlist,
+                        "m": self.m,
+                        "count": int(count),
+                        "watermark": self.watermark.isoformat() if self.watermark else None,
+                    },
+                    f,
+                )
+
+            # Swap directories; open memory maps keep the old files alive
+            old_path = f"{path}.old"
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.exists(path):
+                os.rename(path, old_path)
+            os.rename(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+            self._open(path)
+
+    def _open(self, path: str):
+        self._offsets = np.load(os.path.join(path, "offsets.npy"))
+        self._codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+        self._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(path, "ids.txt"), encoding="utf-8") as f:
+            self._ids = f.read().splitlines()
+        self._base_deleted = np.zeros(len(self._ids), dtype=bool)
+        self._tail_lists, self._tail_codes, self._tail_vectors = [], [], []
+        self._tail_ids, self._tail_deleted = [], []
+        self._positions = None
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        """Opens a saved index; codes and vectors are memory-mapped, not read."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ANN index format: {meta.get('version')}")
+        index = cls(
+            np.load(os.path.join(path, "centroids.npy")),
+            np.load(os.path.join(path, "codebooks.npy")),
+        )
+        index._open(path)
+        if meta.get("watermark"):
+            index.watermark = datetime.fromisoformat(meta["watermark"])
+        print(f"Opened ANN index at {path} ({meta['count']} vectors, {meta['nlist']} lists)")
+        return index
+
+    def memory_bytes(self) -> dict:
+        """Bytes held per component, for comparison with a float32 matrix."""
+        return {
+            "codes": int(self._codes.nbytes),
+            "vectors_on_disk": int(self._vectors.nbytes),
+            "centroids_and_codebooks": int(self.centroids.nbytes + self.codebooks.nbytes),
+            "float32_matrix": int(len(self._ids) * self.dim * 4),
+        }
+
+
+def default_nlist(count: int) -> int:
+    """About 4 * sqrt(N) lists, the usual starting point for IVF."""
+    return int(min(max(16, 4 * np.sqrt(max(count, 1))), 65536))
+
+
+# -- building from the database --------------------------------------------
+
+
+def iter_resume_embeddings(conn, batch_size: int = 5000, after_id: str = ""):
+    """Yields (ids, float32 matrix) batches from the resumes table in id order."""
+    from embedding_codec import decode_embedding
+
+    cursor = conn.cursor()
+    last_id = after_id
+    while True:
+        cursor.execute(
+            "SELECT id, embedding FROM resumes WHERE id > %s AND embedding IS NOT NULL "
+            "ORDER BY id LIMIT %s",
+            (last_id, batch_size),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        yield [row[0] for row in rows], np.vstack([decode_embedding(row[1]) for row in rows])
+        last_id = rows[-1][0]
+    cursor.close()
+
+
+def build_from_db(conn, output: str, nlist: int | None, m: int, sample: int, batch_size: int):
+    from vector_index import database_now
+
+    started = time.perf_counter()
+    watermark = database_now(conn)
+    training = []
+    sampled = 0
+    for ids, vectors in iter_resume_embeddings(conn, batch_size):
+        training.append((ids, vectors))
+        sampled += len(ids)
+        if sampled >= sample:
+            break
+    if not training:
+        print("No resume embeddings to index.")
+        return
+    train_vectors = np.vstack([vectors for _, vectors in training])
+    nlist = nlist or default_nlist(sample if sampled >= sample else sampled)
+    print(f"Training on {train_vectors.shape[0]} vectors ({nlist} lists, m={m})")
+    index = IVFPQIndex.train(train_vectors, nlist, m)
+    index.watermark = watermark
+    for ids, vectors in training:
+        index.add(ids, vectors)
+    for ids, vectors in iter_resume_embeddings(conn, batch_size, training[-1][0][-1]):
+        index.add(ids, vectors)
+        print(f"  {len(index)} vectors indexed")
+    index.save(output)
+    print(f"Built ANN index with {len(index)} vectors in {time.perf_counter() - started:.1f}s")
+
+
+def update_from_db(conn, output: str, batch_size: int):
+    from vector_index import database_now
+
+    index = IVFPQIndex.load(output)
+    index.watermark = database_now(conn)
+    known = set(index._ids)
+    added = 0
+    for ids, vectors in iter_resume_embeddings(conn, batch_size):
+        missing = [i for i, item_id in enumerate(ids) if item_id not in known]
+        if missing:
+            index.add([ids[i] for i in missing], vectors[missing])
+            added += len(missing)
+    index.save(output)
+    print(f"Added {added} vectors; index now holds {len(index)}.")
+
+
+# -- benchmark -------------------------------------------------------------
+
+
+def synthetic_embeddings(count: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, a rough stand-in for sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    x = centers[labels] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return normalize_rows(x)
+
+
+def benchmark(count, dim, queries, k, nprobes, nlist, m, rerank, path):
+    data = synthetic_embeddings(count + queries, dim)
+    base, query_vectors = data[:count], data[count:]
+    ids = [f"r{i}" for i in range(count)]
+
+    started = time.perf_counter()
+    sample = base[np.random.default_rng(1).choice(count, min(count, 50000), replace=False)]
+    index = IVFPQIndex.train(sample, nlist or default_nlist(count), m)
+    index.add(ids, base)
+    index.save(path)
+    index = IVFPQIndex.load(path)
+    print(f"Build + save: {time.perf_counter() - started:.1f}s for {count} x {dim}")
+    sizes = index.memory_bytes()
+    print(
+        f"Resident codes {sizes['codes'] / 1e6:.1f}MB vs float32 matrix "
+        f"{sizes['float32_matrix'] / 1e6:.1f}MB ({sizes['float32_matrix'] / max(sizes['codes'], 1):.0f}x smaller)"
+    )
+
+    # Exact top-k by brute force
+    exact_started = time.perf_counter()
+    exact = [set(np.argsort(-(base @ q))[:k]) for q in query_vectors]
+    exact_ms = (time.perf_counter() - exact_started) * 1000 / queries
+    print(f"Exact search: {exact_ms:.2f}ms/query")
+
+    results = []
+    for nprobe in nprobes:
+        latencies, hits = [], 0
+        for q, truth in zip(query_vectors, exact):
+            t = time.perf_counter()
+            found = index.search(q, k, nprobe=nprobe, rerank=rerank)
+            latencies.append((time.perf_counter() - t) * 1000)
+            hits += len(truth & {int(item_id[1:]) for item_id, _ in found})
+        recall = hits / (k * queries)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        results.append({"nprobe": nprobe, "recall": recall, "p50Ms": p50, "p99Ms": p99})
+        print(f"nprobe {nprobe:>4}: recall@{k} {recall:.3f}  p50 {p50:.2f}ms  p99 {p99:.2f}ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF-PQ index for resume embeddings.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="build from the resumes table")
+    build_parser.add_argument("--output", default=os.getenv("RESUME_ANN_INDEX_PATH", ".ann_index/resumes"))
+    build_parser.add_argument("--nlist", type=int, default=None)
+    build_parser.add_argument("--m", type=int, default=48)
+    build_parser.add_argument("--sample", type=int, default=100000, help="training sample size")
+    build_parser.add_argument("--batch-size", type=int, default=5000)
+
+    update_parser = subparsers.add_parser("update", help="add resumes missing from the index")
+    update_parser.add_argument("--output", default=os.getenv("RESUME_ANN_INDEX_PATH", ".ann_index/resumes"))
+    update_parser.add_argument("--batch-size", type=int, default=5000)
+
+    bench_parser = subparsers.add_parser("bench", help="recall@k and latency on synthetic data")
+    bench_parser.add_argument("--count", type=int, default=100000)
+    bench_parser.add_argument("--dim", type=int, default=384)
+    bench_parser.add_argument("--queries", type=int, default=200)
+    bench_parser.add_argument("--k", type=int, default=10)
+    bench_parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    bench_parser.add_argument("--nlist", type=int, default=None)
+    bench_parser.add_argument("--m", type=int, default=48)
+    bench_parser.add_argument("--rerank", type=int, default=100)
+    bench_parser.add_argument("--path", default=".ann_index/bench")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        benchmark(
+            args.count, args.dim, args.queries, args.k, args.nprobe,
+            args.nlist, args.m, args.rerank, args.path,
+        )
+    else:
+        from db_pool import tidb_pool
+
+        with tidb_pool.connection() as conn:
+            if conn:
+                if args.command == "build":
+                    build_from_db(conn, args.output, args.nlist, args.m, args.sample, args.batch_size)
+                else:
+                    update_from_db(conn, args.output, args.batch_size)
+        tidb_pool.close_all()
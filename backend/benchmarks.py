@@ -0,0 +1,476 @@
+# backend/benchmarks.py
+#
+# Component micro-benchmarks over a synthetic corpus from sample_data.py:
+# document parsing, PDF text cleanup, single vs batch embedding and the
+# search scoring behind /vector_search. No AWS, TiDB or Anthropic access is
+# needed.
+#
+#   python benchmarks.py run                                # everything
+#   python benchmarks.py run --only parse clean --quick
+#   python benchmarks.py run --only docx                    # DOCX extractors and peak RSS
+#   python benchmarks.py run --only search_load --resumes 20000
+#   python benchmarks.py run --embedder standin --output bench.json
+#   python benchmarks.py compare baseline.json bench.json --threshold 0.15
+#
+# Each benchmark reports p50/p99 latency per call and throughput in items
+# per second. `compare` exits with status 1 when any benchmark's p50 grew,
+# or its throughput dropped, by more than the threshold, so it can gate CI.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+# Every embedding has to be computed, not read back from an earlier run
+os.environ["EMBEDDING_CACHE_DIR"] = ""
+
+import sample_data
+from parser_utils import (
+    clean_pdf_text,
+    extract_text_from_docx_dom,
+    extract_text_from_docx_streaming,
+    iter_pdf_pages,
+    parse_document,
+)
+
+GROUPS = ("parse", "clean", "docx", "embed", "search", "search_load")
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Resume sizes by number of experience bullets: about 1, 3 and 28 PDF pages
+RESUME_SIZES = {"small": 15, "medium": 120, "large": 1200}
+# Larger documents for comparing the DOCX extractors
+DOCX_SIZES = {"medium": 120, "large": 1200, "huge": 12000}
+
+
+def measure(fn, iterations: int, warmup: int = 2, items_per_call: int = 1) -> dict:
+    """Times `iterations` calls of `fn(i)` after `warmup` untimed ones."""
+    for i in range(warmup):
+        fn(i)
+    latencies = np.empty(iterations)
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        fn(warmup + i)
+        latencies[i] = time.perf_counter() - call_started
+    wall = time.perf_counter() - started
+    return {
+        "iterations": iterations,
+        "itemsPerCall": items_per_call,
+        "p50Ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p99Ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+        "meanMs": round(float(latencies.mean()) * 1000, 3),
+        "itemsPerSecond": round(iterations * items_per_call / wall, 1),
+    }
+
+
+def bench_parse(args) -> dict:
+    results = {}
+    for size, bullets in RESUME_SIZES.items():
+        iterations = max(3, args.iterations // (10 if size == "large" else 1))
+        for kind, file_type, build in (
+            ("pdf", PDF_TYPE, sample_data.generate_resume_pdf),
+            ("docx", DOCX_TYPE, sample_data.generate_resume_docx),
+        ):
+            document = build(bullets, seed=1)
+            result = measure(lambda i: parse_document(document, file_type), iterations)
+            result["bytes"] = len(document)
+            results[f"parse_document.{kind}.{size}"] = result
+    return results
+
+
+def peak_memory_bytes(fn) -> int:
+    """Peak Python heap allocated during one call of `fn()`, measured with tracemalloc."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# Runs one DOCX extractor in a fresh process and prints its peak RSS before
+# and after extraction. tracemalloc only sees the Python heap, not the lxml
+# tree python-docx builds in C, so it understates the DOM extractor. Linux
+# keeps ru_maxrss across exec, so the script forks before measuring to drop
+# the high-water mark inherited from this (much larger) benchmark process.
+DOCX_RSS_SCRIPT = """
+import os, sys
+pid = os.fork()
+if pid:
+    sys.exit(os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]))
+
+import json, resource
+import parser_utils
+
+def max_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+extract = getattr(parser_utils, sys.argv[1])
+with open(sys.argv[2], "rb") as f:
+    document = f.read()
+baseline = max_rss_bytes()
+extract(document)
+print(json.dumps({"baseline": baseline, "peak": max_rss_bytes()}))
+"""
+
+
+def docx_peak_rss(extractor: str, path: str) -> dict:
+    """Peak RSS of a fresh process that extracts the DOCX at `path` once with `extractor`."""
+    output = subprocess.run(
+        [sys.executable, "-c", DOCX_RSS_SCRIPT, extractor, path],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_docx(args) -> dict:
+    results = {}
+    for size, bullets in DOCX_SIZES.items():
+        iterations = max(3, args.iterations // (10 if size == "huge" else 1))
+        document = sample_data.generate_resume_docx(bullets, seed=1, skills_table=True)
+        with tempfile.NamedTemporaryFile(suffix=".docx") as f:
+            f.write(document)
+            f.flush()
+            for name, extract in (
+                ("python-docx", extract_text_from_docx_dom),
+                ("streaming", extract_text_from_docx_streaming),
+            ):
+                result = measure(lambda i: extract(document), iterations)
+                result["bytes"] = len(document)
+                result["chars"] = len(extract(document))
+                rss = docx_peak_rss(extract.__name__, f.name)
+                result["peakRssBytes"] = rss["peak"]
+                result["extractRssBytes"] = rss["peak"] - rss["baseline"]
+                results[f"docx.{name}.{size}"] = result
+    return results
+
+
+def bench_clean(args) -> dict:
+    results = {}
+    for size, bullets in RESUME_SIZES.items():
+        raw = "\n".join(iter_pdf_pages(sample_data.generate_resume_pdf(bullets, seed=2)))
+        result = measure(lambda i: clean_pdf_text(raw), args.iterations)
+        result["chars"] = len(raw)
+        results[f"clean_pdf_text.{size}"] = result
+    return results
+
+
+def bench_embed(args) -> dict:
+    from embedding_utils import embeddings_model, get_multiple_text_embeddings, get_text_embedding
+
+    if args.embedder == "standin":
+        from standins import StandInEmbedder
+
+        embeddings_model.replace(StandInEmbedder)
+    embeddings_model.get()
+
+    lines = [
+        line
+        for line in sample_data.generate_resume_lines(args.batch_size * 4, seed=3)
+        if line.startswith("- ")
+    ]
+
+    # Call number `i` gets texts no earlier call has seen, so nothing is cached
+    def texts(i: int, count: int) -> list[str]:
+        return [f"{lines[(i * count + j) % len(lines)]} (run {i}, item {j})" for j in range(count)]
+
+    batch = args.batch_size
+    single = measure(
+        lambda i: [get_text_embedding(text) for text in texts(i, batch)],
+        max(3, args.iterations // 4),
+        items_per_call=batch,
+    )
+    batched = measure(
+        lambda i: get_multiple_text_embeddings(texts(i, batch)),
+        max(3, args.iterations // 4),
+        warmup=4,
+        items_per_call=batch,
+    )
+    return {
+        f"embed.single.x{batch}": {**single, "embedder": args.embedder},
+        f"embed.batch.x{batch}": {**batched, "embedder": args.embedder},
+    }
+
+
+def bench_search(args) -> dict:
+    from ann_index import IVFPQIndex, default_nlist, synthetic_embeddings
+    from skill_index import SkillIndex, course_terms, fuse_scores
+    from vector_index import EmbeddingIndex, course_metadata
+
+    count, dim = args.courses, 384
+    courses = list(sample_data.iter_course_catalog(count, seed=4))
+    vectors = synthetic_embeddings(count + 256, dim)
+    queries = vectors[count:]
+    vectors = vectors[:count]
+
+    index = EmbeddingIndex("benchmark courses")
+    index.load(
+        lambda: (
+            (course["id"], vector, course_metadata(course["name"], course["description"], course["url"]))
+            for course, vector in zip(courses, vectors)
+        )
+    )
+    skills = SkillIndex("benchmark course skills")
+    skills.load(lambda: ((course["id"], *course_terms(course)) for course in courses))
+
+    def query(i):
+        return queries[i % len(queries)]
+
+    def filtered_search(i):
+        candidate_ids, keyword_scores = skills.candidates(
+            "python machine learning aws", ["Python"], max_candidates=1000
+        )
+        results = index.search(query(i), 5, candidate_ids=candidate_ids)
+        return fuse_scores(results, keyword_scores, 0.3)
+
+    def skill_only_search(i):
+        # No keywords: every course with the skill is scored
+        candidate_ids, _ = skills.candidates(None, ["Python"])
+        return index.search(query(i), 5, candidate_ids=candidate_ids)
+
+    results = {
+        f"search.exact.{count}": measure(lambda i: index.search(query(i), 5), args.iterations),
+        f"search.skill_filtered.{count}": measure(filtered_search, args.iterations),
+        f"search.skill_only.{count}": measure(skill_only_search, args.iterations),
+    }
+
+    sample = vectors[np.random.default_rng(5).choice(count, min(count, 50000), replace=False)]
+    ann = IVFPQIndex.train(sample, default_nlist(count))
+    ann.add([course["id"] for course in courses], vectors)
+    results[f"search.ann.{count}"] = measure(
+        lambda i: ann.search(query(i), 5, nprobe=16, rerank=200), args.iterations
+    )
+    for name in results:
+        results[name]["rows"] = count
+    return results
+
+
+def bench_search_load(args) -> dict:
+    """
+    Loading the resume search index from full rows (id, file_name, raw_text,
+    embedding), as /vector_search used to, vs. ids and embeddings only with
+    previews hydrated for the final hits. Rows are built in memory the way
+    the driver's fetchall() would return them, so no database is needed;
+    `transferBytes` is the size of the column values read.
+    """
+    from embedding_codec import decode_embedding, encode_embedding
+    from ann_index import synthetic_embeddings
+    from vector_index import PREVIEW_CHARS, EmbeddingIndex, resume_metadata
+
+    count = args.resumes
+    vectors = synthetic_embeddings(count, 384)
+    texts = [
+        "\n".join(sample_data.generate_resume_lines(60, seed=i % 200)) + f"\nResume {i}"
+        for i in range(count)
+    ]
+    blobs = [encode_embedding(vector) for vector in vectors]
+    ids = [f"resume-{i:08d}" for i in range(count)]
+    file_names = [f"resume_{i}.pdf" for i in range(count)]
+
+    def full_rows():
+        # Fresh copies of every value, as a driver would decode them
+        return [
+            (ids[i][:], file_names[i][:], texts[i].encode("utf-8").decode("utf-8"), bytes(blobs[i]))
+            for i in range(count)
+        ]
+
+    def id_rows():
+        return [(ids[i][:], bytes(blobs[i])) for i in range(count)]
+
+    def load_full():
+        index = EmbeddingIndex("full rows")
+        rows = full_rows()
+        index.load(
+            lambda: (
+                (row_id, decode_embedding(vector_blob), resume_metadata(file_name, raw_text))
+                for row_id, file_name, raw_text, vector_blob in rows
+            )
+        )
+        return index
+
+    def load_ids():
+        index = EmbeddingIndex("ids and embeddings")
+        rows = id_rows()
+        index.load(
+            lambda: ((row_id, decode_embedding(vector_blob), {}) for row_id, vector_blob in rows)
+        )
+        return index
+
+    def retained_bytes(load) -> int:
+        tracemalloc.start()
+        try:
+            index = load()
+            retained = tracemalloc.get_traced_memory()[0]
+            del index
+            return retained
+        finally:
+            tracemalloc.stop()
+
+    text_bytes = sum(len(text.encode("utf-8")) for text in texts)
+    id_bytes = sum(len(row_id) + len(blob) for row_id, blob in zip(ids, blobs))
+    name_bytes = sum(len(name) for name in file_names)
+    hydrate_bytes = args.limit * (len(ids[0]) + len(file_names[0]) + PREVIEW_CHARS)
+
+    results = {}
+    iterations = max(3, args.iterations // 10)
+    for name, load, transfer in (
+        ("full_rows", load_full, id_bytes + name_bytes + text_bytes),
+        ("ids_embeddings", load_ids, id_bytes),
+    ):
+        result = measure(lambda i: load(), iterations, warmup=1)
+        result["rows"] = count
+        result["transferBytes"] = transfer
+        result["peakMemoryBytes"] = peak_memory_bytes(load)
+        result["retainedMemoryBytes"] = retained_bytes(load)
+        results[f"search_load.{name}.{count}"] = result
+    # The second phase: previews for the final `limit` hits, truncated by the database
+    results[f"search_load.ids_embeddings.{count}"]["hydrateBytesPerSearch"] = hydrate_bytes
+    return results
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "clean": bench_clean,
+    "docx": bench_docx,
+    "embed": bench_embed,
+    "search": bench_search,
+    "search_load": bench_search_load,
+}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(args) -> dict:
+    results = {}
+    for group in args.only:
+        print(f"Running {group} benchmarks")
+        try:
+            group_results = BENCHMARKS[group](args)
+        except Exception as e:
+            print(f"  Skipped {group}: {e}")
+            continue
+        for name, result in group_results.items():
+            print(
+                f"  {name:<36} p50 {result['p50Ms']:>10.3f}ms  p99 {result['p99Ms']:>10.3f}ms  "
+                f"{result['itemsPerSecond']:>10.1f} items/s"
+                + (
+                    f"  peak {result['peakMemoryBytes'] / 1e6:.1f}MB"
+                    if "peakMemoryBytes" in result
+                    else ""
+                )
+                + (
+                    f"  peak RSS {result['peakRssBytes'] / 1e6:.1f}MB"
+                    f" (+{result['extractRssBytes'] / 1e6:.1f}MB)"
+                    if "peakRssBytes" in result
+                    else ""
+                )
+            )
+        results.update(group_results)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """
+    Prints the change of every benchmark present in both runs and returns
+    the names of those that regressed by more than `threshold` (0.1 = 10%).
+    """
+    regressions = []
+    print(f"{'benchmark':<36} {'p50 base':>10} {'p50 now':>10} {'change':>8} {'items/s change':>15}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<36} (new)")
+            continue
+        latency_change = result["p50Ms"] / base["p50Ms"] - 1 if base["p50Ms"] else 0.0
+        throughput_change = (
+            result["itemsPerSecond"] / base["itemsPerSecond"] - 1 if base["itemsPerSecond"] else 0.0
+        )
+        regressed = latency_change > threshold or throughput_change < -threshold
+        print(
+            f"{name:<36} {base['p50Ms']:>10.3f} {result['p50Ms']:>10.3f} "
+            f"{latency_change:>+8.1%} {throughput_change:>+15.1%}"
+            + ("  REGRESSION" if regressed else "")
+        )
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run and compare component micro-benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS))
+    run_parser.add_argument("--iterations", type=int, default=50)
+    run_parser.add_argument("--courses", type=int, default=100000, help="catalog size for search")
+    run_parser.add_argument("--resumes", type=int, default=20000, help="table size for search_load")
+    run_parser.add_argument("--limit", type=int, default=5, help="hits hydrated per search")
+    run_parser.add_argument("--batch-size", type=int, default=32, help="texts per embedding call")
+    run_parser.add_argument(
+        "--embedder", choices=["model", "standin"], default="model",
+        help="the configured embedding model, or the CPU-only stand-in from standins.py",
+    )
+    run_parser.add_argument("--quick", action="store_true", help="fewer iterations and a smaller catalog")
+    run_parser.add_argument("--output", help="write results as JSON to this path")
+    run_parser.add_argument("--compare", help="baseline JSON to compare this run against")
+    run_parser.add_argument("--threshold", type=float, default=0.15)
+    compare_parser = subparsers.add_parser("compare", help="compare two saved runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        if args.quick:
+            args.iterations = min(args.iterations, 10)
+            args.courses = min(args.courses, 10000)
+            args.resumes = min(args.resumes, 2000)
+        report = run(args)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Wrote results to {args.output}")
+        if not args.compare:
+            sys.exit(0)
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            report = json.load(f)
+
+    regressions = compare(baseline, report, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print("No regressions.")
@@ -0,0 +1,19 @@
+# backend/cpu_offload.py
+
+# Function used to run CPU-bound work, or None to run it inline. The async
+# server (serve.py --mode async) points this at a pool of native threads so
+# parsing and embedding do not stall the event loop.
+_runner = None
+
+
+def set_cpu_runner(runner):
+    """Sets the callable used as `runner(fn, *args, **kwargs)` by `run_cpu_bound`."""
+    global _runner
+    _runner = runner
+
+
+def run_cpu_bound(fn, *args, **kwargs):
+    """Runs `fn(*args, **kwargs)` on the configured CPU runner and returns its result."""
+    if _runner is None:
+        return fn(*args, **kwargs)
+    return _runner(fn, *args, **kwargs)
@@ -0,0 +1,211 @@
+# backend/db_pool.py
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import pymysql
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# TiDB Connection Details
+DB_HOST = os.getenv("TIDB_HOST")
+DB_PORT = int(os.getenv("TIDB_PORT", 4000))
+DB_USER = os.getenv("TIDB_USER")
+DB_PASSWORD = os.getenv("TIDB_PASSWORD")
+DB_NAME = os.getenv("TIDB_NAME", "test")  # Default database name
+
+# Pool settings
+POOL_SIZE = int(os.getenv("TIDB_POOL_SIZE", 5))
+POOL_TIMEOUT = float(os.getenv("TIDB_POOL_TIMEOUT", 10))
+POOL_RECYCLE = float(os.getenv("TIDB_POOL_RECYCLE", 1800))
+POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("TIDB_POOL_HEALTH_CHECK_INTERVAL", 30))
+
+
+def connect_to_tidb():
+    """Establishes a connection to TiDB Serverless."""
+    try:
+        conn = pymysql.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            database=DB_NAME,
+            autocommit=True,  # Ensure changes are committed
+            ssl={
+                "ssl": {
+                    "ssl_mode": "VERIFY_IDENTITY",
+                }
+            },
+        )
+        return conn
+    except Exception as e:
+        print(f"Error connecting to TiDB: {e}")
+        return None
+
+
+class ConnectionPool:
+    """
+    Bounded pool of reusable database connections.
+
+    At most `max_size` connections exist at once; callers wait up to `timeout`
+    seconds for one to be released. Connections older than `recycle` seconds
+    are replaced, and connections idle for longer than `health_check_interval`
+    seconds are pinged before being handed out.
+    """
+
+    def __init__(
+        self,
+        connect,
+        max_size: int = 5,
+        timeout: float = 10,
+        recycle: float = 1800,
+        health_check_interval: float = 30,
+    ):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.health_check_interval = health_check_interval
+        self._idle = deque()  # (conn, created_at, released_at)
+        self._created_at = {}
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "recycled": 0,
+            "failed_health_checks": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _close(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, conn, created_at: float, released_at: float) -> bool:
+        now = time.monotonic()
+        if not conn.open or now - created_at > self.recycle:
+            self._stats["recycled"] += 1
+            return False
+        if now - released_at > self.health_check_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._stats["failed_health_checks"] += 1
+                return False
+        return True
+
+    def acquire(self):
+        """
+        Returns a healthy connection, or None if none could be created or the
+        pool stayed exhausted for `timeout` seconds.
+        """
+        started = time.monotonic()
+        with self._condition:
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    print("Timed out waiting for a database connection.")
+                    return None
+                self._condition.wait(remaining)
+            self._in_use += 1
+            waited = time.monotonic() - started
+            self._stats["acquired"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+        # Health checks and new connections run outside the lock so other
+        # callers are not blocked on network round trips
+        while True:
+            with self._condition:
+                if not self._idle:
+                    break
+                conn, created_at, released_at = self._idle.pop()
+            if self._is_usable(conn, created_at, released_at):
+                return conn
+            with self._condition:
+                self._close(conn)
+
+        conn = self._connect()
+        with self._condition:
+            if conn is None:
+                self._in_use -= 1
+                self._condition.notify()
+                return None
+            self._stats["created"] += 1
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """Returns a connection to the pool, closing it if it is broken or `discard` is set."""
+        if conn is None:
+            return
+        with self._condition:
+            self._in_use -= 1
+            created_at = self._created_at.get(id(conn), time.monotonic())
+            if discard or not conn.open:
+                self._close(conn)
+            else:
+                try:
+                    if not conn.get_autocommit():
+                        # Drop any unfinished transaction left by the caller
+                        conn.rollback()
+                        conn.autocommit(True)
+                    self._idle.append((conn, created_at, time.monotonic()))
+                except Exception:
+                    self._close(conn)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that yields a pooled connection (or None) and releases it."""
+        conn = self.acquire()
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            self.release(conn, discard=True)
+            conn = None
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Closes every idle connection."""
+        with self._condition:
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._close(conn)
+
+    def stats(self) -> dict:
+        """Returns pool usage counters, including time spent waiting for connections."""
+        with self._condition:
+            stats = dict(self._stats)
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+            stats["max_size"] = self.max_size
+            stats["wait_seconds_avg"] = (
+                stats["wait_seconds_total"] / stats["acquired"]
+                if stats["acquired"]
+                else 0.0
+            )
+            return stats
+
+
+# Shared pool used by the API and the ingestion scripts
+tidb_pool = ConnectionPool(
+    connect_to_tidb,
+    max_size=POOL_SIZE,
+    timeout=POOL_TIMEOUT,
+    recycle=POOL_RECYCLE,
+    health_check_interval=POOL_HEALTH_CHECK_INTERVAL,
+)
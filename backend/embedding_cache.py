@@ -0,0 +1,228 @@
+# backend/embedding_cache.py
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only safe from a single process
+    fcntl = None
+
+VECTOR_FILE = "vectors.f32"
+KEY_FILE = "keys.txt"
+
+
+def normalize_text(text: str) -> str:
+    """Collapses runs of whitespace so trivially different copies share a key."""
+    return " ".join(text.split())
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    """Returns the content hash used to cache the embedding of `text`."""
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only persistent store of float32 vectors.
+
+    Vectors are appended to `vectors.f32` and read back through a memory map.
+    `keys.txt` starts with a `dim=<n>` header followed by one key per line,
+    where key N names vector row N.
+    A vector is always written before its key, so a crash can at worst leave
+    a trailing vector without a key. Every process reads and repairs the
+    files only while holding the same lock as writers, so it never mistakes
+    another process's in-progress write for such a leftover.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._vector_path = os.path.join(directory, VECTOR_FILE)
+        self._key_path = os.path.join(directory, KEY_FILE)
+        self._rows = {}
+        self._dim = None
+        self._mapped = None
+        self._mapped_rows = 0
+        # How much of keys.txt has been read, and how many keys it held
+        self._key_offset = 0
+        self._key_count = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._key_path):
+            return
+        with open(self._vector_path, "ab") as vectors, open(self._key_path, "a+b") as keys:
+            with self._locked(keys):
+                self._sync(keys, vectors)
+
+    @contextmanager
+    def _locked(self, keys):
+        if fcntl is not None:
+            fcntl.flock(keys.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(keys.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self, keys, vectors) -> bool:
+        """
+        Reads keys appended since the last sync, by this or other processes,
+        and drops vectors that have no key. Must hold the lock. Returns False
+        when there are keys without vectors, in which case nothing should be
+        appended until the files are repaired.
+        """
+        keys.seek(self._key_offset)
+        data = keys.read()
+        # A key that was only partially written belongs to a crashed writer
+        complete = data[: data.rfind(b"\n") + 1]
+        if len(complete) != len(data):
+            keys.truncate(self._key_offset + len(complete))
+        lines = complete.decode("ascii").splitlines()
+        if self._key_offset == 0 and lines:
+            self._dim = int(lines[0].split("=", 1)[1])
+            lines = lines[1:]
+        for key in lines:
+            self._rows[key] = self._key_count
+            self._key_count += 1
+        self._key_offset += len(complete)
+        if self._dim is None:
+            return True
+
+        expected = self._key_count * self._dim * 4
+        size = os.fstat(vectors.fileno()).st_size
+        if size > expected:
+            vectors.truncate(expected)
+        elif size < expected:
+            print(
+                f"Embedding cache {self.directory} has {self._key_count} keys but only "
+                f"{size // (self._dim * 4)} vectors; not writing to it."
+            )
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _vectors(self, needed_rows: int):
+        if self._mapped is None or self._mapped_rows < needed_rows:
+            rows = os.path.getsize(self._vector_path) // (self._dim * 4)
+            self._mapped = np.memmap(
+                self._vector_path, dtype="<f4", mode="r", shape=(rows, self._dim)
+            )
+            self._mapped_rows = rows
+        return self._mapped
+
+    def get(self, key: str) -> np.ndarray | None:
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        vectors = self._vectors(row + 1)
+        if row >= self._mapped_rows:
+            return None
+        return np.array(vectors[row], dtype=np.float32)
+
+    def put(self, key: str, vector: np.ndarray):
+        if key in self._rows:
+            return
+        vector = np.asarray(vector, dtype="<f4").ravel()
+        with open(self._vector_path, "ab") as vectors, open(self._key_path, "a+b") as keys:
+            with self._locked(keys):
+                # Other processes may have appended since we last looked
+                if not self._sync(keys, vectors) or key in self._rows:
+                    return
+                if self._dim is None:
+                    self._dim = vector.shape[0]
+                elif vector.shape[0] != self._dim:
+                    raise ValueError(
+                        f"Embedding dimension {vector.shape[0]} does not match cache dimension {self._dim}"
+                    )
+                if self._key_offset == 0:
+                    header = f"dim={self._dim}\n".encode("ascii")
+                    keys.write(header)
+                    self._key_offset = len(header)
+                vectors.write(vector.tobytes())
+                vectors.flush()
+                line = key.encode("ascii") + b"\n"
+                keys.write(line)
+                keys.flush()
+                self._key_offset += len(line)
+        self._rows[key] = self._key_count
+        self._key_count += 1
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by a hash of the model name and normalized text.
+
+    Lookups check a bounded in-memory LRU first and then the optional disk
+    store, promoting disk hits into memory.
+    """
+
+    def __init__(
+        self, model_name: str, max_entries: int = 10000, cache_dir: str | None = None
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._disk = DiskEmbeddingStore(cache_dir) if cache_dir else None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return embedding_cache_key(self.model_name, text)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> np.ndarray | None:
+        """Returns the cached embedding for `text`, or None on a miss."""
+        key = self.key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            if self._disk is not None:
+                vector = self._disk.get(key)
+                if vector is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, text: str, embedding):
+        """Stores the embedding for `text` in both tiers."""
+        key = self.key(text)
+        vector = np.array(embedding, dtype=np.float32).ravel()
+        with self._lock:
+            self._remember(key, vector)
+            if self._disk is not None:
+                self._disk.put(key, vector)
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current size of each tier."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk) if self._disk is not None else 0,
+            }
@@ -0,0 +1,82 @@
+# backend/embedding_codec.py
+
+import base64
+import binascii
+import json
+import numpy as np
+
+# Embeddings are stored as raw little-endian float32, 4 bytes per dimension
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+def encode_embedding(embedding) -> bytes:
+    """Encodes an embedding as raw little-endian float32 bytes for storage."""
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def is_json_embedding(value) -> bool:
+    """Returns True if a stored embedding still uses the legacy JSON encoding."""
+    if isinstance(value, str):
+        return True
+    # A float32 vector ending in b"]" would need a final component above 1e17,
+    # which normalized sentence embeddings never reach.
+    return bytes(value[:1]) == b"[" and bytes(value[-1:]) == b"]"
+
+
+def decode_embedding(value) -> np.ndarray:
+    """
+    Decodes a stored embedding into a float32 numpy array.
+
+    Binary values are wrapped zero-copy with `np.frombuffer`, so the result is
+    read-only. Legacy JSON-encoded rows are still accepted so reads keep
+    working while `migrate_embeddings.py` is converting a table.
+    """
+    if value is None:
+        raise ValueError("Embedding value is empty")
+    if is_json_embedding(value):
+        return np.asarray(json.loads(value), dtype=EMBEDDING_DTYPE)
+    if len(value) % EMBEDDING_DTYPE.itemsize:
+        raise ValueError(f"Invalid binary embedding of {len(value)} bytes")
+    return np.frombuffer(value, dtype=EMBEDDING_DTYPE)
+
+
+# Encodings accepted for embeddings sent over the API. "json" is a plain list
+# of floats; the base64 forms carry raw little-endian floats and are roughly
+# 3x (float32) or 6x (float16) smaller than JSON text.
+WIRE_ENCODINGS = {
+    "json": None,
+    "base64-f32": np.dtype("<f4"),
+    "base64-f16": np.dtype("<f2"),
+}
+
+
+def encode_embedding_for_wire(embedding, encoding: str = "json"):
+    """Encodes an embedding for a JSON response as a float list or a base64 string."""
+    if encoding not in WIRE_ENCODINGS:
+        raise ValueError(f"Unsupported embedding encoding: {encoding}")
+    dtype = WIRE_ENCODINGS[encoding]
+    if dtype is None:
+        return np.asarray(embedding, dtype=np.float32).tolist()
+    return base64.b64encode(np.asarray(embedding, dtype=dtype).tobytes()).decode("ascii")
+
+
+def decode_embedding_from_wire(value, encoding: str | None = None) -> np.ndarray:
+    """
+    Decodes an embedding sent by a client into a float32 numpy array. Lists are
+    read as JSON floats; strings as base64 in `encoding` (float32 by default).
+    """
+    if isinstance(value, list):
+        return np.asarray(value, dtype=np.float32)
+    if not isinstance(value, str):
+        raise ValueError("Embedding must be a list of floats or a base64 string")
+    encoding = encoding or "base64-f32"
+    dtype = WIRE_ENCODINGS.get(encoding)
+    if dtype is None:
+        raise ValueError(f"Unsupported embedding encoding for a string: {encoding}")
+    try:
+        raw = base64.b64decode(value, validate=True)
+    except binascii.Error:
+        raise ValueError("Embedding is not valid base64")
+    if not raw or len(raw) % dtype.itemsize:
+        raise ValueError(f"Invalid {encoding} embedding of {len(raw)} bytes")
+    return np.frombuffer(raw, dtype=dtype).astype(np.float32)
@@ -0,0 +1,254 @@
+# backend/embedding_server.py
+#
+# Shared embedding service. One process holds the SentenceTransformer model and
+# every Flask worker reaches it over a local socket, so the model is loaded once
+# instead of once per worker. Concurrent requests are grouped into micro-batches
+# before calling `encode`.
+#
+#   python embedding_server.py --address /tmp/resumegenie-embeddings.sock
+#
+# Workers opt in by setting EMBEDDING_SERVER_ADDRESS to the same address
+# (a Unix socket path, or host:port for TCP).
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+DEFAULT_ADDRESS = "/tmp/resumegenie-embeddings.sock"
+HEADER = struct.Struct("!I")
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Embedding server connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock, header: dict, payload: bytes = b""):
+    """Sends a length-prefixed JSON header followed by a length-prefixed binary payload."""
+    header_bytes = json.dumps(header).encode("utf-8")
+    sock.sendall(
+        HEADER.pack(len(header_bytes))
+        + header_bytes
+        + HEADER.pack(len(payload))
+        + payload
+    )
+
+
+def recv_message(sock) -> tuple[dict, bytes]:
+    """Receives one message written by `send_message`."""
+    (header_size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    header = json.loads(_recv_exact(sock, header_size))
+    (payload_size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    payload = _recv_exact(sock, payload_size) if payload_size else b""
+    return header, payload
+
+
+def _parse_address(address: str):
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+class MicroBatcher:
+    """
+    Groups concurrent encode requests into batches.
+
+    A batch is closed when it holds `max_batch_size` texts or when
+    `max_wait_seconds` have passed since its first request arrived, then
+    encoded with a single call to `encode_fn`.
+    """
+
+    def __init__(self, encode_fn, max_batch_size: int = 64, max_wait_seconds: float = 0.005):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list[str]) -> Future:
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait_seconds
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                embeddings = np.asarray(self._encode_fn(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(embeddings[offset : offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """Serves encode requests on one client connection until it is closed."""
+
+    def handle(self):
+        while True:
+            try:
+                header, _ = recv_message(self.request)
+            except ConnectionError:
+                return
+            if header.get("op") == "stats":
+                batcher = self.server.batcher
+                send_message(
+                    self.request, {"batches": batcher.batches, "texts": batcher.texts}
+                )
+                continue
+            texts = header.get("texts") or []
+            if not texts:
+                send_message(self.request, {"count": 0, "dim": 0})
+                continue
+            try:
+                embeddings = self.server.batcher.submit(texts).result()
+            except Exception as e:
+                send_message(self.request, {"error": str(e)})
+                continue
+            send_message(
+                self.request,
+                {"count": embeddings.shape[0], "dim": embeddings.shape[1]},
+                embeddings.astype("<f4").tobytes(),
+            )
+
+
+def serve(address: str, max_batch_size: int, max_wait_seconds: float):
+    """Loads the model and serves encode requests on `address` until interrupted."""
+    from embedding_utils import load_local_model
+
+    model = load_local_model()
+    family, bind_address = _parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(address):
+            os.unlink(address)
+        server_class = type(
+            "UnixEmbeddingServer",
+            (socketserver.ThreadingMixIn, socketserver.UnixStreamServer),
+            {"daemon_threads": True, "request_queue_size": 128},
+        )
+    else:
+        server_class = type(
+            "TCPEmbeddingServer",
+            (socketserver.ThreadingMixIn, socketserver.TCPServer),
+            {
+                "daemon_threads": True,
+                "allow_reuse_address": True,
+                "request_queue_size": 128,
+            },
+        )
+
+    with server_class(bind_address, EmbeddingRequestHandler) as server:
+        server.batcher = MicroBatcher(
+            lambda texts: model.encode(texts, batch_size=len(texts)),
+            max_batch_size=max_batch_size,
+            max_wait_seconds=max_wait_seconds,
+        )
+        print(
+            f"Embedding server listening on {address} "
+            f"(max batch {max_batch_size}, max wait {max_wait_seconds * 1000:.1f}ms)"
+        )
+        server.serve_forever()
+
+
+class EmbeddingClient:
+    """
+    Drop-in stand-in for `SentenceTransformer` that forwards `encode` calls to
+    the embedding server. Each thread keeps its own connection so concurrent
+    callers can be batched together on the server.
+    """
+
+    def __init__(self, address: str, timeout: float = 30):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _socket(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            family, connect_address = _parse_address(self.address)
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(connect_address)
+            self._local.sock = sock
+        return sock
+
+    def _request(self, header: dict) -> tuple[dict, bytes]:
+        sock = self._socket()
+        try:
+            send_message(sock, header)
+            return recv_message(sock)
+        except (OSError, ConnectionError):
+            # Drop the broken connection so the next call reconnects
+            self._local.sock = None
+            sock.close()
+            raise
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        header, payload = self._request({"texts": [texts] if single else list(texts)})
+        if "error" in header:
+            raise RuntimeError(header["error"])
+        embeddings = np.frombuffer(payload, dtype="<f4").reshape(
+            header["count"], header["dim"]
+        )
+        return embeddings[0] if single else embeddings
+
+    def stats(self) -> dict:
+        header, _ = self._request({"op": "stats"})
+        return header
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the shared embedding server.")
+    parser.add_argument(
+        "--address",
+        default=os.getenv("EMBEDDING_SERVER_ADDRESS", DEFAULT_ADDRESS),
+        help="Unix socket path or host:port",
+    )
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    serve(args.address, args.max_batch_size, args.max_wait_ms / 1000)
@@ -1,14 +1,66 @@
 import os
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 import numpy as np
+from embedding_cache import EmbeddingCache
+from lazy_resource import LazyResource
+from metrics import CACHE_LOOKUPS, EMBEDDING_BATCH_SIZE
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Initialize a free embedding model from Hugging Face
 # This model is free and doesn't require API keys
-embeddings_model = SentenceTransformer("all-MiniLM-L6-v2")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# "sentence-transformers" (default) or "onnx" for the int8-quantized ONNX
+# Runtime export; run `python onnx_embedder.py check` before enabling it
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", 0)) or None
+
+# When set, encoding is forwarded to the shared embedding server instead of
+# loading a copy of the model in this process
+EMBEDDING_SERVER_ADDRESS = os.getenv("EMBEDDING_SERVER_ADDRESS")
+
+
+def load_sentence_transformer():
+    """Imports sentence_transformers and loads the model into this process."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+def load_local_model():
+    """Loads the model for the configured EMBEDDING_BACKEND into this process."""
+    if EMBEDDING_BACKEND == "onnx":
+        from onnx_embedder import OnnxEmbedder
+
+        return OnnxEmbedder(num_threads=EMBEDDING_ONNX_THREADS)
+    return load_sentence_transformer()
+
+
+def load_embeddings_model():
+    """Returns the local model, or a client for the embedding server; called on first use."""
+    if EMBEDDING_SERVER_ADDRESS:
+        from embedding_server import EmbeddingClient
+
+        return EmbeddingClient(EMBEDDING_SERVER_ADDRESS)
+    return load_local_model()
+
+
+# The model is loaded on the first embedding call (or by `warmup_embeddings`)
+# so importing this module stays cheap
+embeddings_model = LazyResource("embedding model", load_embeddings_model)
+
+# Cache of embeddings keyed by a hash of the model name and normalized text.
+# Set EMBEDDING_CACHE_DIR to an empty string to keep the cache in memory only.
+# Quantized embeddings differ slightly, so each backend gets its own keys.
+embedding_cache = EmbeddingCache(
+    f"{EMBEDDING_MODEL_NAME}:onnx-int8"
+    if EMBEDDING_BACKEND == "onnx"
+    else EMBEDDING_MODEL_NAME,
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", 10000)),
+    cache_dir=os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache"),
+)
 
 
 def get_text_embedding(text: str) -> list[float]:
@@ -24,9 +76,17 @@ def get_text_embedding(text: str) -> list[float]:
     if not text or not text.strip():
         raise ValueError("Text cannot be empty")
 
+    cached = embedding_cache.get(text)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(cache="embedding", result="hit")
+        return cached.tolist()
+    CACHE_LOOKUPS.inc(cache="embedding", result="miss")
+
     try:
         # Generate embedding using the free model
-        embedding = embeddings_model.encode(text)
+        EMBEDDING_BATCH_SIZE.observe(1)
+        embedding = embeddings_model.get().encode(text)
+        embedding_cache.put(text, embedding)
         # Convert numpy array to list of floats
         return embedding.tolist()
     except Exception as e:
@@ -46,10 +106,34 @@ def get_multiple_text_embeddings(texts: list[str]) -> list[list[float]]:
     if not texts:
         raise ValueError("Texts list cannot be empty")
 
+    embeddings = [embedding_cache.get(text) for text in texts]
+    # Encode each distinct missing text once
+    misses = list(
+        dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        )
+    )
+
+    CACHE_LOOKUPS.inc(len(misses), cache="embedding", result="miss")
+    CACHE_LOOKUPS.inc(len(texts) - len(misses), cache="embedding", result="hit")
+
     try:
-        # Generate embeddings for multiple texts
-        embeddings = embeddings_model.encode(texts)
+        if misses:
+            # Generate embeddings only for texts not already cached
+            EMBEDDING_BATCH_SIZE.observe(len(misses))
+            encoded = dict(zip(misses, embeddings_model.get().encode(misses)))
+            for text, embedding in encoded.items():
+                embedding_cache.put(text, embedding)
+            embeddings = [
+                encoded[text] if embedding is None else embedding
+                for text, embedding in zip(texts, embeddings)
+            ]
         # Convert numpy arrays to list of lists of floats
         return [embedding.tolist() for embedding in embeddings]
     except Exception as e:
         raise RuntimeError(f"Failed to generate embeddings: {str(e)}")
+
+
+def warmup_embeddings():
+    """Loads the embedding model and runs one encode so the first request is fast."""
+    embeddings_model.get().encode("warmup")
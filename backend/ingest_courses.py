@@ -1,42 +1,42 @@
 import os
-import pymysql
-from dotenv import load_dotenv
-from sample_data import generate_sample_courses
-from embedding_utils import get_text_embedding
+import argparse
+import csv
+import itertools
+import time
+from db_pool import tidb_pool
+from sample_data import generate_sample_courses, iter_sample_courses
+from embedding_utils import get_text_embedding, get_multiple_text_embeddings
+from embedding_codec import encode_embedding, decode_embedding
+from skill_index import ensure_keyword_table, upsert_keywords
 import json
 
-# Load environment variables from .env file
-load_dotenv()
+COURSE_COLUMNS = "(id, name, description, url, skills, embedding, created_at)"
+COURSE_ROW_PLACEHOLDER = "(%s, %s, %s, %s, %s, %s, NOW())"
+COURSE_UPSERT_CLAUSE = """
+    ON DUPLICATE KEY UPDATE
+        name = VALUES(name),
+        description = VALUES(description),
+        url = VALUES(url),
+        skills = VALUES(skills),
+        embedding = VALUES(embedding);
+"""
 
-# TiDB Connection Details
-DB_HOST = os.getenv("TIDB_HOST")
-DB_PORT = int(os.getenv("TIDB_PORT", 4000))
-DB_USER = os.getenv("TIDB_USER")
-DB_PASSWORD = os.getenv("TIDB_PASSWORD")
-DB_NAME = os.getenv("TIDB_NAME", "test")  # Default database name
 
+def course_embedding_text(course: dict) -> str:
+    """Combines a course's name, description and skills into the text that is embedded."""
+    return f"{course['name']}. {course['description']}. Skills: {', '.join(course['skills'])}"
 
-def connect_to_tidb():
-    """Establishes a connection to TiDB Serverless."""
-    try:
-        conn = pymysql.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            autocommit=True,  # Ensure changes are committed
-            ssl={
-                "ssl": {
-                    "ssl_mode": "VERIFY_IDENTITY",
-                }
-            },
-        )
-        print("Successfully connected to TiDB Serverless!")
-        return conn
-    except Exception as e:
-        print(f"Error connecting to TiDB: {e}")
-        return None
+
+def course_row(course: dict, embedding) -> tuple:
+    """Builds the parameter tuple for one row of the course upsert."""
+    return (
+        course["id"],
+        course["name"],
+        course["description"],
+        course["url"],
+        json.dumps(course["skills"]),  # Store skills as JSON string
+        encode_embedding(embedding),  # Store embedding as float32 bytes
+    )
 
 
 def insert_course_data(conn, courses: list[dict]):
@@ -46,35 +46,18 @@ def insert_course_data(conn, courses: list[dict]):
         return
 
     cursor = conn.cursor()
-    insert_sql = """
-    INSERT INTO courses (id, name, description, url, skills, embedding, created_at)
-    VALUES (%s, %s, %s, %s, %s, %s, NOW())
-    ON DUPLICATE KEY UPDATE
-        name = VALUES(name),
-        description = VALUES(description),
-        url = VALUES(url),
-        skills = VALUES(skills),
-        embedding = VALUES(embedding);
-    """
+    ensure_keyword_table(cursor)
+    insert_sql = f"INSERT INTO courses {COURSE_COLUMNS} VALUES {COURSE_ROW_PLACEHOLDER}{COURSE_UPSERT_CLAUSE}"
 
     print(f"Attempting to insert {len(courses)} courses...")
     for course in courses:
         try:
             # Combine description and skills for embedding
-            text_to_embed = f"{course['name']}. {course['description']}. Skills: {', '.join(course['skills'])}"
-            embedding = get_text_embedding(text_to_embed)
-
-            cursor.execute(
-                insert_sql,
-                (
-                    course["id"],
-                    course["name"],
-                    course["description"],
-                    course["url"],
-                    json.dumps(course["skills"]),  # Store skills as JSON string
-                    json.dumps(embedding),  # Store embedding as JSON string
-                ),
-            )
+            embedding = get_text_embedding(course_embedding_text(course))
+
+            cursor.execute(insert_sql, course_row(course, embedding))
+            # Skills and keywords for the course search prefilter
+            upsert_keywords(cursor, [course])
             print(f"Inserted/Updated course: {course['name']}")
         except Exception as e:
             print(f"Error inserting course {course['name']}: {e}")
@@ -83,6 +66,132 @@ def insert_course_data(conn, courses: list[dict]):
     print("Data ingestion complete.")
 
 
+def iter_courses_from_file(path: str):
+    """
+    Streams course dicts from a JSONL or CSV file without loading it into memory.
+
+    CSV files need id, name, description, url and skills columns, with skills
+    given either as a JSON list or separated by semicolons.
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                skills = row.get("skills") or ""
+                if skills.startswith("["):
+                    row["skills"] = json.loads(skills)
+                else:
+                    row["skills"] = [s.strip() for s in skills.split(";") if s.strip()]
+                yield row
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_batches(items, batch_size: int):
+    """Groups an iterable into lists of at most `batch_size` items."""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def load_checkpoint(checkpoint_path: str | None, source: str, batch_size: int) -> int:
+    """Returns how many batches of `source` a previous run already committed."""
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != source or checkpoint.get("batch_size") != batch_size:
+        print("Checkpoint belongs to a different source or batch size. Starting over.")
+        return 0
+    return checkpoint.get("completed_batches", 0)
+
+
+def save_checkpoint(
+    checkpoint_path: str | None, source: str, batch_size: int, completed_batches: int
+):
+    """Atomically records the number of committed batches."""
+    if not checkpoint_path:
+        return
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "source": source,
+                "batch_size": batch_size,
+                "completed_batches": completed_batches,
+            },
+            f,
+        )
+    os.replace(tmp_path, checkpoint_path)
+
+
+def ingest_course_batches(
+    conn,
+    courses,
+    source: str,
+    batch_size: int = 256,
+    checkpoint_path: str | None = None,
+) -> int:
+    """
+    Streams `courses` into the courses table in fixed-size batches.
+
+    Each batch is embedded with a single `get_multiple_text_embeddings` call and
+    written with one multi-row upsert. After every committed batch the
+    checkpoint is updated, so a rerun over the same source skips finished
+    batches without re-embedding them. Returns the number of rows written.
+    """
+    if not conn:
+        print("No database connection. Skipping data insertion.")
+        return 0
+
+    skip_batches = load_checkpoint(checkpoint_path, source, batch_size)
+    if skip_batches:
+        print(f"Resuming {source} after {skip_batches} completed batches.")
+
+    cursor = conn.cursor()
+    ensure_keyword_table(cursor)
+    written = 0
+    started = time.perf_counter()
+    for batch_number, batch in enumerate(iter_batches(courses, batch_size)):
+        if batch_number < skip_batches:
+            continue
+
+        embeddings = get_multiple_text_embeddings(
+            [course_embedding_text(course) for course in batch]
+        )
+        # pymysql's executemany only rewrites VALUES lists made purely of
+        # placeholders, so build the multi-row statement that keeps NOW()
+        insert_sql = (
+            f"INSERT INTO courses {COURSE_COLUMNS} VALUES "
+            + ", ".join([COURSE_ROW_PLACEHOLDER] * len(batch))
+            + COURSE_UPSERT_CLAUSE
+        )
+        params = [
+            value
+            for course, embedding in zip(batch, embeddings)
+            for value in course_row(course, embedding)
+        ]
+        cursor.execute(insert_sql, params)
+        upsert_keywords(cursor, batch)
+        conn.commit()
+        save_checkpoint(checkpoint_path, source, batch_size, batch_number + 1)
+
+        written += len(batch)
+        elapsed = time.perf_counter() - started
+        print(
+            f"Batch {batch_number + 1}: {written} courses written "
+            f"({written / elapsed:.1f} rows/sec)"
+        )
+    cursor.close()
+    print(f"Batched ingestion of {source} complete: {written} courses written.")
+    return written
+
+
 def verify_course_data(conn):
     """Verifies that course data is accessible and correct."""
     if not conn:
@@ -95,16 +204,16 @@ def verify_course_data(conn):
         rows = cursor.fetchall()
         print("\n--- Verifying inserted courses (first 5) ---")
         for row in rows:
-            course_id, name, description, embedding_json = row
+            course_id, name, description, embedding_blob = row
             print(f"ID: {course_id}, Name: {name}")
             print(f"  Description (partial): {description[:100]}...")
-            # Verify embedding is a valid JSON array
+            # Verify embedding decodes to a float32 vector
             try:
-                embedding_list = json.loads(embedding_json)
-                print(f"  Embedding (first 5 dims): {embedding_list[:5]}...")
-                print(f"  Embedding Dimension: {len(embedding_list)}")
-            except json.JSONDecodeError:
-                print(f"  Embedding: Invalid JSON for embedding")
+                embedding = decode_embedding(embedding_blob)
+                print(f"  Embedding (first 5 dims): {embedding[:5].tolist()}...")
+                print(f"  Embedding Dimension: {len(embedding)}")
+            except ValueError:
+                print(f"  Embedding: Invalid encoding for embedding")
             print("-" * 30)
     except Exception as e:
         print(f"Error verifying data: {e}")
@@ -113,14 +222,46 @@ def verify_course_data(conn):
 
 
 if __name__ == "__main__":
-    # Ensure your .env has TIDB_HOST, TIDB_PORT, TIDB_USER, TIDB_PASSWORD, OPENAI_API_KEY
+    # Ensure your .env has TIDB_HOST, TIDB_PORT, TIDB_USER, TIDB_PASSWORD
     # And that the 'courses' table exists in your TiDB cluster (from Day 5 schema)
+    parser = argparse.ArgumentParser(description="Ingest courses into TiDB.")
+    parser.add_argument(
+        "--source", help="JSONL or CSV file of courses to stream into the table"
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        help="Generate this many sample courses (default: 10 without batching)",
+    )
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument(
+        "--checkpoint", help="File used to record progress so reruns can resume"
+    )
+    args = parser.parse_args()
 
-    conn = connect_to_tidb()
+    conn = tidb_pool.acquire()
     if conn:
-        sample_courses = generate_sample_courses(
-            10
-        )  # Generate 10 courses for ingestion
-        insert_course_data(conn, sample_courses)
+        if args.source:
+            ingest_course_batches(
+                conn,
+                iter_courses_from_file(args.source),
+                args.source,
+                args.batch_size,
+                args.checkpoint,
+            )
+        elif args.sample:
+            ingest_course_batches(
+                conn,
+                iter_sample_courses(args.sample),
+                f"sample:{args.sample}",
+                args.batch_size,
+                args.checkpoint,
+            )
+        else:
+            sample_courses = generate_sample_courses(
+                10
+            )  # Generate 10 courses for ingestion
+            insert_course_data(conn, sample_courses)
         verify_course_data(conn)
-        conn.close()
+        tidb_pool.release(conn)
+        tidb_pool.close_all()
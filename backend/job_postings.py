@@ -0,0 +1,224 @@
+# backend/job_postings.py
+#
+# Content-addressed job postings. Each distinct posting (after whitespace
+# normalization) is stored once, keyed by the sha256 of its text; repeat
+# submissions reuse the stored row and embedding, bump `ref_count` and refresh
+# `last_seen_at`.
+#
+# Run the backfill once before deploying writers that use `save_job_posting`,
+# and again if duplicates were written while it was running:
+#
+#   python job_postings.py backfill --batch-size 500
+#   python job_postings.py prune --older-than-days 90
+
+import argparse
+import hashlib
+import time
+import uuid
+from db_pool import tidb_pool
+from embedding_cache import normalize_text
+from embedding_codec import decode_embedding, encode_embedding
+from migrate_embeddings import get_column_type
+
+CONTENT_HASH_INDEX = "uniq_job_postings_content_hash"
+
+
+def job_posting_hash(text: str) -> str:
+    """Returns the content hash identifying a job posting's normalized text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def find_job_posting(conn, content_hash: str):
+    """Returns (id, embedding) of the stored posting with this hash, or None."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT id, embedding FROM job_postings WHERE content_hash = %s",
+            (content_hash,),
+        )
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return (row[0], decode_embedding(row[1])) if row else None
+
+
+def lookup_job_posting(content_hash: str):
+    """
+    Like `find_job_posting`, using a pooled connection. Lookup failures are
+    treated as a miss so the caller simply encodes the posting itself.
+    """
+    try:
+        with tidb_pool.connection() as conn:
+            if conn:
+                return find_job_posting(conn, content_hash)
+    except Exception as e:
+        print(f"Error looking up job posting {content_hash[:12]}: {e}")
+    return None
+
+
+def save_job_posting(cursor, content_hash: str, raw_text: str, embedding) -> str:
+    """
+    Inserts a job posting, or records another reference to the existing row
+    with the same hash. Returns the id of the stored row. Runs on the
+    caller's cursor so it can share a transaction.
+    """
+    job_id = str(uuid.uuid4())
+    cursor.execute(
+        "INSERT INTO job_postings "
+        "(id, content_hash, raw_text, embedding, ref_count, last_seen_at) "
+        "VALUES (%s, %s, %s, %s, 1, NOW()) "
+        "ON DUPLICATE KEY UPDATE ref_count = ref_count + 1, last_seen_at = NOW()",
+        (job_id, content_hash, raw_text, encode_embedding(embedding)),
+    )
+    # One affected row means a new row was inserted; two means an update
+    if cursor.rowcount == 1:
+        return job_id
+    cursor.execute(
+        "SELECT id FROM job_postings WHERE content_hash = %s", (content_hash,)
+    )
+    return cursor.fetchone()[0]
+
+
+def has_index(cursor, table: str, index_name: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, index_name),
+    )
+    return cursor.fetchone() is not None
+
+
+def add_columns(cursor):
+    """Adds the content-addressing columns to job_postings if they are missing."""
+    if get_column_type(cursor, "job_postings", "content_hash") is None:
+        cursor.execute("ALTER TABLE job_postings ADD COLUMN content_hash CHAR(64) NULL")
+    if get_column_type(cursor, "job_postings", "ref_count") is None:
+        cursor.execute(
+            "ALTER TABLE job_postings ADD COLUMN ref_count INT NOT NULL DEFAULT 1"
+        )
+    if get_column_type(cursor, "job_postings", "last_seen_at") is None:
+        cursor.execute(
+            "ALTER TABLE job_postings "
+            "ADD COLUMN last_seen_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP"
+        )
+
+
+def hash_rows(conn, batch_size: int) -> int:
+    """Fills `content_hash` for rows that lack one. Returns the number of rows updated."""
+    cursor = conn.cursor()
+    last_id = ""
+    hashed = 0
+    started = time.perf_counter()
+    while True:
+        cursor.execute(
+            "SELECT id, raw_text FROM job_postings "
+            "WHERE id > %s AND content_hash IS NULL ORDER BY id LIMIT %s",
+            (last_id, batch_size),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "UPDATE job_postings SET content_hash = %s WHERE id = %s",
+            [(job_posting_hash(raw_text or ""), row_id) for row_id, raw_text in rows],
+        )
+        conn.commit()
+        last_id = rows[-1][0]
+        hashed += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"  {hashed} job postings hashed ({hashed / elapsed:.0f} rows/sec)")
+    cursor.close()
+    return hashed
+
+
+def merge_duplicates(conn) -> int:
+    """
+    Collapses every group of rows sharing a hash into the row with the
+    smallest id, summing their reference counts. Returns the number of rows
+    removed.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT content_hash FROM job_postings "
+        "WHERE content_hash IS NOT NULL GROUP BY content_hash HAVING COUNT(*) > 1"
+    )
+    duplicate_hashes = [row[0] for row in cursor.fetchall()]
+    removed = 0
+    for content_hash in duplicate_hashes:
+        conn.begin()
+        try:
+            cursor.execute(
+                "SELECT id, ref_count, last_seen_at FROM job_postings "
+                "WHERE content_hash = %s ORDER BY id FOR UPDATE",
+                (content_hash,),
+            )
+            rows = cursor.fetchall()
+            keep_id = rows[0][0]
+            seen = [row[2] for row in rows if row[2] is not None]
+            cursor.execute(
+                "UPDATE job_postings SET ref_count = %s, last_seen_at = %s WHERE id = %s",
+                (sum(row[1] for row in rows), max(seen) if seen else None, keep_id),
+            )
+            cursor.execute(
+                "DELETE FROM job_postings WHERE content_hash = %s AND id <> %s",
+                (content_hash, keep_id),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        removed += len(rows) - 1
+    cursor.close()
+    print(f"  Merged {len(duplicate_hashes)} duplicated postings ({removed} rows removed)")
+    return removed
+
+
+def backfill(conn, batch_size: int = 500):
+    """Adds the columns, hashes existing rows, merges duplicates and adds the unique index."""
+    cursor = conn.cursor()
+    print("Backfilling job_postings content hashes")
+    add_columns(cursor)
+    hash_rows(conn, batch_size)
+    merge_duplicates(conn)
+    if not has_index(cursor, "job_postings", CONTENT_HASH_INDEX):
+        cursor.execute(
+            f"ALTER TABLE job_postings ADD UNIQUE INDEX {CONTENT_HASH_INDEX} (content_hash)"
+        )
+        print(f"  Added unique index {CONTENT_HASH_INDEX}")
+    cursor.close()
+    print("Finished backfilling job_postings.")
+
+
+def prune(conn, older_than_days: int) -> int:
+    """Deletes postings nobody has submitted in `older_than_days` days. Returns the count."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "DELETE FROM job_postings WHERE last_seen_at < NOW() - INTERVAL %s DAY",
+        (older_than_days,),
+    )
+    deleted = cursor.rowcount
+    cursor.close()
+    print(f"Deleted {deleted} job postings not seen in {older_than_days} days.")
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain content-addressed job postings.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser(
+        "backfill", help="hash existing rows and merge duplicates"
+    )
+    backfill_parser.add_argument("--batch-size", type=int, default=500)
+    prune_parser = subparsers.add_parser(
+        "prune", help="delete postings that have not been seen recently"
+    )
+    prune_parser.add_argument("--older-than-days", type=int, required=True)
+    args = parser.parse_args()
+
+    with tidb_pool.connection() as conn:
+        if conn:
+            if args.command == "backfill":
+                backfill(conn, args.batch_size)
+            else:
+                prune(conn, args.older_than_days)
+    tidb_pool.close_all()
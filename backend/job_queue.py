@@ -0,0 +1,442 @@
+# backend/job_queue.py
+#
+# Durable background job queue backed by a local SQLite file, so web workers
+# can hand slow document processing to separate worker processes without an
+# external broker. Any process on the host can enqueue jobs or read their
+# status; workers claim jobs with a lease, so a job whose worker dies is
+# picked up again once the lease runs out.
+#
+# Start workers next to the web server (both must use the same
+# JOB_QUEUE_PATH):
+#
+#   python job_queue.py worker --processes 4
+#   python job_queue.py stats
+#   python job_queue.py prune --older-than-hours 24
+#
+# Or set JOB_WORKERS=N to have the web process start N workers itself.
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", ".job_queue.sqlite3")
+# Queued plus running jobs allowed before enqueue is refused
+JOB_QUEUE_MAX_PENDING = int(os.getenv("JOB_QUEUE_MAX_PENDING", 100))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", 2.0))
+# A running job whose worker has not renewed its lease within this time is
+# re-run; workers renew it every third of the lease while a job runs
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 300))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+
+# "module:attribute" naming the {kind: handler} mapping workers run
+JOB_HANDLERS = os.getenv("JOB_HANDLERS", "main:JOB_HANDLERS")
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+# Error codes from S3 and TiDB that are worth retrying
+TRANSIENT_S3_ERROR_CODES = frozenset(
+    ("SlowDown", "InternalError", "ServiceUnavailable", "RequestTimeout", "Throttling")
+)
+TRANSIENT_ERROR_TYPES = ("OperationalError", "InterfaceError", "EndpointConnectionError")
+
+
+class JobQueueFull(Exception):
+    """Raised by `enqueue` when JOB_QUEUE_MAX_PENDING jobs are already waiting."""
+
+
+class TransientJobError(Exception):
+    """Raised by a handler for failures that should be retried."""
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True for network, throttling and connection errors that may succeed on retry."""
+    if isinstance(error, (TransientJobError, ConnectionError, TimeoutError)):
+        return True
+    if type(error).__name__ in TRANSIENT_ERROR_TYPES:
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code") in TRANSIENT_S3_ERROR_CODES
+    return False
+
+
+class JobQueue:
+    """
+    Job table in a SQLite file shared by every process on the host.
+
+    Each operation opens its own short-lived connection, so the queue can be
+    used from any thread or process. Claims run in an IMMEDIATE transaction
+    so two workers never take the same job.
+    """
+
+    def __init__(
+        self,
+        path: str = JOB_QUEUE_PATH,
+        max_pending: int = JOB_QUEUE_MAX_PENDING,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_base_delay: float = JOB_RETRY_BASE_DELAY,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self.path = path
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.lease_seconds = lease_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "progress TEXT, result TEXT, error TEXT, worker TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+                "run_after REAL NOT NULL, lease_expires_at REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status_run_after ON jobs (status, run_after)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def enqueue(self, kind: str, payload: dict) -> str:
+        """Adds a job and returns its id. Raises JobQueueFull when the queue is at capacity."""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+                ).fetchone()[0]
+                if pending >= self.max_pending:
+                    raise JobQueueFull(f"{pending} jobs are already pending")
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at, run_after) "
+                    "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, kind, json.dumps(payload), now, now, now),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        """Returns the public view of a job, or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, attempts, progress, result, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, status, attempts, progress, result, error, created_at, updated_at = row
+        job = {
+            "jobId": job_id,
+            "kind": kind,
+            "status": status,
+            "attempts": attempts,
+            "progress": json.loads(progress) if progress else None,
+            "createdAt": created_at,
+            "updatedAt": updated_at,
+        }
+        if result is not None:
+            job["result"] = json.loads(result)
+        if error is not None:
+            job["error"] = error
+        if status == "queued":
+            job["position"] = self.position(created_at)
+        return job
+
+    def position(self, created_at: float) -> int:
+        """Number of queued jobs created before `created_at`, i.e. ahead of that job."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?",
+                (created_at,),
+            ).fetchone()[0]
+
+    def claim(self, worker: str) -> tuple[str, str, dict, int] | None:
+        """
+        Takes the oldest runnable job, or a running job whose lease expired.
+        Returns (id, kind, payload, attempt number) or None when there is no work.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker kept dying have used up their attempts
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Worker stopped while running the job', "
+                    "updated_at = ?, lease_expires_at = NULL "
+                    "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                row = conn.execute(
+                    "SELECT id, kind, payload, attempts FROM jobs "
+                    "WHERE (status = 'queued' AND run_after <= ?) "
+                    "OR (status = 'running' AND lease_expires_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                job_id, kind, payload, attempts = row
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = ?, worker = ?, "
+                    "updated_at = ?, lease_expires_at = ? WHERE id = ?",
+                    (attempts + 1, worker, now, now + self.lease_seconds, job_id),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return job_id, kind, json.loads(payload), attempts + 1
+
+    # The methods below only write while `worker` still holds attempt
+    # `attempt` of the job, so a worker whose lease expired and whose job was
+    # claimed again cannot overwrite the newer attempt. They return False when
+    # the lease was lost.
+
+    def _update_owned(
+        self, conn, assignments: str, params: tuple, job_id: str, worker: str, attempt: int
+    ) -> bool:
+        return conn.execute(
+            f"UPDATE jobs SET {assignments} "
+            "WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'",
+            (*params, job_id, worker, attempt),
+        ).rowcount == 1
+
+    def renew_lease(self, job_id: str, worker: str, attempt: int) -> bool:
+        """Extends the lease on a running job by `lease_seconds` from now."""
+        with self._connect() as conn:
+            return self._update_owned(
+                conn, "lease_expires_at = ?", (time.time() + self.lease_seconds,),
+                job_id, worker, attempt,
+            )
+
+    def update_progress(self, job_id: str, worker: str, attempt: int, progress: dict) -> bool:
+        """Records the job's progress and renews its lease."""
+        now = time.time()
+        with self._connect() as conn:
+            return self._update_owned(
+                conn, "progress = ?, updated_at = ?, lease_expires_at = ?",
+                (json.dumps(progress), now, now + self.lease_seconds),
+                job_id, worker, attempt,
+            )
+
+    def complete(self, job_id: str, worker: str, attempt: int, result: dict) -> bool:
+        with self._connect() as conn:
+            return self._update_owned(
+                conn, "status = 'succeeded', result = ?, error = NULL, "
+                "updated_at = ?, lease_expires_at = NULL",
+                (json.dumps(result), time.time()),
+                job_id, worker, attempt,
+            )
+
+    def fail(self, job_id: str, worker: str, attempt: int, error: str, retry: bool) -> bool:
+        """
+        Records a failed attempt. Retryable failures go back on the queue with
+        exponential backoff until `max_attempts` is used up. Returns True if
+        the job will be retried.
+        """
+        now = time.time()
+        retry = retry and attempt < self.max_attempts
+        with self._connect() as conn:
+            if retry:
+                retry = self._update_owned(
+                    conn, "status = 'queued', error = ?, updated_at = ?, "
+                    "run_after = ?, lease_expires_at = NULL",
+                    (error, now, now + self.retry_base_delay * 2 ** (attempt - 1)),
+                    job_id, worker, attempt,
+                )
+            else:
+                self._update_owned(
+                    conn, "status = 'failed', error = ?, updated_at = ?, lease_expires_at = NULL",
+                    (error, now),
+                    job_id, worker, attempt,
+                )
+        return retry
+
+    def stats(self) -> dict:
+        """Number of jobs in each status."""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Deletes finished jobs last updated more than `older_than_seconds` ago."""
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                (time.time() - older_than_seconds,),
+            ).rowcount
+        return deleted
+
+
+def load_handlers(spec: str = JOB_HANDLERS) -> dict:
+    """Imports the {kind: handler} mapping named by a "module:attribute" spec."""
+    module_name, attribute = spec.split(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def keep_lease(queue: JobQueue, job_id: str, worker: str, attempt: int, stopped: threading.Event):
+    """Renews the lease on a job every third of `lease_seconds` until `stopped` is set."""
+    while not stopped.wait(queue.lease_seconds / 3):
+        try:
+            if not queue.renew_lease(job_id, worker, attempt):
+                print(f"Job {job_id} attempt {attempt} lost its lease; its result will be discarded")
+                return
+        except Exception as e:
+            print(f"Job {job_id} lease renewal failed: {e}")
+
+
+def run_job(queue: JobQueue, handlers: dict, worker: str) -> bool:
+    """
+    Claims and runs one job. A handler is called as `handler(payload,
+    progress)`, where `progress(stage)` records the stage it has reached, and
+    returns the job's JSON result. The job's lease is renewed while the
+    handler runs. Returns False when the queue was empty.
+    """
+    claimed = queue.claim(worker)
+    if claimed is None:
+        return False
+    job_id, kind, payload, attempt = claimed
+    handler = handlers.get(kind)
+    if handler is None:
+        queue.fail(job_id, worker, attempt, f"Unknown job kind: {kind}", retry=False)
+        return True
+
+    def progress(stage: str):
+        queue.update_progress(job_id, worker, attempt, {"stage": stage, "at": time.time()})
+
+    stopped = threading.Event()
+    heartbeat = threading.Thread(
+        target=keep_lease, args=(queue, job_id, worker, attempt, stopped), daemon=True
+    )
+    heartbeat.start()
+    started = time.perf_counter()
+    try:
+        result = handler(payload, progress)
+    except Exception as e:
+        retrying = queue.fail(job_id, worker, attempt, str(e), retry=is_transient_error(e))
+        print(
+            f"Job {job_id} ({kind}) attempt {attempt} failed: {e}"
+            + (" - will retry" if retrying else "")
+        )
+        return True
+    finally:
+        stopped.set()
+        heartbeat.join()
+    if not queue.complete(job_id, worker, attempt, result):
+        print(f"Job {job_id} ({kind}) attempt {attempt} finished after losing its lease; result discarded")
+        return True
+    print(f"Job {job_id} ({kind}) finished in {time.perf_counter() - started:.2f}s")
+    return True
+
+
+def worker_loop(
+    path: str = JOB_QUEUE_PATH,
+    handlers_spec: str = JOB_HANDLERS,
+    parent_pid: int | None = None,
+):
+    """
+    Drains the queue until terminated; the entry point of each worker
+    process. With `parent_pid`, the worker also stops once that process has
+    exited, so workers are not left behind by a parent that was killed.
+    """
+    # Exit normally on SIGTERM so process pools started by handlers are shut
+    # down; a job cut short is re-run once its lease expires
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    queue = JobQueue(path)
+    handlers = load_handlers(handlers_spec)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Job worker {worker} started for {', '.join(handlers)}")
+    while parent_pid is None or os.getppid() == parent_pid:
+        try:
+            if not run_job(queue, handlers, worker):
+                time.sleep(JOB_POLL_INTERVAL)
+        except Exception as e:
+            # Queue errors (e.g. a locked database) should not kill the worker
+            print(f"Job worker {worker} error: {e}")
+            time.sleep(JOB_POLL_INTERVAL)
+    print(f"Job worker {worker} stopping: parent process {parent_pid} has exited")
+
+
+def start_workers(
+    count: int, path: str = JOB_QUEUE_PATH, handlers_spec: str = JOB_HANDLERS
+) -> list:
+    """
+    Starts `count` worker processes and returns them. Stop them with
+    `stop_workers`.
+
+    Workers are not daemonic, since daemonic processes cannot start children
+    and handlers use process pools (e.g. for large PDFs). Instead each one
+    exits by itself if this process dies without stopping it.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for i in range(count):
+        process = context.Process(
+            target=worker_loop,
+            args=(path, handlers_spec, os.getpid()),
+            name=f"job-worker-{i}",
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_workers(processes: list, timeout: float = 10.0):
+    """Terminates worker processes, killing any that have not exited within `timeout` seconds."""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(deadline - time.monotonic(), 0))
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run and inspect the background job queue.")
+    parser.add_argument("--path", default=JOB_QUEUE_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    worker_parser = subparsers.add_parser("worker", help="process jobs until interrupted")
+    worker_parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    worker_parser.add_argument("--handlers", default=JOB_HANDLERS)
+    subparsers.add_parser("stats", help="print the number of jobs in each status")
+    prune_parser = subparsers.add_parser("prune", help="delete old finished jobs")
+    prune_parser.add_argument("--older-than-hours", type=float, required=True)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        processes = start_workers(args.processes, args.path, args.handlers)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            stop_workers(processes)
+    elif args.command == "stats":
+        print(json.dumps(JobQueue(args.path).stats(), indent=2))
+    else:
+        deleted = JobQueue(args.path).prune(args.older_than_hours * 3600)
+        print(f"Deleted {deleted} finished jobs.")
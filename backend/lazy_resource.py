@@ -0,0 +1,46 @@
+# backend/lazy_resource.py
+
+import threading
+import time
+
+
+class LazyResource:
+    """
+    Creates an expensive object (model, SDK client, ...) on first use.
+
+    The factory runs at most once, even when several threads ask for the
+    resource at the same time. `get()` can also be called ahead of time from a
+    warmup hook so the first request does not pay the initialization cost.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self._ready = False
+        self.load_seconds = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self):
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                started = time.perf_counter()
+                self._value = self._factory()
+                self.load_seconds = time.perf_counter() - started
+                self._ready = True
+                print(f"Initialized {self.name} in {self.load_seconds:.2f}s")
+        return self._value
+
+    def replace(self, factory):
+        """Swaps in a new factory (e.g. a local stand-in) and drops any created value."""
+        with self._lock:
+            self._ready = False
+            self._factory = factory
+            self._value = None
+            self.load_seconds = None
@@ -0,0 +1,167 @@
+# backend/llm_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt_input(value):
+    """Collapses whitespace in string inputs so trivially different prompts share a key."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def llm_cache_key(template_id: str, model: str, temperature: float, inputs: dict) -> str:
+    """Returns the cache key for one LLM call."""
+    payload = json.dumps(
+        {
+            "template": template_id,
+            "model": model,
+            "temperature": temperature,
+            "inputs": {k: normalize_prompt_input(v) for k, v in inputs.items()},
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteResponseStore:
+    """
+    Persistent response store shared by every worker process on a host.
+
+    Each operation opens its own short-lived connection, so the store can be
+    used from any thread. Rows past their expiry are ignored on read and
+    removed during eviction.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str, now: float):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, value, expires_at: float, now: float):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._writes += 1
+            # Evict periodically rather than on every write
+            if self._writes % 100 == 0:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class LLMResponseCache:
+    """
+    TTL- and size-bounded cache for LLM responses.
+
+    Entries live in an in-memory LRU and, if `sqlite_path` is given, in a
+    SQLite file shared across workers.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400,
+        max_entries: int = 1000,
+        sqlite_path: str | None = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._store = SQLiteResponseStore(sqlite_path, max_entries) if sqlite_path else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        """Returns the cached value for `key`, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+        if self._store is not None:
+            entry = self._store.get(key, now)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, *entry)
+                    self.hits += 1
+                return entry[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, value, expires_at: float):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, value):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self._store is not None:
+            self._store.put(key, value, expires_at, now)
+
+    def get_or_compute(self, key: str, compute, bypass: bool = False):
+        """
+        Returns (value, hit). On a miss, or when `bypass` is set, calls
+        `compute()` and stores its result.
+        """
+        if not bypass:
+            value = self.get(key)
+            if value is not None:
+                return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+            }
@@ -0,0 +1,236 @@
+# backend/llm_chains.py
+
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from lazy_resource import LazyResource
+from llm_cache import LLMResponseCache, llm_cache_key
+from metrics import CACHE_LOOKUPS, record_stage, stage
+
+# Load environment variables from .env file
+load_dotenv()
+
+# "anthropic" (default) or "fake", which answers from a canned list without
+# calling any API and can stand in for Claude in tests and load runs
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "anthropic")
+LLM_MODEL = "claude-3-haiku-20240307" if LLM_PROVIDER != "fake" else "fake"
+LLM_TEMPERATURE = 0.7
+
+# Batch rewrites share this many concurrent LLM calls per process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 1.0))
+
+# Template identities are part of the cache key; bump the version whenever a
+# prompt's wording changes so stale responses are not served
+GENERATE_TEMPLATE_ID = "generate_text:v1"
+REWRITE_TEMPLATE_ID = "rewrite_bullet:v1"
+
+GENERATE_MESSAGES = [("system", "You are a helpful AI assistant."), ("user", "{input}")]
+
+# Define the prompt template for bullet point rewriting
+REWRITE_MESSAGES = [
+    (
+        "system",
+        "You are an expert resume writer. Your task is to rewrite a given resume bullet point to be more impactful, quantifiable, and tailored to a specific job description. Focus on achievements and results, using strong action verbs. Ensure the rewritten bullet point is concise and relevant to the job requirements.",
+    ),
+    (
+        "user",
+        "Original Resume Bullet Point: {bullet_point}\n\nJob Description:\n{job_description}\n\nRewrite the resume bullet point to be more impactful and relevant to the job description. Start directly with the rewritten bullet point, no introductory phrases.",
+    ),
+]
+
+
+def create_llm():
+    if LLM_PROVIDER == "fake":
+        from langchain_core.language_models.fake_chat_models import (
+            FakeListChatModel,
+        )
+
+        return FakeListChatModel(
+            responses=[os.getenv("FAKE_LLM_RESPONSE", "Fake LLM response.")]
+        )
+
+    # Initialize the Claude LLM
+    from langchain_anthropic import ChatAnthropic
+
+    return ChatAnthropic(
+        model=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+        anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
+    )
+
+
+llm = LazyResource("Claude LLM", create_llm)
+
+
+def build_chain(messages):
+    """Builds a Prompt -> LLM -> Output Parser chain for the given messages."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
+    return ChatPromptTemplate.from_messages(messages) | llm.get() | StrOutputParser()
+
+
+# Each chain is built once, on first use, and shared by every request
+generate_chain = LazyResource(
+    "generate_text chain", lambda: build_chain(GENERATE_MESSAGES)
+)
+rewrite_chain = LazyResource("rewrite_bullet chain", lambda: build_chain(REWRITE_MESSAGES))
+
+# Response cache in front of the chains. Set LLM_CACHE_SQLITE_PATH to share
+# cached responses between worker processes.
+llm_response_cache = LLMResponseCache(
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL", 86400)),
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", 1000)),
+    sqlite_path=os.getenv("LLM_CACHE_SQLITE_PATH") or None,
+)
+
+
+def invoke_cached(template_id: str, chain, inputs: dict, bypass_cache: bool = False):
+    """
+    Invokes `chain` (a LazyResource) with `inputs`, serving repeated calls from
+    the response cache. Returns (output, cache_hit).
+    """
+    key = llm_cache_key(template_id, LLM_MODEL, LLM_TEMPERATURE, inputs)
+
+    def compute():
+        with stage("llm"):
+            return chain.get().invoke(inputs)
+
+    output, cache_hit = llm_response_cache.get_or_compute(key, compute, bypass=bypass_cache)
+    CACHE_LOOKUPS.inc(cache="llm", result="hit" if cache_hit else "miss")
+    return output, cache_hit
+
+
+def stream_cached(template_id: str, chain, inputs: dict, bypass_cache: bool = False):
+    """
+    Streams `chain` output as ("token", text) items followed by one
+    ("done", info) item with the full text and timing. Cached responses are
+    sent as a single token. Closing the generator (e.g. when the client
+    disconnects) closes the upstream LLM stream.
+    """
+    started = time.perf_counter()
+    key = llm_cache_key(template_id, LLM_MODEL, LLM_TEMPERATURE, inputs)
+    cached = None if bypass_cache else llm_response_cache.get(key)
+    CACHE_LOOKUPS.inc(cache="llm", result="miss" if cached is None else "hit")
+    if cached is not None:
+        yield "token", cached
+        elapsed = round((time.perf_counter() - started) * 1000, 1)
+        yield "done", {
+            "text": cached,
+            "cached": True,
+            "timing": {"timeToFirstTokenMs": elapsed, "totalMs": elapsed},
+        }
+        return
+
+    time_to_first_token = None
+    parts = []
+    stream = chain.get().stream(inputs)
+    try:
+        for chunk in stream:
+            if not chunk:
+                continue
+            if time_to_first_token is None:
+                time_to_first_token = round((time.perf_counter() - started) * 1000, 1)
+                record_stage("llm_first_token", time_to_first_token / 1000)
+            parts.append(chunk)
+            yield "token", chunk
+    finally:
+        # Runs on normal completion and on GeneratorExit from a disconnect
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+    text = "".join(parts)
+    record_stage("llm", time.perf_counter() - started)
+    llm_response_cache.put(key, text)
+    yield "done", {
+        "text": text,
+        "cached": False,
+        "timing": {
+            "timeToFirstTokenMs": time_to_first_token,
+            "totalMs": round((time.perf_counter() - started) * 1000, 1),
+        },
+    }
+
+
+def is_retryable_llm_error(error: Exception) -> bool:
+    """True for rate-limit (429) and overloaded (529) errors from the LLM API."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in (429, 529) or type(error).__name__ in (
+        "RateLimitError",
+        "OverloadedError",
+    )
+
+
+def retry_delay(error: Exception, attempt: int, base_delay: float) -> float:
+    """Uses the server's Retry-After header when present, else jittered exponential backoff."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return base_delay * (2**attempt) * (0.5 + random.random())
+
+
+def invoke_with_retry(
+    fn, max_retries: int = LLM_MAX_RETRIES, base_delay: float = LLM_RETRY_BASE_DELAY
+):
+    """Calls `fn()`, retrying rate-limited calls with backoff."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_llm_error(e):
+                raise
+            time.sleep(retry_delay(e, attempt, base_delay))
+            attempt += 1
+
+
+# Shared pool that caps concurrent LLM calls made by batch endpoints
+llm_executor = ThreadPoolExecutor(
+    max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm"
+)
+
+
+def rewrite_bullets(
+    bullet_points: list[str],
+    job_description: str,
+    bypass_cache: bool = False,
+    chain=None,
+    executor=None,
+) -> list[dict]:
+    """
+    Rewrites every bullet point against one job description, running the
+    calls concurrently on `executor` (the shared LLM pool by default).
+
+    Results come back in input order; a failed item carries an `error`
+    instead of `rewrittenBullet`. `chain` can be any LazyResource-like object
+    whose `get()` returns a runnable, which lets tests pass a fake LLM chain.
+    """
+    chain = chain or rewrite_chain
+    executor = executor or llm_executor
+
+    def rewrite(bullet_point: str) -> dict:
+        inputs = {"bullet_point": bullet_point, "job_description": job_description}
+        try:
+            rewritten, cache_hit = invoke_with_retry(
+                lambda: invoke_cached(REWRITE_TEMPLATE_ID, chain, inputs, bypass_cache)
+            )
+            return {
+                "bulletPoint": bullet_point,
+                "rewrittenBullet": rewritten,
+                "cached": cache_hit,
+            }
+        except Exception as e:
+            return {"bulletPoint": bullet_point, "error": str(e)}
+
+    return list(executor.map(rewrite, bullet_points))
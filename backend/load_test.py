@@ -0,0 +1,205 @@
+# backend/load_test.py
+#
+# Compares concurrent request capacity of the threaded and async serving
+# modes (serve.py) against the local stand-ins in standins.py, so no AWS,
+# TiDB or Anthropic credentials are needed.
+#
+#   python load_test.py                                  # both modes, all scenarios
+#   python load_test.py --concurrency 200 --requests 1000 --scenario rewrite_bullet
+#   python load_test.py --output load_test.json
+#
+# For each mode a server is started in a subprocess, `--requests` requests
+# are sent with `--concurrency` clients, and throughput, p50/p99 latency and
+# the average number of requests in flight are reported.
+
+import argparse
+import base64
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+SCENARIOS = ("rewrite_bullet", "analyze_resume", "vector_search")
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def make_resume_docx() -> bytes:
+    """Builds a small one-page DOCX resume."""
+    from docx import Document
+
+    document = Document()
+    document.add_heading("Jane Doe", 0)
+    document.add_paragraph("Senior Software Engineer")
+    for i in range(12):
+        document.add_paragraph(
+            f"Built and operated service {i} handling 10k requests per second "
+            "with Python, AWS and Kubernetes.",
+            style="List Bullet",
+        )
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def build_request(scenario: str, i: int, resume_b64: str) -> tuple[str, dict]:
+    """Returns (path, JSON body) for request number `i`; inputs vary to avoid cache hits."""
+    if scenario == "rewrite_bullet":
+        return "/rewrite_bullet", {
+            "bulletPoint": f"Improved checkout latency for release {i}",
+            "jobDescription": "Backend engineer focused on performance.",
+        }
+    if scenario == "analyze_resume":
+        return "/analyze_resume", {
+            "resumeFileBase64": resume_b64,
+            "resumeFileName": f"resume-{i}.docx",
+            "resumeFileType": DOCX_TYPE,
+            "jobPostingText": f"Backend engineer {i} with Python and AWS experience.",
+        }
+    rng = np.random.default_rng(i)
+    return "/vector_search", {
+        "queryEmbedding": rng.standard_normal(384).tolist(),
+        "searchType": "resumes",
+        "limit": 5,
+    }
+
+
+def send(base_url: str, path: str, body: dict, timeout: float) -> tuple[float, int]:
+    """Sends one POST and returns (latency in seconds, HTTP status or 0 on failure)."""
+    data = json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(
+        base_url + path, data=data, headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return time.perf_counter() - started, status
+
+
+def run_scenario(base_url: str, scenario: str, requests: int, concurrency: int, timeout: float) -> dict:
+    resume_b64 = base64.b64encode(make_resume_docx()).decode("ascii")
+    bodies = [build_request(scenario, i, resume_b64) for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(
+            pool.map(lambda item: send(base_url, item[0], item[1], timeout), bodies)
+        )
+    wall = time.perf_counter() - started
+
+    latencies = np.array([latency for latency, status in results if status == 200])
+    errors = sum(1 for _, status in results if status != 200)
+    return {
+        "scenario": scenario,
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": int(latencies.size),
+        "errors": errors,
+        "wallSeconds": round(wall, 2),
+        "requestsPerSecond": round(latencies.size / wall, 1),
+        "p50Ms": round(float(np.percentile(latencies, 50)) * 1000, 1) if latencies.size else None,
+        "p99Ms": round(float(np.percentile(latencies, 99)) * 1000, 1) if latencies.size else None,
+        # Little's law: average number of requests being served at once
+        "avgInFlight": round(float(latencies.sum()) / wall, 1),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(base_url: str, process, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start in time")
+
+
+def run_mode(mode: str, args) -> list[dict]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [
+        sys.executable,
+        "serve.py",
+        "--mode", mode,
+        "--port", str(port),
+        "--workers", str(args.workers),
+        "--cpu-threads", str(args.cpu_threads),
+        "--standins",
+    ]
+    env = dict(
+        os.environ,
+        EMBEDDING_CACHE_DIR="",
+        TIDB_POOL_SIZE=str(args.db_pool_size),
+        STANDIN_S3_LATENCY_MS=str(args.s3_latency_ms),
+        STANDIN_DB_LATENCY_MS=str(args.db_latency_ms),
+        STANDIN_LLM_LATENCY_MS=str(args.llm_latency_ms),
+    )
+    process = subprocess.Popen(
+        command,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(base_url, process)
+        results = []
+        for scenario in args.scenario:
+            result = run_scenario(base_url, scenario, args.requests, args.concurrency, args.timeout)
+            result["mode"] = mode
+            results.append(result)
+            print(
+                f"{mode:>8} {scenario:<15} {result['requestsPerSecond']:>8.1f} req/s  "
+                f"p50 {result['p50Ms']}ms  p99 {result['p99Ms']}ms  "
+                f"in flight {result['avgInFlight']:>6.1f}  errors {result['errors']}"
+            )
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the serving modes against local stand-ins.")
+    parser.add_argument("--mode", nargs="+", choices=["threaded", "async"], default=["threaded", "async"])
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8, help="threaded mode worker threads")
+    parser.add_argument("--cpu-threads", type=int, default=4, help="async mode CPU threads")
+    parser.add_argument("--db-pool-size", type=int, default=20)
+    parser.add_argument("--s3-latency-ms", type=float, default=40)
+    parser.add_argument("--db-latency-ms", type=float, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    all_results = []
+    for mode in args.mode:
+        all_results.extend(run_mode(mode, args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(all_results, f, indent=2)
+        print(f"Wrote results to {args.output}")
@@ -1,71 +1,194 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import atexit
 import base64
+import json
+import math
 import os
-import boto3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import NoCredentialsError, ClientError
 from dotenv import load_dotenv
-from parser_utils import parse_document
-from embedding_utils import get_text_embedding  # Import the embedding utility
-import pymysql
-import json
+from cpu_offload import run_cpu_bound
+from parser_utils import DocumentParseError, parse_document
+from embedding_utils import (
+    get_text_embedding,
+    get_multiple_text_embeddings,
+    embeddings_model,
+    warmup_embeddings,
+)  # Import the embedding utility
+from lazy_resource import LazyResource
+import metrics
+from metrics import CACHE_LOOKUPS, current_timings, stage
+from llm_chains import (
+    llm,
+    generate_chain,
+    rewrite_chain,
+    invoke_cached,
+    rewrite_bullets,
+    stream_cached,
+    llm_response_cache,
+    GENERATE_TEMPLATE_ID,
+    REWRITE_TEMPLATE_ID,
+)
+from s3_streaming import S3MultipartWriter, UploadTooLargeError
+from werkzeug.formparser import parse_form_data
+from db_pool import tidb_pool
+from job_queue import JobQueue, JobQueueFull, start_workers, stop_workers
+from job_postings import job_posting_hash, lookup_job_posting, save_job_posting
+from resume_store import (
+    content_hash_from_key,
+    lookup_resume,
+    original_file_name_metadata,
+    resume_content_hash,
+    resume_s3_key,
+    save_resume,
+)
 import uuid  # For generating unique IDs
-import numpy as np
-from langchain_anthropic import ChatAnthropic
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from embedding_codec import (
+    decode_embedding,
+    encode_embedding_for_wire,
+    decode_embedding_from_wire,
+    WIRE_ENCODINGS,
+)
+from ann_index import IVFPQIndex
+from skill_index import course_skill_index, course_terms, fetch_course_term_rows, fuse_scores
+from vector_index import (
+    PREVIEW_CHARS,
+    ChangeTracker,
+    database_now,
+    resume_index,
+    course_index,
+    resume_metadata,
+    course_metadata,
+    hydrate_results,
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
+metrics.init_app(app)  # Request metrics and Server-Timing headers
 
 # AWS S3 Configuration
 S3_BUCKET = os.getenv("AWS_S3_BUCKET_NAME")
 S3_REGION = os.getenv("AWS_REGION")
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=S3_REGION,
+# Streaming upload limits
+MAX_RESUME_UPLOAD_BYTES = int(os.getenv("MAX_RESUME_UPLOAD_BYTES", 10 * 1024 * 1024))
+MAX_FORM_FIELDS_BYTES = int(os.getenv("MAX_FORM_FIELDS_BYTES", 1024 * 1024))
+S3_UPLOAD_PART_SIZE = int(os.getenv("S3_UPLOAD_PART_SIZE", 8 * 1024 * 1024))
+
+# Course searches with `queryText` keep at most this many BM25 matches for
+# dense scoring and weight keyword scores by COURSE_KEYWORD_WEIGHT
+COURSE_MAX_CANDIDATES = int(os.getenv("COURSE_MAX_CANDIDATES", 1000))
+COURSE_KEYWORD_WEIGHT = float(os.getenv("COURSE_KEYWORD_WEIGHT", 0.3))
+
+# Searches apply rows written by other processes (other workers, job
+# workers, ingest_courses.py) at most every INDEX_REFRESH_SECONDS, looking
+# back INDEX_REFRESH_OVERLAP_SECONDS for transactions that committed late
+INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", 5))
+INDEX_REFRESH_OVERLAP_SECONDS = float(os.getenv("INDEX_REFRESH_OVERLAP_SECONDS", 10))
+
+# /process_documents requests with `"async": true` are queued in a local
+# SQLite job queue (see job_queue.py). JOB_WORKERS > 0 makes this process
+# start that many worker processes on the first queued job; otherwise run
+# `python job_queue.py worker` separately.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 0))
+JOB_RETRY_AFTER_SECONDS = int(os.getenv("JOB_RETRY_AFTER_SECONDS", 5))
+
+# Largest list accepted by /rewrite_bullets
+MAX_BULLETS_PER_BATCH = int(os.getenv("MAX_BULLETS_PER_BATCH", 50))
+
+# Threads for network I/O that runs alongside request work (e.g. S3 writes)
+io_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IO_EXECUTOR_WORKERS", 8)), thread_name_prefix="io"
 )
 
-# TiDB Connection Details
-DB_HOST = os.getenv("TIDB_HOST")
-DB_PORT = int(os.getenv("TIDB_PORT", 4000))
-DB_USER = os.getenv("TIDB_USER")
-DB_PASSWORD = os.getenv("TIDB_PASSWORD")
-DB_NAME = os.getenv("TIDB_NAME", "test")  # Default database name
 
+def create_s3_client():
+    import boto3
 
-def connect_to_tidb():
-    """Establishes a connection to TiDB Serverless."""
-    try:
-        conn = pymysql.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            autocommit=True,
-            ssl={
-                "ssl": {"ssl_mode": "VERIFY_IDENTITY"}
-            },  # Ensure changes are committed
-        )
-        return conn
-    except Exception as e:
-        print(f"Error connecting to TiDB: {e}")
-        return None
+    return boto3.client(
+        "s3",
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        region_name=S3_REGION,
+    )
+
+
+# Heavy clients are created on first use or by `warmup()`, keeping imports and
+# worker boot fast
+s3_client = LazyResource("S3 client", create_s3_client)
+LAZY_RESOURCES = (s3_client, llm, embeddings_model)
+
+# Approximate (IVF-PQ) index for resume search, built with
+# `python ann_index.py build`. When set, resume searches use it instead of
+# the resident exact index. ANN_NPROBE trades recall for latency per query.
+RESUME_ANN_INDEX_PATH = os.getenv("RESUME_ANN_INDEX_PATH")
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 16))
+ANN_RERANK = int(os.getenv("ANN_RERANK", 200))
+
+
+def load_resume_ann_index() -> IVFPQIndex:
+    """Opens the ANN index and tracks resumes written since it was built or updated."""
+    index = IVFPQIndex.load(RESUME_ANN_INDEX_PATH)
+    watermark = index.watermark
+    if watermark is None:
+        print("ANN index has no build time; run `python ann_index.py update` to add older resumes.")
+        with tidb_pool.connection() as conn:
+            watermark = database_now(conn) if conn else None
+    resume_ann_changes.start(watermark)
+    return index
 
 
-# Initialize the Claude LLM
-llm = ChatAnthropic(
-    model="claude-3-haiku-20240307",
-    temperature=0.7,
-    anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
+resume_ann_index = (
+    LazyResource("resume ANN index", load_resume_ann_index)
+    if RESUME_ANN_INDEX_PATH
+    else None
 )
+if resume_ann_index is not None:
+    LAZY_RESOURCES += (resume_ann_index,)
+
+job_queue = LazyResource("job queue", JobQueue)
+
+
+def start_job_workers() -> list:
+    """Starts JOB_WORKERS worker processes, stopped again when this process exits."""
+    processes = start_workers(JOB_WORKERS)
+    atexit.register(stop_workers, processes)
+    return processes
+
+
+job_workers = LazyResource("job workers", start_job_workers)
+
+
+def warmup():
+    """Initializes every lazy resource so the first real request is fast."""
+    s3_client.get()
+    generate_chain.get()
+    rewrite_chain.get()
+    warmup_embeddings()
+    if resume_ann_index is not None:
+        resume_ann_index.get()
+
+
+def start_background_warmup():
+    """Runs `warmup()` on a daemon thread so the server can accept requests meanwhile."""
+
+    def run():
+        try:
+            warmup()
+        except Exception as e:
+            print(f"Warmup failed: {e}")
+
+    threading.Thread(target=run, name="warmup", daemon=True).start()
+
+
+if os.getenv("WARMUP_ON_START", "false").lower() == "true":
+    start_background_warmup()
 
 
 @app.route("/")
@@ -75,14 +198,56 @@ def home():
             "message": "AI Career Coach API is running!",
             "endpoints": {
                 "upload_resume": "/upload_resume (POST)",
+                "upload_resume_stream": "/upload_resume_stream (POST, multipart/form-data)",
                 "process_documents": "/process_documents (POST)",
+                "analyze_resume": "/analyze_resume (POST)",
                 "vector_search": "/vector_search (POST)",
                 "generate_text": "/generate_text (POST)",
+                "rewrite_bullets": "/rewrite_bullets (POST)",
+                "generate_text_stream": "/generate_text/stream (POST, text/event-stream)",
+                "rewrite_bullet_stream": "/rewrite_bullet/stream (POST, text/event-stream)",
+                "db_pool_stats": "/db_pool_stats (GET)",
+                "ready": "/ready (GET)",
+                "llm_cache_stats": "/llm_cache_stats (GET)",
+                "metrics": "/metrics (GET, Prometheus text format)",
+                "job_status": "/jobs/<job_id> (GET)",
             },
         }
     )
 
 
+@app.route("/ready")
+def ready_endpoint():
+    resources = {resource.name: resource.ready for resource in LAZY_RESOURCES}
+    ready = all(resources.values())
+    return jsonify({"ready": ready, "resources": resources}), 200 if ready else 503
+
+
+@app.route("/db_pool_stats")
+def db_pool_stats_endpoint():
+    return jsonify(tidb_pool.stats())
+
+
+metrics.gauge(
+    "db_pool_connections",
+    "TiDB connections held by this process's pool.",
+    lambda: {state: tidb_pool.stats()[state] for state in ("in_use", "idle")},
+    labelname="state",
+)
+
+metrics.gauge(
+    "job_queue_jobs",
+    "Background jobs by status.",
+    lambda: job_queue.get().stats() if job_queue.ready else {},
+    labelname="status",
+)
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/upload_resume", methods=["POST"])
 def upload_resume_endpoint():
     data = request.json
@@ -105,11 +270,149 @@ def upload_resume_endpoint():
             400,
         )
 
+    try:
+        include_embeddings, embedding_encoding = embedding_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         resume_bytes = base64.b64decode(resume_file_b64)
-        s3_key = f"resumes/{resume_file_name}"
+        content_hash = resume_content_hash(resume_bytes)
+        with stage("resume_lookup"):
+            existing_resume = lookup_resume(content_hash)
+        record_resume_lookup(existing_resume)
+        if existing_resume:
+            # Same bytes as a stored resume: skip the write and hand back its results
+            return jsonify(
+                {
+                    "message": "Resume already uploaded",
+                    "s3Url": existing_resume["s3Url"],
+                    "jobPostingText": job_posting_text,
+                    "resumeFileType": resume_file_type,
+                    "contentHash": content_hash,
+                    **reused_resume_fields(
+                        existing_resume, include_embeddings, embedding_encoding
+                    ),
+                }
+            )
+
+        s3_key = resume_s3_key(content_hash, resume_file_name)
+        with stage("s3_put"):
+            s3_client.get().put_object(
+                Bucket=S3_BUCKET,
+                Key=s3_key,
+                Body=resume_bytes,
+                Metadata=original_file_name_metadata(resume_file_name),
+            )
+
+        s3_url = f"https://{S3_BUCKET}.s3.{S3_REGION}.amazonaws.com/{s3_key}"
+
+        return jsonify(
+            {
+                "message": "File uploaded to S3 successfully!",
+                "s3Url": s3_url,
+                "jobPostingText": job_posting_text,
+                "resumeFileType": resume_file_type,
+                "contentHash": content_hash,
+                "resumeReused": False,
+            }
+        )
+    except NoCredentialsError:
+        return jsonify({"error": "AWS credentials not available"}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/upload_resume_stream", methods=["POST"])
+def upload_resume_stream_endpoint():
+    """
+    Streaming alternative to /upload_resume. Takes multipart/form-data with a
+    `resumeFile` file part and a `jobPostingText` field, and pipes the file
+    straight into an S3 multipart upload so memory use stays flat.
+
+    The content hash is only known once the file has been streamed, so it is
+    written under a temporary key and then either copied to its
+    content-addressed key or, if the same file is already stored, deleted.
+    """
+    if not (request.mimetype or "").startswith("multipart/form-data"):
+        return jsonify({"error": "Expected multipart/form-data"}), 400
+    # Reject oversized bodies before reading any of them
+    if (
+        request.content_length is not None
+        and request.content_length > MAX_RESUME_UPLOAD_BYTES + MAX_FORM_FIELDS_BYTES
+    ):
+        return jsonify({"error": "Resume file is too large"}), 413
+
+    writers = []
+
+    def stream_to_s3(total_content_length, content_type, filename, content_length=None):
+        file_name = os.path.basename(filename or "resume")
+        writer = S3MultipartWriter(
+            s3_client.get(),
+            S3_BUCKET,
+            f"resumes/uploads/{uuid.uuid4()}/{file_name}",
+            part_size=S3_UPLOAD_PART_SIZE,
+            max_bytes=MAX_RESUME_UPLOAD_BYTES,
+            content_type=content_type,
+            metadata=original_file_name_metadata(file_name),
+        )
+        writers.append(writer)
+        return writer
+
+    try:
+        with stage("s3_upload"):
+            _, form, files = parse_form_data(
+                request.environ,
+                stream_factory=stream_to_s3,
+                max_form_memory_size=MAX_FORM_FIELDS_BYTES,
+            )
+        resume_file = files.get("resumeFile")
+        job_posting_text = form.get("jobPostingText")
+        resume_file_type = form.get("resumeFileType") or (
+            resume_file.mimetype if resume_file else None
+        )
+        if not resume_file or not resume_file.filename or not job_posting_text:
+            return (
+                jsonify({"error": "Missing resume file or job posting text"}),
+                400,
+            )
+        try:
+            include_embeddings, embedding_encoding = embedding_options(form)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        s3_client.put_object(Bucket=S3_BUCKET, Key=s3_key, Body=resume_bytes)
+        writer = resume_file.stream
+        with stage("s3_upload"):
+            writer.complete()
+        content_hash = writer.content_hash
+        with stage("resume_lookup"):
+            existing_resume = lookup_resume(content_hash)
+        record_resume_lookup(existing_resume)
+
+        with stage("s3_put"):
+            if not existing_resume:
+                s3_key = resume_s3_key(content_hash, resume_file.filename)
+                s3_client.get().copy_object(
+                    Bucket=S3_BUCKET,
+                    Key=s3_key,
+                    CopySource={"Bucket": S3_BUCKET, "Key": writer.key},
+                )
+            s3_client.get().delete_object(Bucket=S3_BUCKET, Key=writer.key)
+
+        if existing_resume:
+            return jsonify(
+                {
+                    "message": "Resume already uploaded",
+                    "s3Url": existing_resume["s3Url"],
+                    "jobPostingText": job_posting_text,
+                    "resumeFileType": resume_file_type,
+                    "sizeBytes": writer.size,
+                    "contentHash": content_hash,
+                    **reused_resume_fields(
+                        existing_resume, include_embeddings, embedding_encoding
+                    ),
+                }
+            )
 
         s3_url = f"https://{S3_BUCKET}.s3.{S3_REGION}.amazonaws.com/{s3_key}"
 
@@ -119,16 +422,306 @@ def upload_resume_endpoint():
                 "s3Url": s3_url,
                 "jobPostingText": job_posting_text,
                 "resumeFileType": resume_file_type,
+                "sizeBytes": writer.size,
+                "contentHash": content_hash,
+                "resumeReused": False,
             }
         )
+    except UploadTooLargeError as e:
+        return jsonify({"error": str(e)}), 413
     except NoCredentialsError:
         return jsonify({"error": "AWS credentials not available"}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        # Abort uploads of any file parts that were not completed above
+        for writer in writers:
+            writer.abort()
+
+
+def save_resume_and_job_posting(
+    conn,
+    content_hash: str,
+    file_name: str,
+    s3_url: str,
+    resume_text: str,
+    resume_embedding,
+    job_posting_text: str,
+    job_posting_embedding,
+    existing_resume_id: str | None = None,
+) -> tuple[str, str]:
+    """
+    Inserts a resume and its job posting in a single transaction and adds the
+    resume to the search index. A resume or job posting that is already
+    stored is reused rather than inserted again; pass `existing_resume_id`
+    when the resume was found before processing. Returns
+    (resume_id, job_posting_id).
+    """
+    resume_id, inserted = existing_resume_id, False
+    cursor = conn.cursor()
+    conn.begin()
+    try:
+        # Save resume, unless these bytes are already stored
+        if resume_id is None:
+            resume_id, inserted = save_resume(
+                cursor,
+                str(uuid.uuid4()),
+                content_hash,
+                file_name,
+                s3_url,
+                resume_text,
+                resume_embedding,
+            )
+        # Save job posting, or count another use of the stored copy
+        job_id = save_job_posting(
+            cursor,
+            job_posting_hash(job_posting_text),
+            job_posting_text,
+            job_posting_embedding,
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    if inserted:
+        resume_index.add(resume_id, resume_embedding)
+        # Job workers never open the ANN index; the API's refresh adds their rows
+        if resume_ann_index is not None and resume_ann_index.ready:
+            resume_ann_index.get().add([resume_id], [resume_embedding])
+    return resume_id, job_id
+
+
+def embedding_options(values) -> tuple[bool, str]:
+    """
+    Reads `includeEmbeddings` (default true) and `embeddingEncoding` (default
+    "json") from a JSON body or form. Raises ValueError for unknown encodings.
+    """
+    include = values.get("includeEmbeddings", True)
+    if isinstance(include, str):
+        include = include.strip().lower() not in ("false", "0", "no")
+    encoding = values.get("embeddingEncoding") or "json"
+    if encoding not in WIRE_ENCODINGS:
+        raise ValueError(
+            f"embeddingEncoding must be one of: {', '.join(WIRE_ENCODINGS)}"
+        )
+    return bool(include), encoding
+
+
+def positive_int_option(values, name: str, default: int) -> int:
+    """Reads a positive integer option, `default` when missing. Raises ValueError otherwise."""
+    value = values.get(name)
+    if value is None:
+        return default
+    error = ValueError(f"{name} must be a positive integer")
+    if isinstance(value, bool):
+        raise error
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise error from None
+    if number < 1 or (isinstance(value, float) and value != number):
+        raise error
+    return number
+
+
+def embedding_fields(
+    include: bool, encoding: str, resume_embedding, job_posting_embedding
+) -> dict:
+    """Response fields carrying the two embeddings, if the client asked for them."""
+    if not include:
+        return {}
+    return {
+        "resumeEmbedding": encode_embedding_for_wire(resume_embedding, encoding),
+        "jobPostingEmbedding": encode_embedding_for_wire(job_posting_embedding, encoding),
+        "embeddingEncoding": encoding,
+    }
+
+
+def reused_resume_fields(existing_resume: dict, include: bool, encoding: str) -> dict:
+    """Response fields returning a stored resume's id, parsed text and embedding."""
+    fields = {
+        "resumeReused": True,
+        "resumeId": existing_resume["id"],
+        "parsedResumeText": existing_resume["rawText"],
+    }
+    if include:
+        fields["resumeEmbedding"] = encode_embedding_for_wire(
+            existing_resume["embedding"], encoding
+        )
+        fields["embeddingEncoding"] = encoding
+    return fields
+
+
+def record_job_posting_lookup(existing_job_posting):
+    CACHE_LOOKUPS.inc(
+        cache="job_posting", result="hit" if existing_job_posting else "miss"
+    )
+
+
+def record_resume_lookup(existing_resume):
+    CACHE_LOOKUPS.inc(cache="resume", result="hit" if existing_resume else "miss")
+
+
+def process_documents(
+    s3_url: str,
+    resume_file_type: str,
+    job_posting_text: str,
+    include_embeddings: bool = True,
+    embedding_encoding: str = "json",
+    progress=None,
+) -> dict:
+    """
+    Downloads a resume from S3, parses and embeds it with the job posting,
+    and saves both. A resume whose bytes are already stored reuses its parsed
+    text and embedding; for content-addressed keys this is checked before
+    downloading. Returns the /process_documents response body. Called inline
+    by the endpoint and by job workers, which pass `progress(stage)`.
+    """
+    progress = progress or (lambda stage: None)
+    conn = None
+    try:
+        # Extract bucket name and key from S3 URL
+        path_parts = s3_url.split("/")
+        bucket_name_from_url = path_parts[2].split(".")[0]
+        s3_key = "/".join(path_parts[3:])
+        file_name = os.path.basename(s3_key)
+
+        # Content-addressed keys name their hash, so a stored resume is found
+        # without downloading it
+        content_hash = content_hash_from_key(s3_key)
+        existing_resume = None
+        if content_hash:
+            with stage("resume_lookup"):
+                existing_resume = lookup_resume(content_hash)
+
+        if not existing_resume:
+            # Download file from S3
+            progress("downloading")
+            with stage("s3_get"):
+                response = s3_client.get().get_object(Bucket=bucket_name_from_url, Key=s3_key)
+                resume_bytes = response["Body"].read()
+            file_name = response.get("Metadata", {}).get("original-file-name") or file_name
+            if content_hash is None:
+                content_hash = resume_content_hash(resume_bytes)
+                with stage("resume_lookup"):
+                    existing_resume = lookup_resume(content_hash)
+        record_resume_lookup(existing_resume)
+
+        if existing_resume:
+            parsed_resume_text = existing_resume["rawText"]
+            resume_embedding = existing_resume["embedding"]
+        else:
+            # Parse the document
+            progress("parsing")
+            with stage("parse"):
+                parsed_resume_text = run_cpu_bound(parse_document, resume_bytes, resume_file_type)
+
+        # Generate embeddings, reusing stored ones for a known resume or job posting
+        progress("embedding")
+        if not existing_resume:
+            with stage("embed"):
+                resume_embedding = run_cpu_bound(get_text_embedding, parsed_resume_text)
+        with stage("job_posting_lookup"):
+            existing_job_posting = lookup_job_posting(job_posting_hash(job_posting_text))
+        record_job_posting_lookup(existing_job_posting)
+        if existing_job_posting:
+            job_posting_embedding = existing_job_posting[1]
+        else:
+            with stage("embed"):
+                job_posting_embedding = run_cpu_bound(get_text_embedding, job_posting_text)
+
+        # Save to TiDB
+        progress("saving")
+        with stage("db_connect"):
+            conn = tidb_pool.acquire()
+        if not conn:
+            raise ConnectionError("Could not connect to database")
+        with stage("db_write"):
+            resume_id, job_posting_id = save_resume_and_job_posting(
+                conn,
+                content_hash,
+                file_name,
+                s3_url,
+                parsed_resume_text,
+                resume_embedding,
+                job_posting_text,
+                job_posting_embedding,
+                existing_resume["id"] if existing_resume else None,
+            )
+
+        return {
+            "resumeId": resume_id,
+            "jobPostingId": job_posting_id,
+            "contentHash": content_hash,
+            "resumeReused": existing_resume is not None,
+            "jobPostingReused": existing_job_posting is not None,
+            "parsedResumeText": parsed_resume_text,
+            "parsedJobPostingText": job_posting_text,
+            **embedding_fields(
+                include_embeddings,
+                embedding_encoding,
+                resume_embedding,
+                job_posting_embedding,
+            ),
+        }
+    finally:
+        tidb_pool.release(conn)
+
+
+def run_process_documents_job(payload: dict, progress) -> dict:
+    return process_documents(
+        payload["s3Url"],
+        payload["resumeFileType"],
+        payload["jobPostingText"],
+        payload["includeEmbeddings"],
+        payload["embeddingEncoding"],
+        progress,
+    )
+
+
+# Job kinds run by job_queue.py workers
+JOB_HANDLERS = {"process_documents": run_process_documents_job}
+
+
+def enqueue_job(kind: str, payload: dict):
+    """Queues a job and answers 202 with its id, or 429 when the queue is full."""
+    try:
+        job_id = job_queue.get().enqueue(kind, payload)
+    except JobQueueFull as e:
+        response = jsonify({"error": f"Job queue is full ({e}), try again later"})
+        response.headers["Retry-After"] = str(JOB_RETRY_AFTER_SECONDS)
+        return response, 429
+    if JOB_WORKERS:
+        job_workers.get()
+    response = jsonify({"jobId": job_id, "status": "queued", "statusUrl": f"/jobs/{job_id}"})
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return response, 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status_endpoint(job_id):
+    """Status of a queued job; `result` holds the response body once it has succeeded."""
+    try:
+        job = job_queue.get().get(job_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
 
 @app.route("/process_documents", methods=["POST"])
 def process_documents_endpoint():
+    """
+    Parses, embeds and saves a resume stored in S3 along with a job posting.
+    With `"async": true` the work is queued instead and the response is 202
+    with a `jobId` to poll at /jobs/<jobId>; 429 means the queue is full.
+    A document with no extractable text is rejected with 422 (or a failed
+    job) and nothing is saved.
+    """
     data = request.json
     if not data:
         return jsonify({"error": "Invalid JSON"}), 400
@@ -142,148 +735,559 @@ def process_documents_endpoint():
             jsonify({"error": "Missing S3 URL, resume file type, or job posting text"}),
             400,
         )
+    try:
+        include_embeddings, embedding_encoding = embedding_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if data.get("async"):
+        return enqueue_job(
+            "process_documents",
+            {
+                "s3Url": s3_url,
+                "resumeFileType": resume_file_type,
+                "jobPostingText": job_posting_text,
+                "includeEmbeddings": include_embeddings,
+                "embeddingEncoding": embedding_encoding,
+            },
+        )
 
-    conn = None
     try:
-        # Extract bucket name and key from S3 URL
-        path_parts = s3_url.split("/")
-        bucket_name_from_url = path_parts[2].split(".")[0]
-        s3_key = "/".join(path_parts[3:])
+        return jsonify(
+            process_documents(
+                s3_url,
+                resume_file_type,
+                job_posting_text,
+                include_embeddings,
+                embedding_encoding,
+            )
+        )
+    except DocumentParseError as e:
+        return jsonify({"error": str(e)}), 422
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return jsonify({"error": "File not found in S3"}), 404
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Download file from S3
-        response = s3_client.get_object(Bucket=bucket_name_from_url, Key=s3_key)
-        resume_bytes = response["Body"].read()
 
-        # Parse the document
-        parsed_resume_text = parse_document(resume_bytes, resume_file_type)
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
 
-        # Generate embeddings
-        resume_embedding = get_text_embedding(parsed_resume_text)
-        job_posting_embedding = get_text_embedding(job_posting_text)
 
-        # Save to TiDB
-        conn = connect_to_tidb()
-        if conn:
-            cursor = conn.cursor()
-            # Save resume
-            resume_id = str(uuid.uuid4())
-            cursor.execute(
-                "INSERT INTO resumes (id, file_name, s3_url, raw_text, embedding) VALUES (%s, %s, %s, %s, %s)",
-                (
-                    resume_id,
-                    os.path.basename(s3_key),
-                    s3_url,
-                    parsed_resume_text,
-                    json.dumps(resume_embedding),
-                ),
-            )
-            # Save job posting
-            job_id = str(uuid.uuid4())
-            cursor.execute(
-                "INSERT INTO job_postings (id, raw_text, embedding) VALUES (%s, %s, %s)",
-                (job_id, job_posting_text, json.dumps(job_posting_embedding)),
+@app.route("/analyze_resume", methods=["POST"])
+def analyze_resume_endpoint():
+    """
+    Fused /upload_resume + /process_documents. The file is sent once, either as
+    multipart/form-data (`resumeFile`, `jobPostingText`) or as the JSON body
+    accepted by /upload_resume. The S3 write runs concurrently with parsing,
+    both texts are embedded in one batch, and both rows are written in one
+    transaction. A file that is already stored skips the S3 write, parsing and
+    resume embedding. `includeEmbeddings` and `embeddingEncoding` work as for
+    /process_documents.
+    """
+    started = time.perf_counter()
+    if (
+        request.content_length is not None
+        and request.content_length > 2 * MAX_RESUME_UPLOAD_BYTES + MAX_FORM_FIELDS_BYTES
+    ):
+        return jsonify({"error": "Resume file is too large"}), 413
+
+    if request.mimetype == "multipart/form-data":
+        resume_file = request.files.get("resumeFile")
+        job_posting_text = request.form.get("jobPostingText")
+        resume_file_name = resume_file.filename if resume_file else None
+        resume_file_type = request.form.get("resumeFileType") or (
+            resume_file.mimetype if resume_file else None
+        )
+        resume_bytes = resume_file.read() if resume_file else None
+        options = request.form
+    else:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Invalid JSON"}), 400
+        job_posting_text = data.get("jobPostingText")
+        resume_file_name = data.get("resumeFileName")
+        resume_file_type = data.get("resumeFileType")
+        resume_file_b64 = data.get("resumeFileBase64")
+        try:
+            resume_bytes = (
+                base64.b64decode(resume_file_b64, validate=True) if resume_file_b64 else None
             )
-            conn.commit()
-            cursor.close()
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid base64 resume file"}), 400
+        options = data
+
+    if (
+        not resume_bytes
+        or not resume_file_name
+        or not resume_file_type
+        or not job_posting_text
+    ):
+        return (
+            jsonify({"error": "Missing resume file, name, type, or job posting text"}),
+            400,
+        )
+    if len(resume_bytes) > MAX_RESUME_UPLOAD_BYTES:
+        return jsonify({"error": "Resume file is too large"}), 413
+    try:
+        include_embeddings, embedding_encoding = embedding_options(options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    timing = {}
+    conn = None
+    try:
+        file_name = os.path.basename(resume_file_name)
+        content_hash = resume_content_hash(resume_bytes)
+        s3_key = resume_s3_key(content_hash, file_name)
+        s3_url = f"https://{S3_BUCKET}.s3.{S3_REGION}.amazonaws.com/{s3_key}"
+
+        request_timings = current_timings()
+
+        def put_resume():
+            put_started = time.perf_counter()
+            with stage("s3_put", request_timings):
+                s3_client.get().put_object(
+                    Bucket=S3_BUCKET,
+                    Key=s3_key,
+                    Body=resume_bytes,
+                    Metadata=original_file_name_metadata(file_name),
+                )
+            timing["s3PutMs"] = elapsed_ms(put_started)
+
+        # Look for stored copies of the job posting and the resume file
+        job_posting_lookup = io_executor.submit(
+            lookup_job_posting, job_posting_hash(job_posting_text)
+        )
+        stage_started = time.perf_counter()
+        with stage("resume_lookup"):
+            existing_resume = lookup_resume(content_hash)
+        record_resume_lookup(existing_resume)
+        timing["resumeLookupMs"] = elapsed_ms(stage_started)
+
+        if existing_resume:
+            s3_url = existing_resume["s3Url"]
+            parsed_resume_text = existing_resume["rawText"]
+            resume_embedding = existing_resume["embedding"]
+            timing["s3PutMs"] = timing["parseMs"] = 0.0
         else:
+            # Persist to S3 while the document is parsed
+            upload = io_executor.submit(put_resume)
+            stage_started = time.perf_counter()
+            with stage("parse"):
+                parsed_resume_text = run_cpu_bound(parse_document, resume_bytes, resume_file_type)
+            timing["parseMs"] = elapsed_ms(stage_started)
+
+        stage_started = time.perf_counter()
+        existing_job_posting = job_posting_lookup.result()
+        record_job_posting_lookup(existing_job_posting)
+        if existing_job_posting:
+            job_posting_embedding = existing_job_posting[1]
+        texts = [] if existing_resume else [parsed_resume_text]
+        if not existing_job_posting:
+            texts.append(job_posting_text)
+        if texts:
+            with stage("embed"):
+                embeddings = run_cpu_bound(get_multiple_text_embeddings, texts)
+            if not existing_resume:
+                resume_embedding = embeddings[0]
+            if not existing_job_posting:
+                job_posting_embedding = embeddings[-1]
+        timing["embedMs"] = elapsed_ms(stage_started)
+
+        stage_started = time.perf_counter()
+        if not existing_resume:
+            with stage("s3_wait"):
+                upload.result()
+        timing["s3WaitMs"] = elapsed_ms(stage_started)
+
+        stage_started = time.perf_counter()
+        with stage("db_connect"):
+            conn = tidb_pool.acquire()
+        if not conn:
             return jsonify({"error": "Could not connect to database"}), 500
+        with stage("db_write"):
+            resume_id, job_posting_id = save_resume_and_job_posting(
+                conn,
+                content_hash,
+                file_name,
+                s3_url,
+                parsed_resume_text,
+                resume_embedding,
+                job_posting_text,
+                job_posting_embedding,
+                existing_resume["id"] if existing_resume else None,
+            )
+        timing["dbMs"] = elapsed_ms(stage_started)
+
+        timing["totalMs"] = elapsed_ms(started)
+        # The same stages run back to back, as with /upload_resume followed by
+        # /process_documents (which also downloads the file again and encodes
+        # the two texts separately, so the real saving is larger)
+        timing["sequentialMs"] = round(
+            timing["s3PutMs"] + timing["parseMs"] + timing["embedMs"] + timing["dbMs"],
+            1,
+        )
+        # S3 write time hidden behind parsing and embedding
+        timing["savedMs"] = round(max(timing["s3PutMs"] - timing["s3WaitMs"], 0.0), 1)
 
         return jsonify(
             {
+                "s3Url": s3_url,
+                "resumeId": resume_id,
+                "jobPostingId": job_posting_id,
+                "contentHash": content_hash,
+                "resumeReused": existing_resume is not None,
+                "jobPostingReused": existing_job_posting is not None,
                 "parsedResumeText": parsed_resume_text,
                 "parsedJobPostingText": job_posting_text,
-                "resumeEmbedding": resume_embedding,
-                "jobPostingEmbedding": job_posting_embedding,
+                **embedding_fields(
+                    include_embeddings,
+                    embedding_encoding,
+                    resume_embedding,
+                    job_posting_embedding,
+                ),
+                "timing": timing,
             }
         )
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "NoSuchKey":
-            return jsonify({"error": "File not found in S3"}), 404
-        return jsonify({"error": str(e)}), 500
+    except DocumentParseError as e:
+        return jsonify({"error": str(e)}), 422
+    except NoCredentialsError:
+        return jsonify({"error": "AWS credentials not available"}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
-        if conn:
-            conn.close()
+        tidb_pool.release(conn)
+
+
+def fetch_embedding_rows(conn, table: str):
+    """Yields (id, embedding, {}) for every row; text columns are left in the database."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT id, embedding FROM {table}")
+        for item_id, embedding_blob in cursor.fetchall():
+            yield item_id, decode_embedding(embedding_blob), {}
+    finally:
+        cursor.close()
+
+
+# Change tracking for each resident index, started by its initial load
+INDEX_CHANGES = {
+    resume_index: ChangeTracker("resumes", INDEX_REFRESH_SECONDS, INDEX_REFRESH_OVERLAP_SECONDS),
+    course_index: ChangeTracker("courses", INDEX_REFRESH_SECONDS, INDEX_REFRESH_OVERLAP_SECONDS),
+}
+# Started from the build time saved with the ANN index
+resume_ann_changes = ChangeTracker("resumes", INDEX_REFRESH_SECONDS, INDEX_REFRESH_OVERLAP_SECONDS)
+
+
+def fetch_tracked_rows(conn, table: str, changes: ChangeTracker):
+    """Like `fetch_embedding_rows`, first starting `changes` from the current database time."""
+    changes.start(database_now(conn))
+    yield from fetch_embedding_rows(conn, table)
+
+
+def fetch_changed_rows(conn, table: str, columns: str, since) -> tuple[list, object]:
+    """Returns (`columns` of rows updated at or after `since`, database time before the query)."""
+    watermark = database_now(conn)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {columns} FROM {table} WHERE updated_at >= %s", (since,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return list(rows), watermark
+
+
+def load_search_index(index, conn):
+    """Fills a search index from its table the first time it is needed."""
+    if index is resume_index:
+        index.load(lambda: fetch_tracked_rows(conn, "resumes", INDEX_CHANGES[index]))
+    elif index is course_index:
+        index.load(lambda: fetch_tracked_rows(conn, "courses", INDEX_CHANGES[index]))
+        course_skill_index.load(lambda: fetch_course_term_rows(conn))
+
+
+def refresh_search_index(index, conn):
+    """Applies rows that any process has written since the index was loaded or last refreshed."""
+    if index is resume_index:
+        rows = INDEX_CHANGES[index].poll(
+            lambda since: fetch_changed_rows(conn, "resumes", "id, embedding", since)
+        )
+        for resume_id, embedding in rows or ():
+            index.add(resume_id, decode_embedding(embedding))
+    elif index is course_index:
+        rows = INDEX_CHANGES[index].poll(
+            lambda since: fetch_changed_rows(
+                conn, "courses", "id, embedding, name, description, skills", since
+            )
+        )
+        for course_id, embedding, name, description, skills in rows or ():
+            index.add(course_id, decode_embedding(embedding))
+            course = {
+                "name": name,
+                "description": description,
+                "skills": json.loads(skills) if skills else [],
+            }
+            course_skill_index.add(course_id, *course_terms(course))
+
+
+def refresh_ann_index(conn):
+    """Adds resumes that any process has written since the ANN index was built or last refreshed."""
+    rows = resume_ann_changes.poll(
+        lambda since: fetch_changed_rows(conn, "resumes", "id, embedding", since)
+    )
+    if not rows:
+        return
+    index = resume_ann_index.get()
+    # Resume rows are never rewritten, so only ids the index lacks are added
+    new_rows = [(resume_id, embedding) for resume_id, embedding in rows if resume_id not in index]
+    if new_rows:
+        index.add(
+            [resume_id for resume_id, _ in new_rows],
+            [decode_embedding(embedding) for _, embedding in new_rows],
+        )
+
+
+def fetch_stored_embedding(conn, table: str, item_id: str):
+    """Reads one stored embedding by primary key, or returns None if the row does not exist."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT embedding FROM {table} WHERE id = %s", (item_id,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return decode_embedding(row[0]) if row else None
+
+
+def fetch_resume_metadata(conn, resume_ids: list[str]) -> dict:
+    """Returns {id: metadata} for the given resumes, truncating the text in the database."""
+    if not resume_ids:
+        return {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT id, file_name, LEFT(raw_text, %s) FROM resumes WHERE id IN ("
+            + ", ".join(["%s"] * len(resume_ids))
+            + ")",
+            [PREVIEW_CHARS, *resume_ids],
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return {
+        resume_id: resume_metadata(file_name, preview or "")
+        for resume_id, file_name, preview in rows
+    }
 
 
-def cosine_similarity(vec1, vec2):
-    """Calculates the cosine similarity between two vectors."""
-    vec1 = np.array(vec1)
-    vec2 = np.array(vec2)
-    dot_product = np.dot(vec1, vec2)
-    norm_a = np.linalg.norm(vec1)
-    norm_b = np.linalg.norm(vec2)
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot_product / (norm_a * norm_b)
+def fetch_course_metadata(conn, course_ids: list[str]) -> dict:
+    """Returns {id: metadata} for the given courses, truncating descriptions in the database."""
+    if not course_ids:
+        return {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT id, name, LEFT(description, %s), url FROM courses WHERE id IN ("
+            + ", ".join(["%s"] * len(course_ids))
+            + ")",
+            [PREVIEW_CHARS, *course_ids],
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return {
+        course_id: course_metadata(name, preview or "", url)
+        for course_id, name, preview, url in rows
+    }
 
 
 @app.route("/vector_search", methods=["POST"])
 def vector_search_endpoint():
+    """
+    Finds the rows most similar to a query, given either as `queryEmbedding`
+    (a float list, or a base64 string in `queryEmbeddingEncoding`) or as the
+    id of a stored row (`resumeId` or `jobPostingId`), in which case the
+    vector is looked up server-side. A resume used as the query is left out
+    of its own results. Resume searches use the ANN index when one is
+    configured; `nprobe` overrides ANN_NPROBE for the request. `limit` and
+    `nprobe` must be positive integers.
+
+    Course searches can be narrowed with `requiredSkills` (every skill must
+    match) and `queryText`, whose BM25 keyword matches become the candidate
+    set and are fused with vector similarity using `keywordWeight` (clamped
+    to [0, 1]).
+    """
     data = request.json
     if not data:
         return jsonify({"error": "Invalid JSON"}), 400
 
     query_embedding = data.get("queryEmbedding")
+    resume_id = data.get("resumeId")
+    job_posting_id = data.get("jobPostingId")
     search_type = data.get("searchType")  # e.g., "resumes" or "courses"
-    limit = data.get("limit", 5)  # Number of results to return
 
-    if not query_embedding or not search_type:
-        return jsonify({"error": "Missing query embedding or search type"}), 400
+    if not (query_embedding or resume_id or job_posting_id) or not search_type:
+        return (
+            jsonify(
+                {
+                    "error": "Missing query (queryEmbedding, resumeId or jobPostingId) or search type"
+                }
+            ),
+            400,
+        )
+
+    if search_type == "resumes":
+        index = resume_index
+    elif search_type == "courses":
+        index = course_index
+    else:
+        return jsonify({"error": "Invalid search type"}), 400
+
+    required_skills = data.get("requiredSkills") or []
+    query_text = data.get("queryText")
+    if not isinstance(required_skills, list) or not all(
+        isinstance(skill, str) for skill in required_skills
+    ):
+        return jsonify({"error": "requiredSkills must be a list of strings"}), 400
+
+    query = None
+    if query_embedding:
+        try:
+            query = decode_embedding_from_wire(
+                query_embedding, data.get("queryEmbeddingEncoding")
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
     conn = None
     try:
-        conn = connect_to_tidb()
-        if not conn:
-            return jsonify({"error": "Could not connect to database"}), 500
+        try:
+            keyword_weight = data.get("keywordWeight")
+            keyword_weight = float(
+                COURSE_KEYWORD_WEIGHT if keyword_weight is None else keyword_weight
+            )
+        except (TypeError, ValueError):
+            return jsonify({"error": "keywordWeight must be a number"}), 400
+        if math.isnan(keyword_weight):
+            return jsonify({"error": "keywordWeight must be a number"}), 400
+        # Fused scores are a weighted average of similarity and keyword score
+        keyword_weight = min(max(keyword_weight, 0.0), 1.0)
+        try:
+            limit = positive_int_option(data, "limit", 5)  # Number of results to return
+            # Values above the index's list count probe every list
+            nprobe = positive_int_option(data, "nprobe", ANN_NPROBE)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        use_ann = index is resume_index and resume_ann_index is not None
+        # Only the first search per process scans the table; afterwards the
+        # resident index picks up rows changed since its last check
+        if not use_ann and (
+            not index.loaded
+            or (index is course_index and not course_skill_index.loaded)
+        ):
+            conn = tidb_pool.acquire()
+            if not conn:
+                return jsonify({"error": "Could not connect to database"}), 500
+            with stage("index_load"):
+                load_search_index(index, conn)
+        elif not use_ann and INDEX_CHANGES[index].due:
+            conn = tidb_pool.acquire()
+            if not conn:
+                return jsonify({"error": "Could not connect to database"}), 500
+            with stage("index_refresh"):
+                refresh_search_index(index, conn)
+        elif use_ann and resume_ann_changes.due:
+            conn = tidb_pool.acquire()
+            if not conn:
+                return jsonify({"error": "Could not connect to database"}), 500
+            with stage("index_refresh"):
+                refresh_ann_index(conn)
+
+        exclude_id = None
+        if query is None:
+            if resume_id:
+                table, query_id, label = "resumes", resume_id, "Resume"
+                query = resume_index.get(resume_id)
+                if search_type == "resumes":
+                    exclude_id = resume_id
+            else:
+                table, query_id, label = "job_postings", job_posting_id, "Job posting"
+            if query is None:
+                conn = conn or tidb_pool.acquire()
+                if not conn:
+                    return jsonify({"error": "Could not connect to database"}), 500
+                with stage("db_read"):
+                    query = fetch_stored_embedding(conn, table, query_id)
+            if query is None:
+                return jsonify({"error": f"{label} not found"}), 404
 
-        cursor = conn.cursor()
-        results = []
-
-        if search_type == "resumes":
-            cursor.execute("SELECT id, file_name, raw_text, embedding FROM resumes;")
-            for resume_id, file_name, raw_text, embedding_json in cursor.fetchall():
-                resume_embedding = json.loads(embedding_json)
-                similarity = cosine_similarity(query_embedding, resume_embedding)
-                results.append(
-                    {
-                        "id": resume_id,
-                        "file_name": file_name,
-                        "raw_text_preview": raw_text[:200] + "...",
-                        "similarity": similarity,
-                    }
+        k = limit + 1 if exclude_id else limit
+        if use_ann:
+            with stage("search"):
+                hits = run_cpu_bound(
+                    resume_ann_index.get().search,
+                    query,
+                    k,
+                    nprobe=nprobe,
+                    rerank=ANN_RERANK,
                 )
-            # Sort by similarity in descending order
-            results.sort(key=lambda x: x["similarity"], reverse=True)
-            return jsonify({"results": results[:limit]})
-
-        elif search_type == "courses":
-            cursor.execute("SELECT id, name, description, url, embedding FROM courses;")
-            for course_id, name, description, url, embedding_json in cursor.fetchall():
-                course_embedding = json.loads(embedding_json)
-                similarity = cosine_similarity(query_embedding, course_embedding)
-                results.append(
-                    {
-                        "id": course_id,
-                        "name": name,
-                        "description_preview": description[:200] + "...",
-                        "url": url,
-                        "similarity": similarity,
-                    }
+            results = [
+                {"id": hit_id, "similarity": similarity} for hit_id, similarity in hits
+            ]
+        elif index is course_index and (query_text or required_skills):
+            with stage("keyword_filter"):
+                candidate_ids, keyword_scores = course_skill_index.candidates(
+                    query_text, required_skills, COURSE_MAX_CANDIDATES
                 )
-            # Sort by similarity in descending order
-            results.sort(key=lambda x: x["similarity"], reverse=True)
-            return jsonify({"results": results[:limit]})
-
+            with stage("search"):
+                if keyword_scores:
+                    # Score every candidate densely, then re-rank with keywords
+                    results = run_cpu_bound(
+                        index.search, query, len(candidate_ids), candidate_ids
+                    )
+                    results = fuse_scores(results, keyword_scores, keyword_weight)[:k]
+                else:
+                    results = run_cpu_bound(index.search, query, k, candidate_ids)
         else:
-            return jsonify({"error": "Invalid search type"}), 400
+            with stage("search"):
+                results = run_cpu_bound(index.search, query, k)
+        if exclude_id:
+            results = [r for r in results if r["id"] != exclude_id][:limit]
+
+        # Scoring only used ids and embeddings; fetch previews for the final
+        # hits in one query
+        if results:
+            conn = conn or tidb_pool.acquire()
+            if not conn:
+                return jsonify({"error": "Could not connect to database"}), 500
+            fetch_metadata = (
+                fetch_resume_metadata if index is resume_index else fetch_course_metadata
+            )
+            with stage("hydrate"):
+                metadata = fetch_metadata(conn, [result["id"] for result in results])
+            results = hydrate_results(results, metadata)
+        return jsonify({"results": results})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
-        if conn:
-            conn.close()
+        tidb_pool.release(conn)
+
+
+def bypass_llm_cache(data: dict) -> bool:
+    """True when the client asks for a fresh response via `noCache` or Cache-Control."""
+    return bool(data.get("noCache")) or "no-cache" in request.headers.get(
+        "Cache-Control", ""
+    )
+
+
+def cached_response(payload: dict, cache_hit: bool):
+    response = jsonify(payload)
+    response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+    return response
 
 
 # Example of a simple chain using Claude (can be integrated into an endpoint later)
@@ -296,12 +1300,13 @@ def generate_text_endpoint():
     user_prompt = data["prompt"]
 
     try:
-        prompt_template = ChatPromptTemplate.from_messages(
-            [("system", "You are a helpful AI assistant."), ("user", "{input}")]
+        generated_text, cache_hit = invoke_cached(
+            GENERATE_TEMPLATE_ID,
+            generate_chain,
+            {"input": user_prompt},
+            bypass_llm_cache(data),
         )
-        chain = prompt_template | llm
-        response = chain.invoke({"input": user_prompt})
-        return jsonify({"generated_text": response.content})
+        return cached_response({"generated_text": generated_text}, cache_hit)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -319,33 +1324,118 @@ def rewrite_bullet_endpoint():
         return jsonify({"error": "Missing bullet point or job description"}), 400
 
     try:
-        # Define the prompt template for bullet point rewriting
-        rewrite_prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    "You are an expert resume writer. Your task is to rewrite a given resume bullet point to be more impactful, quantifiable, and tailored to a specific job description. Focus on achievements and results, using strong action verbs. Ensure the rewritten bullet point is concise and relevant to the job requirements.",
-                ),
-                (
-                    "user",
-                    "Original Resume Bullet Point: {bullet_point}\n\nJob Description:\n{job_description}\n\nRewrite the resume bullet point to be more impactful and relevant to the job description. Start directly with the rewritten bullet point, no introductory phrases.",
-                ),
-            ]
+        # Invoke the shared chain, reusing cached rewrites of the same inputs
+        rewritten_bullet, cache_hit = invoke_cached(
+            REWRITE_TEMPLATE_ID,
+            rewrite_chain,
+            {"bullet_point": bullet_point, "job_description": job_description},
+            bypass_llm_cache(data),
         )
 
-        # Create the chain: Prompt -> LLM -> Output Parser
-        rewrite_chain = rewrite_prompt | llm | StrOutputParser()
+        return cached_response({"rewrittenBullet": rewritten_bullet}, cache_hit)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 
-        # Invoke the chain with the provided inputs
-        rewritten_bullet = rewrite_chain.invoke(
-            {"bullet_point": bullet_point, "job_description": job_description}
+def sse_response(events):
+    """
+    Sends (event, data) pairs as server-sent events. A failure mid-stream is
+    reported as an `error` event since the status line has already been sent.
+    """
+
+    def generate():
+        try:
+            for event, data in events:
+                payload = {"text": data} if isinstance(data, str) else data
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            # Stop the LLM stream if the client went away early
+            events.close()
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/generate_text/stream", methods=["POST"])
+def generate_text_stream_endpoint():
+    data = request.json
+    if not data or "prompt" not in data:
+        return jsonify({"error": "Missing prompt"}), 400
+
+    return sse_response(
+        stream_cached(
+            GENERATE_TEMPLATE_ID,
+            generate_chain,
+            {"input": data["prompt"]},
+            bypass_llm_cache(data),
+        )
+    )
+
+
+@app.route("/rewrite_bullet/stream", methods=["POST"])
+def rewrite_bullet_stream_endpoint():
+    data = request.json
+    if not data:
+        return jsonify({"error": "Invalid JSON"}), 400
+
+    bullet_point = data.get("bulletPoint")
+    job_description = data.get("jobDescription")
+
+    if not bullet_point or not job_description:
+        return jsonify({"error": "Missing bullet point or job description"}), 400
+
+    return sse_response(
+        stream_cached(
+            REWRITE_TEMPLATE_ID,
+            rewrite_chain,
+            {"bullet_point": bullet_point, "job_description": job_description},
+            bypass_llm_cache(data),
         )
+    )
 
-        return jsonify({"rewrittenBullet": rewritten_bullet})
 
+@app.route("/rewrite_bullets", methods=["POST"])
+def rewrite_bullets_endpoint():
+    data = request.json
+    if not data:
+        return jsonify({"error": "Invalid JSON"}), 400
+
+    bullet_points = data.get("bulletPoints")
+    job_description = data.get("jobDescription")
+
+    if not bullet_points or not job_description:
+        return jsonify({"error": "Missing bullet points or job description"}), 400
+    if not isinstance(bullet_points, list) or not all(
+        isinstance(bullet_point, str) and bullet_point.strip()
+        for bullet_point in bullet_points
+    ):
+        return jsonify({"error": "bulletPoints must be a list of non-empty strings"}), 400
+    if len(bullet_points) > MAX_BULLETS_PER_BATCH:
+        return (
+            jsonify({"error": f"At most {MAX_BULLETS_PER_BATCH} bullet points per request"}),
+            400,
+        )
+
+    try:
+        results = rewrite_bullets(bullet_points, job_description, bypass_llm_cache(data))
+        return jsonify({"results": results})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/llm_cache_stats")
+def llm_cache_stats_endpoint():
+    return jsonify(llm_response_cache.stats())
+
+
 if __name__ == "__main__":
+    # With debug=True only the reloader's child process serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_warmup()
     app.run(debug=True, port=5000)
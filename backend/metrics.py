@@ -0,0 +1,261 @@
+# backend/metrics.py
+#
+# Lightweight in-process metrics: counters and histograms rendered in the
+# Prometheus text format by /metrics, plus per-request stage timings sent
+# back in a Server-Timing header.
+#
+# Recording a value takes a lock and a bisect over the bucket bounds, so the
+# instrumentation is cheap enough to leave on. Values are per process; with
+# several workers, scrape each one (or put them behind a Prometheus agent).
+#
+#   with stage("parse"):
+#       text = parse_document(...)
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans sub-millisecond index lookups to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(values[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge:
+    """Value read from `read()` at scrape time; `read` returns a number or {label value: number}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read, labelname: str | None = None):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.labelname = labelname
+
+    def samples(self):
+        try:
+            values = self.read()
+        except Exception:
+            return
+        if self.labelname is None:
+            yield f"{self.name} {_format_value(values)}"
+            return
+        for label, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels((self.labelname,), (label,))} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, help_text: str, labelnames=()) -> Counter:
+    return registry.register(Counter(name, help_text, labelnames))
+
+
+def histogram(name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def gauge(name: str, help_text: str, read, labelname: str | None = None) -> Gauge:
+    return registry.register(Gauge(name, help_text, read, labelname))
+
+
+# Shared metrics recorded across modules
+REQUESTS = counter("http_requests_total", "HTTP requests handled.", ("endpoint", "method", "status"))
+REQUEST_ERRORS = counter("http_request_errors_total", "HTTP requests that returned a 5xx status.", ("endpoint",))
+REQUEST_DURATION = histogram(
+    "http_request_duration_seconds", "Time to produce a response, excluding streamed bodies.", ("endpoint",)
+)
+STAGE_DURATION = histogram("stage_duration_seconds", "Time spent in each request stage.", ("stage",))
+CACHE_LOOKUPS = counter("cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result"))
+EMBEDDING_BATCH_SIZE = histogram(
+    "embedding_batch_size",
+    "Texts sent to the embedding model per encode call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+
+
+# -- per-request stage timings ----------------------------------------------
+
+# Thread-local, which is also greenlet-local once gevent has patched threading
+_request = threading.local()
+
+
+def start_request():
+    """Begins collecting stage timings for the request handled by this thread."""
+    _request.timings = []
+    _request.started = time.perf_counter()
+
+
+def current_timings() -> list | None:
+    """The active request's timing list, to pass to stages that run on other threads."""
+    return getattr(_request, "timings", None)
+
+
+def finish_request() -> tuple[list, float]:
+    """Stops collecting and returns (stage timings, request seconds so far)."""
+    timings = getattr(_request, "timings", None) or []
+    started = getattr(_request, "started", None)
+    _request.timings = None
+    _request.started = None
+    return timings, (time.perf_counter() - started if started is not None else 0.0)
+
+
+def record_stage(name: str, seconds: float, timings: list | None = None):
+    """Adds one stage duration to the histogram and to the request's timings."""
+    STAGE_DURATION.observe(seconds, stage=name)
+    if timings is None:
+        timings = current_timings()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str, timings: list | None = None):
+    """
+    Times the enclosed block as stage `name`. Pass `timings` (from
+    `current_timings()`) when the block runs on a different thread than the
+    request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started, timings)
+
+
+def server_timing_header(timings: list, total_seconds: float) -> str:
+    """Formats stage timings as a Server-Timing value; repeated stages are summed."""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def init_app(app):
+    """Records request counts, errors and durations and adds the Server-Timing header."""
+
+    @app.before_request
+    def _start():
+        start_request()
+
+    @app.after_request
+    def _finish(response):
+        from flask import request
+
+        timings, seconds = finish_request()
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        if response.status_code >= 500:
+            REQUEST_ERRORS.inc(endpoint=endpoint)
+        REQUEST_DURATION.observe(seconds, endpoint=endpoint)
+        response.headers["Server-Timing"] = server_timing_header(timings, seconds)
+        return response
@@ -0,0 +1,159 @@
+# backend/migrate_embeddings.py
+#
+# Converts JSON-encoded embedding columns to raw little-endian float32 BLOBs.
+#
+# Run this before deploying writers that use `encode_embedding`. Each table is
+# converted in keyset-paginated batches and only rows that still need work are
+# selected, so an interrupted run can simply be started again.
+#
+#   python migrate_embeddings.py --batch-size 500
+#   python migrate_embeddings.py --tables courses --drop-json
+
+import argparse
+import time
+from db_pool import tidb_pool
+from embedding_codec import encode_embedding, decode_embedding
+
+TABLES = ("resumes", "job_postings", "courses")
+BINARY_TYPES = {"blob", "mediumblob", "longblob", "varbinary", "binary"}
+STAGING_COLUMN = "embedding_bin"
+LEGACY_COLUMN = "embedding_json"
+
+
+def get_column_type(cursor, table: str, column: str) -> str | None:
+    """Returns the lower-cased data type of a column, or None if it does not exist."""
+    cursor.execute(
+        "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column),
+    )
+    row = cursor.fetchone()
+    return row[0].lower() if row else None
+
+
+def convert_rows(
+    conn, table: str, source: str, target: str, pending: str, batch_size: int
+) -> int:
+    """
+    Re-encodes `source` into `target` for every row matching the `pending`
+    SQL predicate, one batch of ids at a time. Returns the number of rows written.
+    """
+    cursor = conn.cursor()
+    last_id = ""
+    converted = 0
+    started = time.perf_counter()
+    while True:
+        cursor.execute(
+            f"SELECT id, {source} FROM {table} "
+            f"WHERE id > %s AND {source} IS NOT NULL AND {pending} "
+            f"ORDER BY id LIMIT %s",
+            (last_id, batch_size),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row_id, value in rows:
+            try:
+                updates.append((encode_embedding(decode_embedding(value)), row_id))
+            except ValueError as e:
+                print(f"  Skipping {table}.{row_id}: {e}")
+        if updates:
+            cursor.executemany(
+                f"UPDATE {table} SET {target} = %s WHERE id = %s", updates
+            )
+            conn.commit()
+
+        last_id = rows[-1][0]
+        converted += len(updates)
+        elapsed = time.perf_counter() - started
+        print(
+            f"  {table}: {converted} rows converted ({converted / elapsed:.0f} rows/sec)"
+        )
+    cursor.close()
+    return converted
+
+
+def migrate_table(conn, table: str, batch_size: int, drop_json: bool = False):
+    """Brings one table's `embedding` column to the binary float32 encoding."""
+    cursor = conn.cursor()
+    embedding_type = get_column_type(cursor, table, "embedding")
+    staging_type = get_column_type(cursor, table, STAGING_COLUMN)
+    print(f"Migrating {table} (embedding column type: {embedding_type})")
+
+    if embedding_type in BINARY_TYPES:
+        # Column is already binary; re-encode any JSON text stored in it
+        convert_rows(
+            conn,
+            table,
+            "embedding",
+            "embedding",
+            "LEFT(embedding, 1) = '['",
+            batch_size,
+        )
+    else:
+        if embedding_type is None and staging_type is None:
+            print(f"  {table} has no embedding column. Skipping.")
+            cursor.close()
+            return
+
+        if embedding_type is not None:
+            if staging_type is None:
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD COLUMN {STAGING_COLUMN} LONGBLOB NULL"
+                )
+            convert_rows(
+                conn,
+                table,
+                "embedding",
+                STAGING_COLUMN,
+                f"{STAGING_COLUMN} IS NULL",
+                batch_size,
+            )
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {table} "
+                f"WHERE embedding IS NOT NULL AND {STAGING_COLUMN} IS NULL"
+            )
+            remaining = cursor.fetchone()[0]
+            if remaining:
+                print(
+                    f"  {remaining} rows in {table} could not be converted; "
+                    "leaving the JSON column in place."
+                )
+                cursor.close()
+                return
+            cursor.execute(
+                f"ALTER TABLE {table} RENAME COLUMN embedding TO {LEGACY_COLUMN}"
+            )
+
+        # Also reached when a previous run stopped between the two renames
+        cursor.execute(
+            f"ALTER TABLE {table} RENAME COLUMN {STAGING_COLUMN} TO embedding"
+        )
+
+    if drop_json and get_column_type(cursor, table, LEGACY_COLUMN) is not None:
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN {LEGACY_COLUMN}")
+        print(f"  Dropped {table}.{LEGACY_COLUMN}")
+    cursor.close()
+    print(f"Finished migrating {table}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert JSON embedding columns to binary float32."
+    )
+    parser.add_argument("--tables", nargs="+", default=list(TABLES), choices=TABLES)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--drop-json",
+        action="store_true",
+        help="Drop the old JSON column once a table has been converted",
+    )
+    args = parser.parse_args()
+
+    with tidb_pool.connection() as conn:
+        if conn:
+            for table in args.tables:
+                migrate_table(conn, table, args.batch_size, args.drop_json)
+    tidb_pool.close_all()
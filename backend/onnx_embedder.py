@@ -0,0 +1,193 @@
+# backend/onnx_embedder.py
+#
+# int8-quantized ONNX Runtime backend for all-MiniLM-L6-v2.
+#
+#   python onnx_embedder.py export            # export + quantize the model
+#   python onnx_embedder.py check             # parity and latency vs SentenceTransformer
+#
+# Enable it per deployment with EMBEDDING_BACKEND=onnx once `check` passes.
+
+import argparse
+import os
+import time
+import numpy as np
+
+HF_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_MODEL_DIR = os.getenv("EMBEDDING_ONNX_DIR", ".onnx_model")
+FLOAT_MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+MAX_SEQ_LENGTH = 256  # Matches SentenceTransformer's max_seq_length for this model
+
+
+def export_quantized_model(output_dir: str = DEFAULT_MODEL_DIR) -> str:
+    """
+    Exports the transformer to ONNX, quantizes its weights to int8 and saves
+    the tokenizer next to it. Returns the path of the quantized model.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_ID)
+    model = AutoModel.from_pretrained(HF_MODEL_ID)
+    model.eval()
+
+    float_path = os.path.join(output_dir, FLOAT_MODEL_FILE)
+    quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"}}
+    dynamic_axes["attention_mask"] = dynamic_axes["input_ids"]
+    dynamic_axes["token_type_ids"] = dynamic_axes["input_ids"]
+    dynamic_axes["last_hidden_state"] = dynamic_axes["input_ids"]
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            float_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    quantize_dynamic(float_path, quantized_path, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_dir)
+    print(f"Exported quantized model to {quantized_path}")
+    return quantized_path
+
+
+class OnnxEmbedder:
+    """
+    Runs the exported model with ONNX Runtime.
+
+    `encode` mirrors `SentenceTransformer.encode` for this model: mean pooling
+    over the attention mask followed by L2 normalization.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = DEFAULT_MODEL_DIR,
+        num_threads: int | None = None,
+        model_file: str = QUANTIZED_MODEL_FILE,
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=MAX_SEQ_LENGTH,
+            return_tensors="np",
+        )
+        inputs = {
+            name: tokens[name].astype(np.int64)
+            for name in ("input_ids", "attention_mask", "token_type_ids")
+            if name in self._input_names and name in tokens
+        }
+        hidden = self.session.run(None, inputs)[0]
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        embeddings = np.vstack(
+            [
+                self._encode_batch(texts[start : start + batch_size])
+                for start in range(0, len(texts), batch_size)
+            ]
+        )
+        return embeddings[0] if single else embeddings
+
+
+def _sample_texts() -> list[str]:
+    from sample_data import generate_sample_courses
+
+    texts = [
+        f"{c['name']}. {c['description']}. Skills: {', '.join(c['skills'])}"
+        for c in generate_sample_courses(10)
+    ]
+    texts += [
+        "Senior software engineer with 8 years of experience building Python microservices on AWS.",
+        "Led a team of five to migrate a monolith to Kubernetes, cutting deploy time by 70%.",
+        "Seeking a data analyst fluent in SQL, Tableau and stakeholder communication.",
+        "Short text",
+    ]
+    return texts
+
+
+def _time_encode(model, texts: list[str], repeats: int) -> float:
+    model.encode(texts)  # warm up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        model.encode(texts)
+    return (time.perf_counter() - started) / repeats
+
+
+def check_parity(
+    model_dir: str = DEFAULT_MODEL_DIR,
+    threshold: float = 0.99,
+    num_threads: int | None = None,
+    repeats: int = 5,
+) -> bool:
+    """
+    Compares the ONNX backend with SentenceTransformer on sample texts.
+    Prints per-text cosine similarity and latency, and returns True if every
+    cosine is at least `threshold`.
+    """
+    from embedding_utils import load_sentence_transformer
+
+    texts = _sample_texts()
+    reference_model = load_sentence_transformer()
+    onnx_model = OnnxEmbedder(model_dir, num_threads=num_threads)
+
+    reference = np.asarray(reference_model.encode(texts), dtype=np.float32)
+    candidate = onnx_model.encode(texts)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    print(f"Cosine similarity vs SentenceTransformer over {len(texts)} texts:")
+    print(f"  min {cosines.min():.5f}  mean {cosines.mean():.5f}  threshold {threshold}")
+
+    reference_seconds = _time_encode(reference_model, texts, repeats)
+    onnx_seconds = _time_encode(onnx_model, texts, repeats)
+    print(f"Latency per batch of {len(texts)} texts:")
+    print(f"  SentenceTransformer: {reference_seconds * 1000:.1f}ms")
+    print(f"  ONNX int8:           {onnx_seconds * 1000:.1f}ms")
+    print(f"  Speedup:             {reference_seconds / onnx_seconds:.2f}x")
+
+    passed = bool(cosines.min() >= threshold)
+    print("Parity check passed." if passed else "Parity check FAILED.")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONNX Runtime embedding backend.")
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--threshold", type=float, default=0.99)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_quantized_model(args.model_dir)
+    else:
+        ok = check_parity(args.model_dir, args.threshold, args.threads)
+        raise SystemExit(0 if ok else 1)
@@ -1,8 +1,52 @@
 from docx import Document
 from pypdf import PdfReader
+from concurrent.futures import ProcessPoolExecutor
+from lazy_resource import LazyResource
+from xml.etree.ElementTree import iterparse
 import io
+import multiprocessing
+import os
 import re
 import string
+import zipfile
+
+
+# Patterns used by clean_pdf_text, compiled once at import
+PDF_DICTIONARY_PATTERN = re.compile(r"<<\s*/[^>]*>>")
+PDF_NAME_NUMBER_PATTERN = re.compile(r"/\w+\s+\d+")
+PDF_COORDINATE_PATTERN = re.compile(r"\[\s*\d+\s+\d+\s*\]")
+READABLE_CHAR_PATTERN = re.compile(r"[a-zA-Z0-9\s]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+PDF_METADATA_LINE_PREFIXES = ("%PDF", "obj", "endobj")
+
+# PDFs with at least this many pages are split across worker processes
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 24))
+PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+
+# Optional extraction budgets; unset means no limit
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 0)) or None
+PDF_MAX_TEXT_BYTES = int(os.getenv("PDF_MAX_TEXT_BYTES", 0)) or None
+
+# "streaming" (default) reads the DOCX XML incrementally and includes tables,
+# text boxes, headers and footers; "python-docx" uses the python-docx object
+# model, which only returns body paragraphs. The two give different text for
+# the same file. Stored resumes are keyed by a hash of the file bytes, so a
+# re-upload of an already stored DOCX keeps the text (and embedding) from the
+# extractor that first parsed it; only newly stored files use the new setting
+DOCX_EXTRACTOR = os.getenv("DOCX_EXTRACTOR", "streaming")
+DOCX_MAX_TEXT_BYTES = int(os.getenv("DOCX_MAX_TEXT_BYTES", 0)) or None
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MARKUP_COMPATIBILITY_NAMESPACE = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+DOCX_PART_PATTERN = re.compile(r"word/(header|footer)(\d*)\.xml")
+
+
+class DocumentParseError(Exception):
+    """
+    Raised when no usable text can be extracted from a document, so callers
+    never store or embed an error message as if it were the resume.
+    """
 
 
 def clean_pdf_text(text: str) -> str:
@@ -10,92 +54,249 @@ def clean_pdf_text(text: str) -> str:
     if not text:
         return ""
 
-    print(f"Original text length: {len(text)}")  # Debug log
-    print(f"First 200 chars: {text[:200]}")  # Debug log
-
     # Remove PDF metadata patterns
     # Remove patterns like "<< /Linearized 1 /L 130930 /H [ 1277 181 ] /O 7 /E 130335 /N 1 /T 130646 >>"
-    text = re.sub(r"<<\s*/[^>]*>>", "", text)
+    text = PDF_DICTIONARY_PATTERN.sub("", text)
 
     # Remove other common PDF artifacts
-    text = re.sub(r"/\w+\s+\d+", "", text)  # Remove patterns like "/Linearized 1"
-    text = re.sub(
-        r"\[\s*\d+\s+\d+\s*\]", "", text
+    text = PDF_NAME_NUMBER_PATTERN.sub("", text)  # Remove patterns like "/Linearized 1"
+    text = PDF_COORDINATE_PATTERN.sub(
+        "", text
     )  # Remove coordinate arrays like "[ 1277 181 ]"
 
-    # Remove binary/encoded data patterns - BE LESS AGGRESSIVE
-    lines = text.split("\n")
+    # Single pass over the lines: skip blank lines and obvious PDF metadata,
+    # and keep lines that have some readable content
     cleaned_lines = []
-
-    for line in lines:
-        # Skip empty lines
-        if len(line.strip()) == 0:
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
             continue
-
-        # Skip obvious PDF metadata
         if (
-            line.strip().startswith("%PDF")
+            stripped.startswith(PDF_METADATA_LINE_PREFIXES)
             or "<<" in line
             or "/Linearized" in line
-            or line.strip().startswith("obj")
-            or line.strip().startswith("endobj")
         ):
             continue
-
-        # Keep lines that have some readable content
-        readable_chars = len(re.findall(r"[a-zA-Z0-9\s]", line))
-        if readable_chars > 0:  # Much more lenient - just needs some readable chars
+        if READABLE_CHAR_PATTERN.search(line):
             cleaned_lines.append(line)
 
-    # Rejoin lines and clean up
-    text = "\n".join(cleaned_lines)
+    # Rejoin lines and collapse all whitespace, which also drops empty lines
+    return WHITESPACE_PATTERN.sub(" ", "\n".join(cleaned_lines)).strip()
+
+
+def _extract_page_range(pdf_bytes: bytes, start: int, stop: int) -> list[str]:
+    """Extracts the text of pages [start, stop); runs in a worker process."""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _create_pdf_process_pool():
+    # Spawned workers only import this module, not the Flask app
+    return ProcessPoolExecutor(
+        max_workers=PDF_PARALLEL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+pdf_process_pool = LazyResource("PDF process pool", _create_pdf_process_pool)
+
+
+def iter_pdf_pages(pdf_bytes: bytes, max_pages: int | None = None):
+    """
+    Yields the extracted text of each page in order.
 
-    # Remove excessive whitespace and normalize
-    text = re.sub(r"\s+", " ", text)  # Replace multiple whitespace with single space
-    text = re.sub(r"\n\s*\n", "\n", text)  # Remove empty lines
-    text = text.strip()
+    Large PDFs are split into page ranges that are extracted in parallel by a
+    process pool; pages are still yielded in document order.
+    """
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    page_count = len(reader.pages)
+    if max_pages is not None:
+        page_count = min(page_count, max_pages)
 
-    print(f"Cleaned text length: {len(text)}")  # Debug log
-    print(f"Cleaned first 200 chars: {text[:200]}")  # Debug log
+    if page_count < PDF_PARALLEL_MIN_PAGES or PDF_PARALLEL_WORKERS < 2:
+        for i in range(page_count):
+            yield reader.pages[i].extract_text() or ""
+        return
+
+    ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+    futures = [
+        pdf_process_pool.get().submit(_extract_page_range, pdf_bytes, start, stop)
+        for start, stop in ranges
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Stop outstanding work if the caller stops early (e.g. budget reached)
+        for future in futures:
+            future.cancel()
 
-    return text
 
+def extract_text_from_pdf(
+    pdf_bytes: bytes,
+    max_pages: int | None = PDF_MAX_PAGES,
+    max_bytes: int | None = PDF_MAX_TEXT_BYTES,
+) -> str:
+    """
+    Extracts text from PDF bytes.
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    """Extracts text from PDF bytes."""
+    Extraction stops after `max_pages` pages or once `max_bytes` bytes of UTF-8
+    text have been collected, whichever comes first. Raises
+    DocumentParseError when the PDF cannot be read or has no readable text.
+    """
     try:
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text() or ""
-            text += page_text + "\n"
+        pages = []
+        collected = 0
+        for page_text in iter_pdf_pages(pdf_bytes, max_pages):
+            page_text += "\n"
+            if max_bytes is not None:
+                encoded = page_text.encode("utf-8")
+                if collected + len(encoded) >= max_bytes:
+                    remaining = encoded[: max_bytes - collected]
+                    pages.append(remaining.decode("utf-8", errors="ignore"))
+                    break
+                collected += len(encoded)
+            pages.append(page_text)
+        text = "".join(pages)
 
         # Clean the extracted text to remove PDF metadata and binary data
         cleaned_text = clean_pdf_text(text)
+    except Exception as e:
+        raise DocumentParseError(f"Error extracting text from PDF: {str(e)}") from e
 
-        # Additional validation - if the cleaned text is too short or contains mostly garbage
-        if (
-            len(cleaned_text.strip()) < 50
-        ):  # Very short text might indicate extraction failure
-            return "Unable to extract readable text from this PDF. Please ensure the PDF contains selectable text."
+    # Additional validation - if the cleaned text is too short or contains mostly garbage
+    if (
+        len(cleaned_text.strip()) < 50
+    ):  # Very short text might indicate extraction failure
+        raise DocumentParseError(
+            "Unable to extract readable text from this PDF. Please ensure the PDF contains selectable text."
+        )
 
-        return cleaned_text
+    return cleaned_text
+
+
+def extract_text_from_docx_dom(docx_bytes: bytes) -> str:
+    """Extracts the body paragraphs of DOCX bytes through python-docx."""
+    document = Document(io.BytesIO(docx_bytes))
+    return "".join(paragraph.text + "\n" for paragraph in document.paragraphs)
+
+
+def docx_text_parts(archive: zipfile.ZipFile) -> list[str]:
+    """Names of the parts holding text, in reading order: headers, body, footers."""
+    numbered = {"header": [], "footer": []}
+    for name in archive.namelist():
+        match = DOCX_PART_PATTERN.fullmatch(name)
+        if match:
+            numbered[match.group(1)].append((int(match.group(2) or 0), name))
+    return (
+        [name for _, name in sorted(numbered["header"])]
+        + ["word/document.xml"]
+        + [name for _, name in sorted(numbered["footer"])]
+    )
 
-    except Exception as e:
-        return f"Error extracting text from PDF: {str(e)}"
+
+def iter_docx_part_text(stream):
+    """
+    Yields text fragments of one WordprocessingML part as they are parsed.
+
+    Paragraphs end with a newline, and the cells of a table row are separated
+    by tabs. Elements are discarded as soon as they end, so memory use does
+    not grow with the document. The VML fallback copy of text boxes is
+    skipped so their text is only emitted once.
+    """
+    text_tag = WORD_NAMESPACE + "t"
+    paragraph_tag = WORD_NAMESPACE + "p"
+    cell_tag = WORD_NAMESPACE + "tc"
+    row_tag = WORD_NAMESPACE + "tr"
+    tab_tag = WORD_NAMESPACE + "tab"
+    break_tags = (WORD_NAMESPACE + "br", WORD_NAMESPACE + "cr")
+    fallback_tag = MARKUP_COMPATIBILITY_NAMESPACE + "Fallback"
+
+    stack = []
+    cell_depth = 0
+    skip_depth = 0
+    for event, element in iterparse(stream, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            stack.append(element)
+            if tag == fallback_tag:
+                skip_depth += 1
+            elif tag == cell_tag:
+                cell_depth += 1
+            continue
+
+        stack.pop()
+        if tag == fallback_tag:
+            skip_depth -= 1
+        elif not skip_depth:
+            if tag == text_tag:
+                if element.text:
+                    yield element.text
+            elif tag == tab_tag:
+                yield "\t"
+            elif tag in break_tags:
+                yield "\n"
+            elif tag == paragraph_tag:
+                # Paragraphs inside a table cell stay on the row's line
+                yield " " if cell_depth else "\n"
+            elif tag == row_tag:
+                yield "\n"
+        if tag == cell_tag:
+            cell_depth -= 1
+            if not skip_depth:
+                yield "\t"
+        element.clear()
+        if stack:
+            stack[-1].remove(element)
+
+
+def extract_text_from_docx_streaming(
+    docx_bytes: bytes, max_bytes: int | None = DOCX_MAX_TEXT_BYTES
+) -> str:
+    """
+    Extracts text from DOCX bytes by reading the headers, document body and
+    footers straight from the zip with an incremental XML parser. Includes
+    table cells and text boxes. Stops once `max_bytes` bytes of UTF-8 text
+    have been collected, without decompressing the rest of the file.
+    """
+    fragments = []
+    collected = 0
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as archive:
+        for name in docx_text_parts(archive):
+            with archive.open(name) as stream:
+                for fragment in iter_docx_part_text(stream):
+                    if max_bytes is not None:
+                        encoded = fragment.encode("utf-8")
+                        if collected + len(encoded) >= max_bytes:
+                            remaining = encoded[: max_bytes - collected]
+                            fragments.append(remaining.decode("utf-8", errors="ignore"))
+                            return "".join(fragments)
+                        collected += len(encoded)
+                    fragments.append(fragment)
+    return "".join(fragments)
 
 
 def extract_text_from_docx(docx_bytes: bytes) -> str:
-    """Extracts text from DOCX bytes."""
-    document = Document(io.BytesIO(docx_bytes))
-    text = ""
-    for paragraph in document.paragraphs:
-        text += paragraph.text + "\n"
-    return text
+    """
+    Extracts text from DOCX bytes with the configured DOCX_EXTRACTOR. Raises
+    DocumentParseError when the file cannot be read.
+    """
+    try:
+        if DOCX_EXTRACTOR == "python-docx":
+            return extract_text_from_docx_dom(docx_bytes)
+        return extract_text_from_docx_streaming(docx_bytes)
+    except Exception as e:
+        raise DocumentParseError(f"Error extracting text from DOCX: {str(e)}") from e
 
 
 def parse_document(file_bytes: bytes, file_type: str) -> str:
-    """Parses document bytes based on file type and returns extracted text."""
+    """
+    Parses document bytes based on file type and returns extracted text.
+    Raises DocumentParseError for unreadable files and unsupported types.
+    """
     if file_type == "application/pdf":
         return extract_text_from_pdf(file_bytes)
     elif (
@@ -104,6 +305,6 @@ def parse_document(file_bytes: bytes, file_type: str) -> str:
     ):
         return extract_text_from_docx(file_bytes)
     elif file_type == "application/msword":
-        return f"Unsupported .doc file type for full parsing. Raw bytes length: {len(file_bytes)}"
+        raise DocumentParseError("Unsupported .doc file type for full parsing. Please upload a PDF or DOCX file.")
     else:
-        return "Unsupported file type"
+        raise DocumentParseError(f"Unsupported file type: {file_type}")
@@ -0,0 +1,143 @@
+# backend/resume_store.py
+#
+# Content-addressed resumes. Uploaded files are stored in S3 under the
+# sha256 of their bytes and the `resumes` row records that hash, so the same
+# file uploaded again reuses the stored object, parsed text and embedding
+# instead of being written, parsed and embedded a second time. The uploaded
+# file name is kept in `resumes.file_name` and as S3 object metadata.
+#
+# Add the column and unique index before deploying writers that use
+# `save_resume`:
+#
+#   python resume_store.py migrate
+#
+# Existing rows keep a NULL hash (a unique index allows any number of
+# NULLs). Their S3 objects were keyed by file name and may since have been
+# overwritten by another upload of the same name, so hashing them now could
+# attach the wrong content to a row.
+
+import argparse
+import hashlib
+import os
+import re
+from db_pool import tidb_pool
+from embedding_codec import decode_embedding, encode_embedding
+from job_postings import has_index
+from migrate_embeddings import get_column_type
+
+CONTENT_HASH_INDEX = "uniq_resumes_content_hash"
+CONTENT_KEY_PATTERN = re.compile(r"resumes/([0-9a-f]{64})(?:\.[A-Za-z0-9]+)?")
+
+
+def resume_content_hash(file_bytes: bytes) -> str:
+    """Returns the sha256 identifying a resume file's exact bytes."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def resume_s3_key(content_hash: str, file_name: str) -> str:
+    """S3 key for a resume's bytes; the original extension is kept for downloads."""
+    extension = os.path.splitext(file_name)[1].lower()
+    return f"resumes/{content_hash}{extension}"
+
+
+def content_hash_from_key(s3_key: str) -> str | None:
+    """The hash in a content-addressed key, or None for keys written before hashing."""
+    match = CONTENT_KEY_PATTERN.fullmatch(s3_key)
+    return match.group(1) if match else None
+
+
+def original_file_name_metadata(file_name: str) -> dict:
+    """S3 object metadata recording the uploaded file name (ASCII only, as S3 requires)."""
+    return {"original-file-name": file_name.encode("ascii", "replace").decode("ascii")}
+
+
+def find_resume(conn, content_hash: str) -> dict | None:
+    """Returns the stored resume with this hash (id, fileName, s3Url, rawText, embedding), or None."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT id, file_name, s3_url, raw_text, embedding FROM resumes WHERE content_hash = %s",
+            (content_hash,),
+        )
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row:
+        return None
+    resume_id, file_name, s3_url, raw_text, embedding = row
+    return {
+        "id": resume_id,
+        "fileName": file_name,
+        "s3Url": s3_url,
+        "rawText": raw_text,
+        "embedding": decode_embedding(embedding),
+    }
+
+
+def lookup_resume(content_hash: str) -> dict | None:
+    """
+    Like `find_resume`, using a pooled connection. Lookup failures are
+    treated as a miss so the caller simply stores and processes the file.
+    """
+    try:
+        with tidb_pool.connection() as conn:
+            if conn:
+                return find_resume(conn, content_hash)
+    except Exception as e:
+        print(f"Error looking up resume {content_hash[:12]}: {e}")
+    return None
+
+
+def save_resume(
+    cursor,
+    resume_id: str,
+    content_hash: str,
+    file_name: str,
+    s3_url: str,
+    raw_text: str,
+    embedding,
+) -> tuple[str, bool]:
+    """
+    Inserts a resume unless one with the same hash is already stored (for
+    example by a concurrent upload of the same file). Returns (id of the
+    stored row, whether it was inserted). Runs on the caller's cursor so it
+    can share a transaction.
+    """
+    cursor.execute(
+        "INSERT INTO resumes (id, content_hash, file_name, s3_url, raw_text, embedding) "
+        "VALUES (%s, %s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE id = id",
+        (resume_id, content_hash, file_name, s3_url, raw_text, encode_embedding(embedding)),
+    )
+    # Zero affected rows means the hash was already stored
+    if cursor.rowcount == 1:
+        return resume_id, True
+    cursor.execute("SELECT id FROM resumes WHERE content_hash = %s", (content_hash,))
+    return cursor.fetchone()[0], False
+
+
+def migrate(conn):
+    """Adds the content_hash column and its unique index to resumes if they are missing."""
+    cursor = conn.cursor()
+    if get_column_type(cursor, "resumes", "content_hash") is None:
+        cursor.execute("ALTER TABLE resumes ADD COLUMN content_hash CHAR(64) NULL")
+        print("  Added resumes.content_hash")
+    if not has_index(cursor, "resumes", CONTENT_HASH_INDEX):
+        cursor.execute(
+            f"ALTER TABLE resumes ADD UNIQUE INDEX {CONTENT_HASH_INDEX} (content_hash)"
+        )
+        print(f"  Added unique index {CONTENT_HASH_INDEX}")
+    cursor.close()
+    print("Resumes table is ready for content-addressed storage.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain content-addressed resumes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="add the content hash column and index")
+    args = parser.parse_args()
+
+    with tidb_pool.connection() as conn:
+        if conn:
+            migrate(conn)
+    tidb_pool.close_all()
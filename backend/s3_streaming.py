@@ -0,0 +1,149 @@
+# backend/s3_streaming.py
+
+import hashlib
+
+# S3 requires every part except the last to be at least 5 MiB
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when more bytes are written than the configured upload limit."""
+
+
+class S3MultipartWriter:
+    """
+    Write-only file-like object that streams bytes into an S3 object.
+
+    Written data is buffered until a full part is available and then sent with
+    `upload_part`, so at most one part is held in memory regardless of the
+    file size. Files smaller than one part are sent with a single `put_object`
+    when `complete()` is called. Writing past `max_bytes` aborts the upload and
+    raises `UploadTooLargeError`. A sha256 of the bytes is kept as they are
+    written and is available as `content_hash`.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket: str,
+        key: str,
+        part_size: int = 8 * 1024 * 1024,
+        max_bytes: int | None = None,
+        content_type: str | None = None,
+        metadata: dict | None = None,
+    ):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self.max_bytes = max_bytes
+        self.content_type = content_type
+        self.metadata = metadata or {}
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._finished = False
+
+    def _object_args(self) -> dict:
+        args = {"Bucket": self.bucket, "Key": self.key}
+        if self.content_type:
+            args["ContentType"] = self.content_type
+        if self.metadata:
+            args["Metadata"] = self.metadata
+        return args
+
+    def _upload_part(self, body: bytes):
+        if self._upload_id is None:
+            response = self.s3_client.create_multipart_upload(**self._object_args())
+            self._upload_id = response["UploadId"]
+        part_number = len(self._parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def write(self, data: bytes) -> int:
+        if self._finished:
+            raise ValueError("Upload already finished")
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.abort()
+            raise UploadTooLargeError(
+                f"Upload exceeds the maximum size of {self.max_bytes} bytes"
+            )
+        self._sha256.update(data)
+        self._buffer += data
+        try:
+            while len(self._buffer) >= self.part_size:
+                self._upload_part(bytes(self._buffer[: self.part_size]))
+                del self._buffer[: self.part_size]
+        except Exception:
+            self.abort()
+            raise
+        return len(data)
+
+    @property
+    def content_hash(self) -> str:
+        """Hex sha256 of the bytes written so far."""
+        return self._sha256.hexdigest()
+
+    # Werkzeug's form parser rewinds file containers once they are written;
+    # there is nothing to rewind for a write-only stream
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return 0
+
+    def tell(self) -> int:
+        return self.size
+
+    def readable(self) -> bool:
+        return False
+
+    def writable(self) -> bool:
+        return True
+
+    def complete(self) -> int:
+        """Uploads any buffered bytes and finishes the object. Returns its size."""
+        if self._finished:
+            return self.size
+        try:
+            if self._upload_id is None:
+                self.s3_client.put_object(Body=bytes(self._buffer), **self._object_args())
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+        except Exception:
+            self.abort()
+            raise
+        self._buffer = bytearray()
+        self._finished = True
+        return self.size
+
+    def abort(self):
+        """Discards buffered bytes and any parts already sent to S3."""
+        if self._finished:
+            return
+        self._finished = True
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            try:
+                self.s3_client.abort_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+                )
+            except Exception as e:
+                print(f"Error aborting multipart upload for {self.key}: {e}")
+
+    def close(self):
+        """Aborts the upload unless `complete()` has already finished it."""
+        self.abort()
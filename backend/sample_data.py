@@ -1,62 +1,235 @@
 # backend/sample_data.py
 
+import io
+import random
 import uuid
 import json
 
 
+COURSE_NAMES = [
+    "Introduction to Python Programming",
+    "Advanced JavaScript for Web Development",
+    "Machine Learning Fundamentals",
+    "Deep Learning with TensorFlow",
+    "Data Science with Python and R",
+    "Cloud Computing with AWS",
+    "DevOps Essentials",
+    "Cybersecurity Basics",
+    "Database Management with SQL",
+    "Frontend Development with React and Next.js",
+]
+COURSE_DESCRIPTIONS = [
+    "Learn the basics of Python, including data types, control flow, and functions. Perfect for beginners.",
+    "Dive deep into modern JavaScript features, frameworks like React, and build dynamic web applications.",
+    "Understand core machine learning concepts, algorithms, and practical applications using scikit-learn.",
+    "Explore neural networks, convolutional networks, and recurrent networks using TensorFlow and Keras.",
+    "Master data manipulation, analysis, and visualization using Python (Pandas, Matplotlib) and R.",
+    "Get hands-on experience with Amazon Web Services (AWS) core services like EC2, S3, and Lambda.",
+    "Learn continuous integration, continuous delivery, and infrastructure as code for efficient software delivery.",
+    "Discover fundamental cybersecurity principles, network security, and common cyber threats.",
+    "Gain proficiency in SQL for database design, querying, and management across various relational databases.",
+    "Build modern, high-performance web applications using React, Next.js, and state management libraries.",
+]
+COURSE_SKILLS = [
+    ["Python", "Programming Basics", "Algorithms"],
+    ["JavaScript", "React", "Next.js", "Web Development"],
+    ["Machine Learning", "Python", "Scikit-learn", "Data Analysis"],
+    ["Deep Learning", "TensorFlow", "Keras", "Neural Networks"],
+    ["Data Science", "Python", "R", "Pandas", "Matplotlib"],
+    ["AWS", "Cloud Computing", "EC2", "S3", "Lambda"],
+    ["DevOps", "CI/CD", "Docker", "Kubernetes"],
+    ["Cybersecurity", "Network Security", "Threat Analysis"],
+    ["SQL", "Database Design", "Data Querying"],
+    ["React", "Next.js", "Frontend Development", "UI/UX"],
+]
+
+
+# Namespace for the deterministic IDs of streamed sample courses
+SAMPLE_COURSE_NAMESPACE = uuid.UUID("5b0f4c1e-9d6a-4f3e-8a57-2c1d7e9b3a40")
+
+
 def generate_sample_courses(num_courses: int = 10) -> list[dict]:
     """Generates a list of sample course dictionaries."""
     courses = []
-    course_names = [
-        "Introduction to Python Programming",
-        "Advanced JavaScript for Web Development",
-        "Machine Learning Fundamentals",
-        "Deep Learning with TensorFlow",
-        "Data Science with Python and R",
-        "Cloud Computing with AWS",
-        "DevOps Essentials",
-        "Cybersecurity Basics",
-        "Database Management with SQL",
-        "Frontend Development with React and Next.js",
-    ]
-    course_descriptions = [
-        "Learn the basics of Python, including data types, control flow, and functions. Perfect for beginners.",
-        "Dive deep into modern JavaScript features, frameworks like React, and build dynamic web applications.",
-        "Understand core machine learning concepts, algorithms, and practical applications using scikit-learn.",
-        "Explore neural networks, convolutional networks, and recurrent networks using TensorFlow and Keras.",
-        "Master data manipulation, analysis, and visualization using Python (Pandas, Matplotlib) and R.",
-        "Get hands-on experience with Amazon Web Services (AWS) core services like EC2, S3, and Lambda.",
-        "Learn continuous integration, continuous delivery, and infrastructure as code for efficient software delivery.",
-        "Discover fundamental cybersecurity principles, network security, and common cyber threats.",
-        "Gain proficiency in SQL for database design, querying, and management across various relational databases.",
-        "Build modern, high-performance web applications using React, Next.js, and state management libraries.",
-    ]
-    course_skills = [
-        ["Python", "Programming Basics", "Algorithms"],
-        ["JavaScript", "React", "Next.js", "Web Development"],
-        ["Machine Learning", "Python", "Scikit-learn", "Data Analysis"],
-        ["Deep Learning", "TensorFlow", "Keras", "Neural Networks"],
-        ["Data Science", "Python", "R", "Pandas", "Matplotlib"],
-        ["AWS", "Cloud Computing", "EC2", "S3", "Lambda"],
-        ["DevOps", "CI/CD", "Docker", "Kubernetes"],
-        ["Cybersecurity", "Network Security", "Threat Analysis"],
-        ["SQL", "Database Design", "Data Querying"],
-        ["React", "Next.js", "Frontend Development", "UI/UX"],
-    ]
-
     for i in range(num_courses):
-        idx = i % len(course_names)
+        idx = i % len(COURSE_NAMES)
         course = {
             "id": str(uuid.uuid4()),
-            "name": course_names[idx],
-            "description": course_descriptions[idx],
+            "name": COURSE_NAMES[idx],
+            "description": COURSE_DESCRIPTIONS[idx],
             "url": f"https://example.com/courses/{idx+1}",
-            "skills": course_skills[idx],
+            "skills": COURSE_SKILLS[idx],
         }
         courses.append(course)
     return courses
 
 
+def iter_sample_courses(num_courses: int):
+    """
+    Lazily yields sample courses, so catalogs of millions of rows can be
+    streamed without holding them in memory. IDs are derived from the course
+    number, which makes reruns upsert the same rows instead of adding new ones.
+    Names get a numbered edition suffix once the base catalog repeats so the
+    embedded texts stay distinct.
+    """
+    for i in range(num_courses):
+        idx = i % len(COURSE_NAMES)
+        edition = i // len(COURSE_NAMES)
+        name = COURSE_NAMES[idx]
+        if edition:
+            name = f"{name} (Edition {edition + 1})"
+        yield {
+            "id": str(uuid.uuid5(SAMPLE_COURSE_NAMESPACE, str(i))),
+            "name": name,
+            "description": COURSE_DESCRIPTIONS[idx],
+            "url": f"https://example.com/courses/{idx+1}?edition={edition + 1}",
+            "skills": COURSE_SKILLS[idx],
+        }
+
+
+COURSE_LEVELS = ["Introduction to", "Practical", "Advanced", "Applied", "Hands-on"]
+COURSE_FORMATS = ["bootcamp", "workshop", "specialization", "project course", "certificate"]
+ALL_SKILLS = sorted({skill for skills in COURSE_SKILLS for skill in skills})
+
+
+def iter_course_catalog(num_courses: int, seed: int = 0):
+    """
+    Like `iter_sample_courses`, but every course gets its own title, a
+    longer description and a random mix of extra skills, so large catalogs
+    exercise keyword and skill indexes the way a real catalog would.
+    The same `seed` always yields the same catalog.
+    """
+    rng = random.Random(seed)
+    for i in range(num_courses):
+        idx = rng.randrange(len(COURSE_NAMES))
+        extra_skills = rng.sample(ALL_SKILLS, rng.randint(1, 4))
+        skills = list(dict.fromkeys(COURSE_SKILLS[idx] + extra_skills))
+        level = rng.choice(COURSE_LEVELS)
+        course_format = rng.choice(COURSE_FORMATS)
+        yield {
+            "id": str(uuid.uuid5(SAMPLE_COURSE_NAMESPACE, f"catalog-{seed}-{i}")),
+            "name": f"{level} {COURSE_NAMES[idx]} {course_format} #{i}",
+            "description": (
+                f"{COURSE_DESCRIPTIONS[idx]} This {course_format} also covers "
+                f"{', '.join(extra_skills)} through {rng.randint(3, 12)} graded projects."
+            ),
+            "url": f"https://example.com/catalog/{seed}/{i}",
+            "skills": skills,
+        }
+
+
+RESUME_VERBS = ["Built", "Led", "Designed", "Migrated", "Optimized", "Automated", "Shipped"]
+RESUME_OUTCOMES = [
+    "cutting p99 latency by {n}%",
+    "serving {n}k requests per second",
+    "reducing infrastructure cost by {n}%",
+    "for a team of {n} engineers",
+    "improving test coverage to {n}%",
+]
+
+
+def generate_resume_lines(num_bullets: int, seed: int = 0) -> list[str]:
+    """
+    Returns the lines of a synthetic resume with `num_bullets` experience
+    bullets, grouped into roles of up to eight bullets each.
+    """
+    rng = random.Random(seed)
+    lines = [f"Candidate {seed}", "Senior Software Engineer", "Experience"]
+    for i in range(num_bullets):
+        if i % 8 == 0:
+            lines.append(f"Software Engineer, Company {i // 8 + 1} ({2024 - i // 8})")
+        skills = rng.sample(ALL_SKILLS, 2)
+        outcome = rng.choice(RESUME_OUTCOMES).format(n=rng.randint(5, 95))
+        lines.append(
+            f"- {rng.choice(RESUME_VERBS)} a {skills[0]} service with {skills[1]}, {outcome}."
+        )
+    lines.append("Skills")
+    lines.append(", ".join(rng.sample(ALL_SKILLS, 10)))
+    return lines
+
+
+def generate_resume_docx(num_bullets: int, seed: int = 0, skills_table: bool = False) -> bytes:
+    """
+    Builds a DOCX resume from `generate_resume_lines`. With `skills_table`,
+    contact details go in the page header and skills in a table, the way
+    many resume templates lay them out.
+    """
+    from docx import Document
+
+    document = Document()
+    for line in generate_resume_lines(num_bullets, seed):
+        if line.startswith("- "):
+            document.add_paragraph(line[2:], style="List Bullet")
+        else:
+            document.add_paragraph(line)
+    if skills_table:
+        rng = random.Random(seed)
+        document.sections[0].header.paragraphs[0].text = (
+            f"candidate{seed}@example.com | +1 555 0100 | github.com/candidate{seed}"
+        )
+        table = document.add_table(rows=0, cols=2)
+        for skill in rng.sample(ALL_SKILLS, 8):
+            cells = table.add_row().cells
+            cells[0].text = skill
+            cells[1].text = f"{rng.randint(1, 10)} years"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _pdf_string(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"({escaped})"
+
+
+def generate_resume_pdf(num_bullets: int, seed: int = 0, lines_per_page: int = 48) -> bytes:
+    """
+    Builds a text PDF resume from `generate_resume_lines`, one Helvetica line
+    per resume line. Written directly so no PDF library is needed.
+    """
+    lines = [
+        line.encode("latin-1", "replace").decode("latin-1")
+        for line in generate_resume_lines(num_bullets, seed)
+    ]
+    pages = [lines[i : i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    # Object 1 is the catalog, 2 the page tree, 3 the font; each page then
+    # takes two objects (page and content stream)
+    objects = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(
+        f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] "
+        f"/Count {len(pages)} >>"
+    )
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, page_lines in zip(page_ids, pages):
+        content = "BT /F1 10 Tf 14 TL 50 760 Td\n" + "".join(
+            f"{_pdf_string(line)} Tj T*\n" for line in page_lines
+        ) + "ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(content.encode('latin-1'))} >>\nstream\n{content}\nendstream")
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref_offset = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    output.write(
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    )
+    return output.getvalue()
+
+
 if __name__ == "__main__":
     sample_courses = generate_sample_courses(15)  # Generate 15 courses
     for course in sample_courses:
@@ -0,0 +1,100 @@
+# backend/serve.py
+#
+# Production entry point with two serving modes for the same Flask app:
+#
+#   python serve.py --mode threaded --workers 8
+#       A fixed pool of worker threads; each request holds a thread while it
+#       waits on S3, TiDB or Claude, so concurrency is capped at --workers.
+#
+#   python serve.py --mode async --max-connections 1000 --cpu-threads 4
+#       gevent event loop. The standard library is monkey-patched so S3
+#       (botocore), TiDB (pymysql) and Claude (httpx) network calls yield to
+#       other requests while they wait, and CPU-bound parsing and embedding run
+#       on a small pool of native threads (see cpu_offload.py). Requires
+#       `pip install gevent`.
+#
+# Routes and JSON contracts are identical in both modes. Add --standins to
+# serve against the local stand-ins in standins.py instead of real services.
+
+import argparse
+import os
+
+
+def serve_threaded(host: str, port: int, workers: int):
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer
+    from main import app
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """Handles each connection on one of `workers` threads."""
+
+        multithread = True
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wsgi")
+
+        def process_request(self, request, client_address):
+            self._pool.submit(self._process_request_thread, request, client_address)
+
+        def _process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    print(f"Serving on http://{host}:{port} (threaded, {workers} workers)")
+    PooledWSGIServer(host, port, app).serve_forever()
+
+
+def serve_async(host: str, port: int, max_connections: int, cpu_threads: int):
+    import gevent
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+    from cpu_offload import set_cpu_runner
+    from main import app
+
+    cpu_pool = gevent.get_hub().threadpool
+    cpu_pool.maxsize = cpu_threads
+    set_cpu_runner(lambda fn, *args, **kwargs: cpu_pool.apply(fn, args, kwargs))
+
+    print(
+        f"Serving on http://{host}:{port} "
+        f"(async, {max_connections} connections, {cpu_threads} CPU threads)"
+    )
+    WSGIServer((host, port), app, spawn=Pool(max_connections), log=None).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the ResumeGenie API.")
+    parser.add_argument("--mode", choices=["threaded", "async"], default="threaded")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=8, help="threaded mode")
+    parser.add_argument("--max-connections", type=int, default=1000, help="async mode")
+    parser.add_argument("--cpu-threads", type=int, default=os.cpu_count() or 4, help="async mode")
+    parser.add_argument("--standins", action="store_true", help="use local stand-ins for S3, DB and LLM")
+    args = parser.parse_args()
+
+    if args.mode == "async":
+        # Must run before anything imports socket, ssl or threading
+        from gevent import monkey
+
+        monkey.patch_all()
+
+    if args.standins:
+        import standins
+
+        standins.install()
+    else:
+        from main import start_background_warmup
+
+        start_background_warmup()
+
+    if args.mode == "async":
+        serve_async(args.host, args.port, args.max_connections, args.cpu_threads)
+    else:
+        serve_threaded(args.host, args.port, args.workers)
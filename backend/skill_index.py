@@ -0,0 +1,446 @@
+# backend/skill_index.py
+#
+# Inverted index over course skills and keywords, used to prune and re-rank
+# candidates before dense scoring in /vector_search.
+#
+# Terms are extracted at ingest time (ingest_courses.py) and stored in the
+# course_keywords table, so the API only has to read them back. Existing
+# courses can be backfilled with:
+#
+#   python skill_index.py backfill --batch-size 1000
+
+import argparse
+import json
+import math
+import re
+import threading
+from collections import Counter
+from collections.abc import Set
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9+#]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it of on or the to "
+    "using with your you this that these those like via".split()
+)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def normalize_skill(skill: str) -> str:
+    """Lower-cases a skill name and collapses whitespace ("Machine  Learning" -> "machine learning")."""
+    return " ".join(str(skill).lower().split())
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into lower-case keyword tokens, keeping names like c++, c# and next.js."""
+    return [
+        token
+        for token in TOKEN_PATTERN.findall((text or "").lower())
+        if token not in STOPWORDS
+    ]
+
+
+def course_terms(course: dict) -> tuple[list[str], dict]:
+    """Returns (normalized skills, keyword term frequencies) for one course."""
+    skills = sorted({normalize_skill(skill) for skill in course.get("skills") or [] if str(skill).strip()})
+    text = " ".join(
+        [course.get("name") or "", course.get("description") or "", " ".join(skills)]
+    )
+    return skills, dict(Counter(tokenize(text)))
+
+
+class CourseSet(Set):
+    """
+    Read-only set of course ids backed by a boolean mask over index
+    positions, so a broad skill filter does not build tens of thousands of
+    Python strings. Membership tests are a dict lookup and an array read.
+    """
+
+    def __init__(self, ids: list, positions: dict, mask: np.ndarray):
+        self._ids = ids
+        self._positions = positions
+        self._mask = mask
+        self._count = int(mask.sum())
+
+    def __contains__(self, course_id) -> bool:
+        position = self._positions.get(course_id)
+        return position is not None and position < self._mask.size and bool(self._mask[position])
+
+    def __iter__(self):
+        ids = self._ids
+        for position in np.flatnonzero(self._mask).tolist():
+            yield ids[position]
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SkillIndex:
+    """
+    In-memory inverted index from normalized skills and keyword tokens to
+    course ids.
+
+    `candidates()` intersects the posting lists of required skills and
+    scores keyword matches with BM25, so dense scoring only runs over the
+    courses that survive. Each course has a fixed integer position, and the
+    posting lists used by a query are cached as numpy arrays of positions
+    (and term frequencies), so filtering and scoring are a few vectorized
+    operations whatever the list lengths. A list's arrays are rebuilt only
+    after a course using it changes. Loading and adds follow the same rules
+    as `EmbeddingIndex`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._reset()
+        self._loaded = False
+        self._loading = False
+        self._pending = {}
+
+    def _reset(self):
+        self._ids = []  # position -> course id
+        self._positions = {}  # course id -> position
+        self._documents = []  # position -> (skills, term frequencies)
+        self._lengths = np.zeros(1024)  # position -> document length
+        self._total_length = 0
+        self._skills = {}  # skill -> set of positions
+        self._postings = {}  # term -> {position: term frequency}
+        self._skill_arrays = {}  # skill -> positions, built on first use
+        # term -> (positions, BM25 weights before idf), built on first use and
+        # dropped whenever a course changes, since weights depend on the
+        # average document length
+        self._term_arrays = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _upsert(self, course_id, skills: list[str], terms: dict):
+        position = self._positions.get(course_id)
+        if position is None:
+            position = len(self._ids)
+            self._ids.append(course_id)
+            self._positions[course_id] = position
+            self._documents.append(([], {}))
+            if position == self._lengths.shape[0]:
+                self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+        old_skills, old_terms = self._documents[position]
+        for skill in old_skills:
+            self._skills[skill].discard(position)
+            self._skill_arrays.pop(skill, None)
+        for term in old_terms:
+            self._postings[term].pop(position, None)
+        self._term_arrays = {}
+
+        length = sum(terms.values())
+        self._total_length += length - int(self._lengths[position])
+        self._lengths[position] = length
+        self._documents[position] = (skills, terms)
+        for skill in skills:
+            self._skills.setdefault(skill, set()).add(position)
+            self._skill_arrays.pop(skill, None)
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[position] = frequency
+
+    def _skill_positions(self, skill: str) -> np.ndarray:
+        array = self._skill_arrays.get(skill)
+        if array is None:
+            positions = self._skills.get(skill, ())
+            array = np.fromiter(positions, dtype=np.int64, count=len(positions))
+            self._skill_arrays[skill] = array
+        return array
+
+    def _term_postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        """(positions, tf * (k1 + 1) / (tf + length norm)) for one term's posting list."""
+        arrays = self._term_arrays.get(term)
+        if arrays is None:
+            postings = self._postings.get(term, {})
+            positions = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            frequencies = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+            average_length = self._total_length / len(self._ids) or 1.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[positions] / average_length)
+            arrays = (positions, frequencies * (BM25_K1 + 1) / (frequencies + norm))
+            self._term_arrays[term] = arrays
+        return arrays
+
+    def load(self, fetch_rows):
+        """
+        Fills the index from `fetch_rows()`, an iterable of
+        (course id, skills, term frequencies), unless it is already loaded.
+        """
+        with self._load_lock:
+            with self._lock:
+                if self._loaded:
+                    return
+                self._loading = True
+                self._pending = {}
+            try:
+                rows = list(fetch_rows())
+            except Exception:
+                with self._lock:
+                    self._loading = False
+                    self._pending = {}
+                raise
+            with self._lock:
+                self._reset()
+                for course_id, skills, terms in rows:
+                    self._upsert(course_id, skills, terms)
+                for course_id, (skills, terms) in self._pending.items():
+                    self._upsert(course_id, skills, terms)
+                self._pending = {}
+                self._loading = False
+                self._loaded = True
+        print(f"Loaded {len(self._ids)} courses into the {self.name} index.")
+
+    def add(self, course_id, skills: list[str], terms: dict):
+        """Inserts or replaces one course. Dropped if the index has not been loaded."""
+        with self._lock:
+            if self._loaded:
+                self._upsert(course_id, skills, terms)
+            elif self._loading:
+                self._pending[course_id] = (skills, terms)
+
+    def _filter_mask(self, required_skills) -> np.ndarray:
+        """Boolean mask over positions of the courses that have every required skill."""
+        skills = {normalize_skill(skill) for skill in required_skills}
+        mask = np.zeros(len(self._ids), dtype=bool)
+        # Start from the rarest skill; every further skill can only narrow it
+        arrays = sorted((self._skill_positions(skill) for skill in skills), key=len)
+        if not arrays:
+            mask[:] = True
+            return mask
+        mask[arrays[0]] = True
+        for positions in arrays[1:]:
+            if not mask.any():
+                break
+            keep = np.zeros_like(mask)
+            keep[positions] = True
+            mask &= keep
+        return mask
+
+    def _bm25_scores(self, query_text: str, mask: np.ndarray | None = None):
+        """(positions, scores) of courses matching a query term, within `mask`."""
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        count = len(self._ids)
+        if not count:
+            return empty
+        scores = None
+        for term in set(tokenize(query_text)):
+            positions, weights = self._term_postings(term)
+            if not positions.size:
+                continue
+            idf = math.log(1 + (count - positions.size + 0.5) / (positions.size + 0.5))
+            if scores is None:
+                scores = np.zeros(count)
+            # A course appears once per posting list, so plain fancy-index adds are safe
+            scores[positions] += idf * weights
+        if scores is None:
+            return empty
+        if mask is not None:
+            scores[~mask] = 0.0
+        matched = np.flatnonzero(scores > 0)
+        return matched, scores[matched]
+
+    def filter(self, required_skills) -> CourseSet:
+        """Returns the ids of courses that have every one of `required_skills`."""
+        with self._lock:
+            return CourseSet(self._ids, self._positions, self._filter_mask(required_skills))
+
+    def bm25(self, query_text: str, restrict: set | None = None) -> dict:
+        """BM25 scores of every course matching at least one query term (within `restrict`)."""
+        with self._lock:
+            mask = None
+            if restrict is not None:
+                mask = np.zeros(len(self._ids), dtype=bool)
+                mask[[self._positions[i] for i in restrict if i in self._positions]] = True
+            positions, scores = self._bm25_scores(query_text, mask)
+            ids = self._ids
+            return {ids[p]: score for p, score in zip(positions.tolist(), scores.tolist())}
+
+    def candidates(self, query_text: str | None, required_skills=None, max_candidates: int = 1000):
+        """
+        Returns (candidate ids, keyword scores) for a search, or (None, {})
+        when neither keywords nor required skills were given and every course
+        should be scored.
+
+        Required skills are a hard filter. Keyword matches are scored with
+        BM25 and only the best `max_candidates` are kept, as a list in score
+        order; if no course matches a keyword, the skill-filtered set is
+        returned unscored as a `CourseSet`.
+        """
+        if not query_text and not required_skills:
+            return None, {}
+        with self._lock:
+            allowed = self._filter_mask(required_skills) if required_skills else None
+            if query_text:
+                positions, scores = self._bm25_scores(query_text, allowed)
+                if positions.size:
+                    if positions.size > max_candidates:
+                        top = np.argpartition(-scores, max_candidates - 1)[:max_candidates]
+                        positions, scores = positions[top], scores[top]
+                    order = np.argsort(-scores, kind="stable")
+                    ids = self._ids
+                    top_ids = [ids[p] for p in positions[order].tolist()]
+                    return top_ids, dict(zip(top_ids, scores[order].tolist()))
+            if allowed is None:
+                return None, {}
+            return CourseSet(self._ids, self._positions, allowed), {}
+
+
+def fuse_scores(results: list[dict], keyword_scores: dict, keyword_weight: float) -> list[dict]:
+    """
+    Combines dense similarity with max-normalized BM25 scores as
+    (1 - keyword_weight) * similarity + keyword_weight * keyword score, adding
+    `keywordScore` and `score` to each result and re-sorting by `score`.
+    """
+    top_keyword = max(keyword_scores.values(), default=0.0) or 1.0
+    for result in results:
+        keyword = keyword_scores.get(result["id"], 0.0) / top_keyword
+        result["keywordScore"] = round(keyword, 4)
+        result["score"] = (1 - keyword_weight) * result["similarity"] + keyword_weight * keyword
+    return sorted(results, key=lambda result: result["score"], reverse=True)
+
+
+# -- storage ----------------------------------------------------------------
+
+CREATE_KEYWORD_TABLE = """
+    CREATE TABLE IF NOT EXISTS course_keywords (
+        course_id VARCHAR(36) PRIMARY KEY,
+        skills TEXT NOT NULL,
+        terms TEXT NOT NULL
+    )
+"""
+
+
+def ensure_keyword_table(cursor):
+    cursor.execute(CREATE_KEYWORD_TABLE)
+
+
+def keyword_row(course: dict) -> tuple:
+    """Parameter tuple for one row of `upsert_keywords`."""
+    skills, terms = course_terms(course)
+    return (course["id"], json.dumps(skills), json.dumps(terms))
+
+
+def upsert_keywords(cursor, courses: list[dict]):
+    """Writes the extracted skills and terms for a batch of courses."""
+    if not courses:
+        return
+    cursor.executemany(
+        "INSERT INTO course_keywords (course_id, skills, terms) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE skills = VALUES(skills), terms = VALUES(terms)",
+        [keyword_row(course) for course in courses],
+    )
+
+
+def fetch_keyword_rows(conn):
+    """Yields (course id, skills, terms) from course_keywords."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT course_id, skills, terms FROM course_keywords")
+        for course_id, skills, terms in cursor.fetchall():
+            yield course_id, json.loads(skills), json.loads(terms)
+    finally:
+        cursor.close()
+
+
+def count_courses(conn) -> int:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM courses")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        cursor.close()
+
+
+def fetch_course_term_rows(conn):
+    """
+    Yields (course id, skills, terms) for every course, from course_keywords
+    when it covers every course and otherwise by extracting terms from the
+    courses table, so courses missing from course_keywords stay searchable.
+    """
+    try:
+        rows = list(fetch_keyword_rows(conn))
+    except Exception as e:
+        print(f"Could not read course_keywords ({e}); extracting terms from courses.")
+        rows = None
+    if rows is not None:
+        course_count = count_courses(conn)
+        if len(rows) >= course_count:
+            yield from rows
+            return
+        print(
+            f"course_keywords has {len(rows)} rows but courses has {course_count}; "
+            "extracting terms from courses. Run `python skill_index.py backfill` to fix."
+        )
+    for batch in iter_courses(conn, 1000):
+        for course in batch:
+            yield (course["id"], *course_terms(course))
+
+
+def iter_courses(conn, batch_size: int):
+    """Yields batches of course dicts from the courses table in id order."""
+    cursor = conn.cursor()
+    last_id = ""
+    while True:
+        cursor.execute(
+            "SELECT id, name, description, skills FROM courses WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        yield [
+            {
+                "id": course_id,
+                "name": name,
+                "description": description,
+                "skills": json.loads(skills) if skills else [],
+            }
+            for course_id, name, description, skills in rows
+        ]
+        last_id = rows[-1][0]
+    cursor.close()
+
+
+def backfill(conn, batch_size: int = 1000) -> int:
+    """Extracts terms for every course into course_keywords. Returns the number of rows written."""
+    cursor = conn.cursor()
+    ensure_keyword_table(cursor)
+    written = 0
+    for batch in iter_courses(conn, batch_size):
+        upsert_keywords(cursor, batch)
+        conn.commit()
+        written += len(batch)
+        print(f"  {written} courses indexed")
+    cursor.close()
+    print(f"Backfilled keywords for {written} courses.")
+    return written
+
+
+# Shared index for course searches, filled alongside `course_index`
+course_skill_index = SkillIndex("course skills")
+
+
+if __name__ == "__main__":
+    from db_pool import tidb_pool
+
+    parser = argparse.ArgumentParser(description="Maintain the course keyword index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="extract terms for existing courses")
+    backfill_parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tidb_pool.connection() as conn:
+        if conn:
+            backfill(conn, args.batch_size)
+    tidb_pool.close_all()
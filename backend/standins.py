@@ -0,0 +1,229 @@
+# backend/standins.py
+#
+# Local stand-ins for S3, TiDB, Claude and the embedding model, used by
+# load_test.py to measure the serving modes without external services.
+# Each stand-in waits a configurable latency the way the real dependency
+# waits on the network:
+#
+#   STANDIN_S3_LATENCY_MS   per S3 call (default 40)
+#   STANDIN_DB_LATENCY_MS   per SQL statement (default 5)
+#   STANDIN_LLM_LATENCY_MS  per LLM response (default 400)
+
+import hashlib
+import io
+import os
+import threading
+import time
+import numpy as np
+from botocore.exceptions import ClientError
+
+S3_LATENCY = float(os.getenv("STANDIN_S3_LATENCY_MS", 40)) / 1000
+DB_LATENCY = float(os.getenv("STANDIN_DB_LATENCY_MS", 5)) / 1000
+LLM_LATENCY = float(os.getenv("STANDIN_LLM_LATENCY_MS", 400)) / 1000
+EMBEDDING_DIM = 384
+
+
+class StandInS3Client:
+    """In-memory S3 client covering the calls made by main.py."""
+
+    def __init__(self):
+        self._objects = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        time.sleep(S3_LATENCY)
+        with self._lock:
+            self._objects[(Bucket, Key)] = bytes(Body)
+        return {"ETag": hashlib.md5(Body).hexdigest()}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        time.sleep(S3_LATENCY)
+        with self._lock:
+            body = self._objects.get((Bucket, Key))
+        if body is None:
+            raise ClientError(
+                {"Error": {"Code": "NoSuchKey", "Message": "Not found"}}, "GetObject"
+            )
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        time.sleep(S3_LATENCY)
+        with self._lock:
+            body = self._objects.get((CopySource["Bucket"], CopySource["Key"]))
+            if body is None:
+                raise ClientError(
+                    {"Error": {"Code": "NoSuchKey", "Message": "Not found"}}, "CopyObject"
+                )
+            self._objects[(Bucket, Key)] = body
+        return {}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        time.sleep(S3_LATENCY)
+        with self._lock:
+            self._objects.pop((Bucket, Key), None)
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        time.sleep(S3_LATENCY)
+        upload_id = hashlib.sha1(f"{Bucket}/{Key}/{time.time()}".encode()).hexdigest()
+        with self._lock:
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        time.sleep(S3_LATENCY)
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": hashlib.md5(Body).hexdigest()}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        time.sleep(S3_LATENCY)
+        with self._lock:
+            parts = self._uploads.pop(UploadId)
+            self._objects[(Bucket, Key)] = b"".join(
+                parts[part["PartNumber"]] for part in MultipartUpload["Parts"]
+            )
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+
+class StandInCursor:
+    """Accepts any statement after a delay and returns no rows."""
+
+    def __init__(self):
+        self.rowcount = 0
+
+    def execute(self, query, args=None):
+        time.sleep(DB_LATENCY)
+        self.rowcount = 1
+        return 1
+
+    def executemany(self, query, args):
+        time.sleep(DB_LATENCY)
+        self.rowcount = len(args)
+        return self.rowcount
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class StandInConnection:
+    """Just enough of a pymysql connection for db_pool and main.py."""
+
+    def __init__(self):
+        time.sleep(DB_LATENCY)
+        self.open = True
+        self._autocommit = True
+
+    def cursor(self):
+        return StandInCursor()
+
+    def ping(self, reconnect=False):
+        time.sleep(DB_LATENCY)
+
+    def begin(self):
+        self._autocommit = False
+
+    def commit(self):
+        time.sleep(DB_LATENCY)
+        self._autocommit = True
+
+    def rollback(self):
+        self._autocommit = True
+
+    def get_autocommit(self):
+        return self._autocommit
+
+    def autocommit(self, value):
+        self._autocommit = value
+
+    def close(self):
+        self.open = False
+
+
+class StandInChain:
+    """
+    Answers `invoke` and `stream` after LLM_LATENCY, echoing the inputs.
+    Streamed responses spread the latency over their tokens.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+    def _text(self, inputs: dict) -> str:
+        return f"{self.prefix}: " + " ".join(str(value) for value in inputs.values())
+
+    def invoke(self, inputs: dict) -> str:
+        time.sleep(LLM_LATENCY)
+        return self._text(inputs)
+
+    def stream(self, inputs: dict):
+        tokens = self._text(inputs).split(" ")
+        for i, token in enumerate(tokens):
+            time.sleep(LLM_LATENCY / len(tokens))
+            yield token if i == 0 else " " + token
+
+
+class StandInEmbedder:
+    """
+    Deterministic embedding model that does real CPU work: a hashed bag of
+    words projected through a fixed random matrix, then L2-normalized.
+    """
+
+    def __init__(self, vocabulary_size: int = 4096):
+        self.vocabulary_size = vocabulary_size
+        self._projection = (
+            np.random.default_rng(0)
+            .standard_normal((vocabulary_size, EMBEDDING_DIM))
+            .astype(np.float32)
+        )
+
+    def _bag_of_words(self, text: str) -> np.ndarray:
+        counts = np.zeros(self.vocabulary_size, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest()
+            counts[int.from_bytes(digest, "little") % self.vocabulary_size] += 1
+        return counts
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        embeddings = np.stack([self._bag_of_words(text) for text in texts]) @ self._projection
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def install():
+    """Points main.py's S3 client, database pool, chains and embedding model at the stand-ins."""
+    import job_postings
+    import main
+    import resume_store
+    from db_pool import ConnectionPool, POOL_SIZE, POOL_TIMEOUT
+    from embedding_utils import embeddings_model
+    from llm_chains import generate_chain, llm, rewrite_chain
+
+    main.s3_client.replace(StandInS3Client)
+    pool = ConnectionPool(StandInConnection, max_size=POOL_SIZE, timeout=POOL_TIMEOUT)
+    main.tidb_pool = pool
+    job_postings.tidb_pool = pool
+    resume_store.tidb_pool = pool
+    llm.replace(lambda: "stand-in LLM")
+    generate_chain.replace(lambda: StandInChain("Generated"))
+    rewrite_chain.replace(lambda: StandInChain("Rewritten"))
+    embeddings_model.replace(StandInEmbedder)
+    print(
+        f"Using local stand-ins (S3 {S3_LATENCY * 1000:.0f}ms, "
+        f"DB {DB_LATENCY * 1000:.0f}ms, LLM {LLM_LATENCY * 1000:.0f}ms)"
+    )
@@ -0,0 +1,98 @@
+# backend/test_job_queue.py
+#
+# Runs a large PDF through real job worker processes. Parsing a PDF with at
+# least PDF_PARALLEL_MIN_PAGES pages starts a process pool inside the worker,
+# which fails if workers are daemonic. Also checks that job leases are renewed
+# while a job runs and that a worker that lost its lease cannot write.
+#
+#   python -m pytest test_job_queue.py
+
+import base64
+import io
+import threading
+import time
+from pypdf import PdfReader
+from job_queue import JobQueue, run_job, start_workers, stop_workers
+from parser_utils import parse_document
+from sample_data import generate_resume_pdf
+
+
+def parse_pdf_job(payload: dict, progress) -> dict:
+    progress("parsing")
+    text = parse_document(base64.b64decode(payload["pdf"]), "application/pdf")
+    return {"text": text}
+
+
+TEST_JOB_HANDLERS = {"parse_pdf": parse_pdf_job}
+
+
+def wait_for_job(queue: JobQueue, job_id: str, timeout: float = 120.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.2)
+    raise TimeoutError(f"Job {job_id} did not finish within {timeout}s")
+
+
+def test_worker_parses_large_pdf_in_parallel(tmp_path, monkeypatch):
+    # 239 lines at 8 per page: 30 pages, split across a 2-process pool
+    pdf = generate_resume_pdf(208, seed=3, lines_per_page=8)
+    assert len(PdfReader(io.BytesIO(pdf)).pages) == 30
+    monkeypatch.setenv("PDF_PARALLEL_WORKERS", "2")
+    monkeypatch.setenv("PDF_PARALLEL_MIN_PAGES", "24")
+
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path)
+    job_id = queue.enqueue("parse_pdf", {"pdf": base64.b64encode(pdf).decode("ascii")})
+    workers = start_workers(1, path, "test_job_queue:TEST_JOB_HANDLERS")
+    try:
+        job = wait_for_job(queue, job_id)
+    finally:
+        stop_workers(workers)
+
+    assert job["status"] == "succeeded", job["error"]
+    text = job["result"]["text"]
+    assert "Candidate 3" in text
+    # The last page's lines made it into the result
+    last_page = PdfReader(io.BytesIO(pdf)).pages[-1].extract_text()
+    assert last_page.split("\n")[-1].strip() in text
+
+
+def test_expired_lease_is_fenced_off(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.05)
+    job_id = queue.enqueue("parse_pdf", {})
+    _, _, _, first = queue.claim("worker-a")
+    time.sleep(0.1)
+    _, _, _, second = queue.claim("worker-b")
+
+    # The first worker's lease ran out and the job was claimed again
+    assert not queue.renew_lease(job_id, "worker-a", first)
+    assert not queue.update_progress(job_id, "worker-a", first, {"stage": "late"})
+    assert not queue.complete(job_id, "worker-a", first, {"text": "stale"})
+    assert not queue.fail(job_id, "worker-a", first, "stale", retry=True)
+    assert queue.get(job_id)["status"] == "running"
+
+    assert queue.complete(job_id, "worker-b", second, {"text": "fresh"})
+    assert queue.get(job_id)["result"] == {"text": "fresh"}
+
+
+def slow_job(payload: dict, progress) -> dict:
+    time.sleep(payload["seconds"])
+    return {"slept": payload["seconds"]}
+
+
+def test_running_job_keeps_its_lease(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.3)
+    job_id = queue.enqueue("slow", {"seconds": 1.0})
+    thread = threading.Thread(target=run_job, args=(queue, {"slow": slow_job}, "worker-a"))
+    thread.start()
+    try:
+        # Well past the lease: another worker still finds nothing to claim
+        time.sleep(0.6)
+        assert queue.claim("worker-b") is None
+    finally:
+        thread.join()
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded" and job["attempts"] == 1
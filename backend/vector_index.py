@@ -0,0 +1,396 @@
+# backend/vector_index.py
+#
+# Resident search indexes for /vector_search. Rows written by other
+# processes (other API workers, job workers, ingest_courses.py) are picked up
+# through an `updated_at` column; add it to existing tables with:
+#
+#   python vector_index.py migrate
+
+import argparse
+import threading
+import time
+from collections.abc import Set
+from datetime import timedelta
+import numpy as np
+
+
+class EmbeddingIndex:
+    """
+    Process-resident index of L2-normalized float32 embeddings for one table.
+
+    Rows live in a single contiguous matrix so a query is scored with one
+    matrix-vector product. The index is filled once from the database with
+    `load()` and then kept fresh with `add()`, both for rows this process
+    writes and for rows a `ChangeTracker` finds written by other processes.
+    /vector_search keeps only ids and embeddings here and reads previews
+    for the final hits from the database (`hydrate_results`).
+    """
+
+    def __init__(self, name: str, initial_capacity: int = 1024):
+        self.name = name
+        self._initial_capacity = initial_capacity
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._matrix = None
+        self._ids = []
+        self._metadata = []
+        self._positions = {}
+        self._size = 0
+        self._loaded = False
+        self._loading = False
+        self._pending = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return vector
+        return vector / norm
+
+    def _reserve(self, dim: int, needed: int):
+        if self._matrix is None:
+            capacity = max(self._initial_capacity, needed)
+            self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+            return
+        if self._matrix.shape[1] != dim:
+            raise ValueError(
+                f"Embedding dimension {dim} does not match index dimension {self._matrix.shape[1]}"
+            )
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, dim), dtype=np.float32)
+        grown[: self._size] = self._matrix[: self._size]
+        self._matrix = grown
+
+    def _upsert(self, item_id, vector: np.ndarray, metadata: dict):
+        position = self._positions.get(item_id)
+        if position is None:
+            self._reserve(vector.shape[0], self._size + 1)
+            position = self._size
+            self._ids.append(item_id)
+            self._metadata.append(metadata)
+            self._positions[item_id] = position
+            self._size += 1
+        else:
+            self._metadata[position] = metadata
+        self._matrix[position] = vector
+
+    def load(self, fetch_rows):
+        """
+        Fills the index from `fetch_rows()`, an iterable of
+        (id, embedding, metadata) tuples, unless it is already loaded.
+        `fetch_rows` is only called by the thread that performs the load.
+
+        Adds that arrive while the load is running are applied afterwards so
+        rows written during the initial scan are not lost.
+        """
+        # Concurrent callers wait here until the first load has finished
+        with self._load_lock:
+            with self._lock:
+                if self._loaded:
+                    return
+                self._loading = True
+                self._pending = {}
+
+            try:
+                ids, vectors, metadata = [], [], []
+                for item_id, embedding, meta in fetch_rows():
+                    ids.append(item_id)
+                    vectors.append(self._normalize(embedding))
+                    metadata.append(meta)
+            except Exception:
+                with self._lock:
+                    self._loading = False
+                    self._pending = {}
+                raise
+
+            with self._lock:
+                self._matrix = None
+                self._ids, self._metadata, self._positions = [], [], {}
+                self._size = 0
+                if vectors:
+                    matrix = np.vstack(vectors)
+                    self._reserve(matrix.shape[1], matrix.shape[0])
+                    self._matrix[: matrix.shape[0]] = matrix
+                    for position, item_id in enumerate(ids):
+                        self._positions[item_id] = position
+                    self._ids = ids
+                    self._metadata = metadata
+                    self._size = len(ids)
+                for item_id, (vector, meta) in self._pending.items():
+                    self._upsert(item_id, vector, meta)
+                self._pending = {}
+                self._loading = False
+                self._loaded = True
+        print(f"Loaded {self._size} embeddings into the {self.name} index.")
+
+    def add(self, item_id, embedding, metadata: dict | None = None):
+        """
+        Inserts or replaces a single row. Adds to an index that has not been
+        loaded yet are dropped, since the eventual load will read them from
+        the database anyway.
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._loaded:
+                self._upsert(item_id, vector, metadata or {})
+            elif self._loading:
+                self._pending[item_id] = (vector, metadata or {})
+
+    def add_many(self, items):
+        """Inserts or replaces (id, embedding, metadata) tuples."""
+        for item_id, embedding, metadata in items:
+            self.add(item_id, embedding, metadata)
+
+    def get(self, item_id) -> np.ndarray | None:
+        """Returns a copy of the stored (normalized) embedding for `item_id`, or None."""
+        with self._lock:
+            position = self._positions.get(item_id)
+            if position is None:
+                return None
+            return self._matrix[position].copy()
+
+    def clear(self):
+        """Drops all rows and marks the index as not loaded."""
+        with self._lock:
+            self._matrix = None
+            self._ids, self._metadata, self._positions = [], [], {}
+            self._size = 0
+            self._loaded = False
+            self._pending = {}
+
+    def search(self, query_embedding, limit: int = 5, candidate_ids=None) -> list[dict]:
+        """
+        Returns the `limit` most similar rows as dicts holding the row's
+        metadata plus `id` and `similarity`, most similar first. When
+        `candidate_ids` is given, only those rows are returned; small
+        candidate sets are scored on their own, large ones by scoring every
+        row and skipping non-candidates.
+        """
+        query = self._normalize(query_embedding)
+        with self._lock:
+            size = self._size
+            if size == 0 or limit <= 0:
+                return []
+            if query.shape[0] != self._matrix.shape[1]:
+                raise ValueError(
+                    f"Query dimension {query.shape[0]} does not match index dimension {self._matrix.shape[1]}"
+                )
+            if candidate_ids is not None and len(candidate_ids) * 4 >= size:
+                return self._search_large_candidate_set(query, limit, candidate_ids)
+            if candidate_ids is None:
+                positions = np.arange(size)
+                scores = self._matrix[:size] @ query
+            else:
+                positions = np.fromiter(
+                    (
+                        self._positions[item_id]
+                        for item_id in candidate_ids
+                        if item_id in self._positions
+                    ),
+                    dtype=np.int64,
+                )
+                if positions.size == 0:
+                    return []
+                scores = self._matrix[positions] @ query
+            k = min(limit, scores.size)
+            if k < scores.size:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(scores.size)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                {
+                    "id": self._ids[positions[i]],
+                    **self._metadata[positions[i]],
+                    "similarity": float(scores[i]),
+                }
+                for i in top
+            ]
+
+    def _search_large_candidate_set(self, query: np.ndarray, limit: int, candidate_ids) -> list[dict]:
+        # Mapping many ids to rows and gathering those rows costs more than
+        # one product over the whole matrix, so score everything and walk the
+        # best rows until `limit` of them are candidates
+        wanted = candidate_ids if isinstance(candidate_ids, Set) else set(candidate_ids)
+        size = self._size
+        scores = self._matrix[:size] @ query
+        take = min(size, max(4 * limit, 64))
+        while True:
+            top = np.argpartition(-scores, take - 1)[:take] if take < size else np.arange(size)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            hits = [position for position in top.tolist() if self._ids[position] in wanted][:limit]
+            if len(hits) == limit or take == size:
+                break
+            take = min(size, take * 8)
+        return [
+            {
+                "id": self._ids[position],
+                **self._metadata[position],
+                "similarity": float(scores[position]),
+            }
+            for position in hits
+        ]
+
+
+class ChangeTracker:
+    """
+    Tracks how far the rows of one table have been applied to this process's
+    indexes, so rows written by other processes show up without a restart.
+
+    `start()` records the database clock read just before the initial scan.
+    `poll()` then reads the rows whose `updated_at` is at or after that
+    watermark, at most once every `interval` seconds, and moves the
+    watermark to the clock read before that query. Each poll looks back an
+    extra `overlap` seconds to catch rows stamped before a transaction
+    committed; re-applying a row is harmless.
+    """
+
+    def __init__(self, table: str, interval: float, overlap: float):
+        self.table = table
+        self.interval = interval
+        self.overlap = overlap
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._checked_at = 0.0
+        self._failing = False
+
+    def start(self, watermark):
+        """Begins tracking from `watermark`, the database time before the initial scan."""
+        with self._lock:
+            self._watermark = watermark
+            self._checked_at = time.monotonic()
+
+    @property
+    def due(self) -> bool:
+        return (
+            self._watermark is not None
+            and time.monotonic() - self._checked_at >= self.interval
+        )
+
+    def poll(self, fetch_changes) -> list | None:
+        """
+        Returns the rows from `fetch_changes(since)`, which returns (rows, new
+        watermark), when a check is due. Returns None when it is not, when
+        another thread is already checking, or when the check fails (logged
+        once until a check succeeds again).
+        """
+        if not self.due or not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if not self.due:
+                return None
+            self._checked_at = time.monotonic()
+            try:
+                rows, watermark = fetch_changes(self._watermark - timedelta(seconds=self.overlap))
+            except Exception as e:
+                if not self._failing:
+                    print(
+                        f"Could not read changed {self.table} rows ({e}); "
+                        "run `python vector_index.py migrate` if updated_at is missing."
+                    )
+                self._failing = True
+                return None
+            self._failing = False
+            self._watermark = watermark
+            return rows
+        finally:
+            self._lock.release()
+
+
+# Characters of resume text and course descriptions returned with search hits
+PREVIEW_CHARS = 200
+
+
+def resume_metadata(file_name: str, raw_text: str) -> dict:
+    """Builds the per-row metadata returned for resume search hits."""
+    return {"file_name": file_name, "raw_text_preview": raw_text[:PREVIEW_CHARS] + "..."}
+
+
+def course_metadata(name: str, description: str, url: str) -> dict:
+    """Builds the per-row metadata returned for course search hits."""
+    return {
+        "name": name,
+        "description_preview": description[:PREVIEW_CHARS] + "...",
+        "url": url,
+    }
+
+
+def hydrate_results(results: list[dict], metadata: dict) -> list[dict]:
+    """
+    Merges {id: metadata} into scored results, keeping their order. Hits
+    with no metadata (rows deleted since they were indexed) are dropped.
+    """
+    return [
+        {"id": result["id"], **metadata[result["id"]], **result}
+        for result in results
+        if result["id"] in metadata
+    ]
+
+
+# Shared indexes for the tables searched by /vector_search
+resume_index = EmbeddingIndex("resumes")
+course_index = EmbeddingIndex("courses")
+
+
+# -- storage ----------------------------------------------------------------
+
+# Tables searched by /vector_search whose changes are tracked
+CHANGE_TRACKED_TABLES = ("resumes", "courses")
+
+
+def database_now(conn):
+    """Reads the database clock, which stamps `updated_at`."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT NOW(6)")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return row[0] if row else None
+
+
+def migrate(conn):
+    """Adds an auto-updating updated_at column and its index to each tracked table."""
+    from job_postings import has_index
+    from migrate_embeddings import get_column_type
+
+    cursor = conn.cursor()
+    for table in CHANGE_TRACKED_TABLES:
+        if get_column_type(cursor, table, "updated_at") is None:
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP(6) NOT NULL "
+                "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"
+            )
+            print(f"  Added {table}.updated_at")
+        index_name = f"idx_{table}_updated_at"
+        if not has_index(cursor, table, index_name):
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} (updated_at)")
+            print(f"  Added index {index_name}")
+    cursor.close()
+    print("Search tables are ready for change tracking.")
+
+
+if __name__ == "__main__":
+    from db_pool import tidb_pool
+
+    parser = argparse.ArgumentParser(description="Maintain the search index tables.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="add the updated_at column used to refresh indexes")
+    args = parser.parse_args()
+
+    with tidb_pool.connection() as conn:
+        if conn:
+            migrate(conn)
+    tidb_pool.close_all()
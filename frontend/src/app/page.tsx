@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, ChangeEvent, FormEvent } from 'react';
+import { useRef, useState, ChangeEvent, FormEvent } from 'react';
 import ResumePreview from '../components/features/ResumePreview';
 import SuggestionCard from '../components/features/SuggestionCard';
 
@@ -14,6 +14,7 @@ export default function Home() {
   const [isRewriting, setIsRewriting] = useState<boolean>(false);
   const [loading, setLoading] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
+  const rewriteAbortRef = useRef<AbortController | null>(null);
 
   const handleResumeFileChange = (e: ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files[0]) {
@@ -26,13 +27,18 @@ export default function Home() {
   };
 
   const handleBulletSelect = async (bulletPoint: string) => {
+    // Cancel any rewrite still streaming so the server can stop generating
+    rewriteAbortRef.current?.abort();
+    const controller = new AbortController();
+    rewriteAbortRef.current = controller;
+
     setSelectedBullet(bulletPoint);
     setRewrittenBullet(''); // Clear previous result
     setIsRewriting(true);
     setError(null);
 
     try {
-      const rewriteResponse = await fetch("http://localhost:5000/rewrite_bullet", {
+      const rewriteResponse = await fetch("http://localhost:5000/rewrite_bullet/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -41,21 +47,48 @@ export default function Home() {
           bulletPoint: bulletPoint,
           jobDescription: jobPostingText,
         }),
+        signal: controller.signal,
       });
 
-      if (!rewriteResponse.ok) {
+      if (!rewriteResponse.ok || !rewriteResponse.body) {
         const errorData = await rewriteResponse.json();
         throw new Error(`Error rewriting bullet: ${errorData.error}`);
       }
 
-      const rewriteData = await rewriteResponse.json();
-      setRewrittenBullet(rewriteData.rewrittenBullet);
-      console.log("Rewritten Bullet:", rewriteData.rewrittenBullet);
+      // Read server-sent events: "event: <name>\ndata: <json>\n\n"
+      const reader = rewriteResponse.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let rewritten = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop() ?? '';
+        for (const rawEvent of events) {
+          const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(rawEvent.match(/^data: (.*)$/m)?.[1] ?? '{}');
+          if (eventName === 'token') {
+            rewritten += data.text;
+            setRewrittenBullet(rewritten);
+            setIsRewriting(false); // Show partial text instead of the spinner
+          } else if (eventName === 'done') {
+            setRewrittenBullet(data.text);
+            console.log("Rewritten Bullet:", data.text, data.timing);
+          } else if (eventName === 'error') {
+            throw new Error(`Error rewriting bullet: ${data.error}`);
+          }
+        }
+      }
     } catch (err: unknown) {
+      if (controller.signal.aborted) return;
       setError(err instanceof Error ? err.message : 'An unknown error occurred while rewriting the bullet point');
       console.error("Error during bullet rewriting:", err);
     } finally {
-      setIsRewriting(false);
+      if (rewriteAbortRef.current === controller) {
+        setIsRewriting(false);
+      }
     }
   };
 
@@ -117,6 +150,8 @@ export default function Home() {
               s3Url: s3Url,
               resumeFileType: resumeFile.type,
               jobPostingText: jobPostingText,
+              // Vectors stay server-side; search by resumeId / jobPostingId instead
+              includeEmbeddings: false,
             }),
           });
 
@@ -130,14 +165,7 @@ export default function Home() {
           setParsedJobPostingContent(processedData.parsedJobPostingText);
           console.log("Parsed Resume:", processedData.parsedResumeText.substring(0, 200) + "...");
           console.log("Parsed Job Posting:", processedData.parsedJobPostingText.substring(0, 200) + "...");
-          console.log("Resume Embedding (first 5 dims):",
-
-
- processedData.resumeEmbedding.slice(0, 5), "...");
-          console.log("Job Posting Embedding (first 5 dims):",
-
-
- processedData.jobPostingEmbedding.slice(0, 5), "...");
+          console.log("Resume ID:", processedData.resumeId, "Job Posting ID:", processedData.jobPostingId);
 
         } catch (err: unknown) {
           setError(err instanceof Error ? err.message : 'An unknown error occurred');